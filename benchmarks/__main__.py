@@ -0,0 +1,139 @@
+"""
+Runs the benchmarks and prints the results as JSON (one object with the
+environment and the list of results), to compare runs between commits.
+
+    python -m benchmarks                          # every benchmark
+    python -m benchmarks --quick                  # fewer iterations (CI smoke run)
+    python -m benchmarks hydration get -o out.json
+
+No server is needed: see benchmarks/fake.py.
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Tuple
+)
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+import bson
+import pydantic
+import pymongo
+
+from . import (
+    bench_collection_resolution,
+    bench_get,
+    bench_hydration,
+    bench_insert,
+    bench_object_id
+)
+
+
+
+
+"""
+name: (run function, kwargs of the --quick mode)
+"""
+BENCHMARKS: Dict[str, Tuple[Callable[..., List[Dict[str, Any]]], Dict[str, Any]]] = {
+    'collection_resolution': (
+        bench_collection_resolution.run,
+        {'number': 10_000, 'repeat': 3}
+    ),
+    'get': (
+        bench_get.run,
+        {'number': 200, 'repeat': 3}
+    ),
+    'hydration': (
+        bench_hydration.run,
+        {'sizes': [1, 10], 'depths': [1, 4], 'documents': 200, 'repeat': 3}
+    ),
+    'insert': (
+        bench_insert.run,
+        {'sizes': [1, 10], 'depths': [1], 'documents': 200, 'repeat': 3}
+    ),
+    'object_id': (
+        bench_object_id.run,
+        {'number': 10_000, 'repeat': 3}
+    ),
+}
+
+
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'pydantic': pydantic.VERSION,
+        'pymongo': pymongo.version,
+        'bson_c_extension': bson.has_c(),
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat()
+    }
+
+
+
+def main(argv: List[str] = None) -> int:
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=f'default: all ({", ".join(BENCHMARKS)})')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations')
+    parser.add_argument('-o', '--output', help='write the JSON to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list(BENCHMARKS)
+
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark `{name}`, choose from: {", ".join(BENCHMARKS)}')
+
+
+    """
+    configure_databases(...) clears the per-class collection cache: it must
+    run before the benchmarks that install a FakeCollection.
+    """
+    bench_collection_resolution.configure()
+
+
+    results = []
+
+    for name in names:
+
+        run, quick_kwargs = BENCHMARKS[name]
+
+        started = time.perf_counter()
+        benchmark_results = run(**(quick_kwargs if args.quick else {}))
+
+        print(f'{name}: {len(benchmark_results)} results in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+        results.extend(benchmark_results)
+
+
+    report = json.dumps(
+        {
+            'environment': environment(),
+            'quick': args.quick,
+            'results': results
+        },
+        indent=2
+    )
+
+    if args.output:
+        with open(args.output, 'w', encoding='UTF-8') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+    return 0
+
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Per-call overhead of the database/collection resolution done by the
+document decorators, before (resolved on every call) and after (cached
+per model class).
+
+No server is needed: the clients are created with connect=False and the
+decorated methods never talk to MongoDB.
+
+    python -m benchmarks.bench_collection_resolution
+"""
+from typing import (
+    Any,
+    Dict,
+    List
+)
+import asyncio
+import functools
+import timeit
+
+import motor.motor_asyncio
+import pymongo
+
+from mongopyd import configure_databases
+from mongopyd.database import DataBase, AsyncDataBase
+from mongopyd.sync_document import (
+    Document,
+    need_database_and_collection,
+    _resolve_database_and_collection
+)
+from mongopyd.async_document import (
+    AsyncDocument,
+    need_database_and_collection as async_need_database_and_collection,
+    _resolve_database_and_collection as _async_resolve_database_and_collection
+)
+
+
+
+
+def legacy_need_database_and_collection(func):
+    """
+    The decorator as it was before the per-class cache: every call goes
+    through get_database(), get_collection() and the isinstance checks.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, database=None, collection=None, **kwargs):
+
+        database, collection = _resolve_database_and_collection(
+            self,
+            database=database,
+            collection=collection
+            )
+
+        return func(self, *args, database=database, collection=collection, **kwargs)
+
+    return wrapper
+
+
+
+def async_legacy_need_database_and_collection(func):
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, database=None, collection=None, **kwargs):
+
+        database, collection = _async_resolve_database_and_collection(
+            self,
+            database=database,
+            collection=collection
+            )
+
+        return await func(self, *args, database=database, collection=collection, **kwargs)
+
+    return wrapper
+
+
+
+
+class BenchModel(Document):
+
+    class Settings():
+        name = 'bench_collection_resolution'
+
+
+    @classmethod
+    @legacy_need_database_and_collection
+    def legacy_noop(self, database=None, collection=None):
+        return collection
+
+
+    @classmethod
+    @need_database_and_collection
+    def noop(self, database=None, collection=None):
+        return collection
+
+
+
+class AsyncBenchModel(AsyncDocument):
+
+    class Settings():
+        name = 'bench_collection_resolution'
+
+
+    @classmethod
+    @async_legacy_need_database_and_collection
+    async def legacy_noop(self, database=None, collection=None):
+        return collection
+
+
+    @classmethod
+    @async_need_database_and_collection
+    async def noop(self, database=None, collection=None):
+        return collection
+
+
+
+
+def configure() -> None:
+
+    client = pymongo.MongoClient(connect=False)
+    motor_client = motor.motor_asyncio.AsyncIOMotorClient(connect=False)
+
+    configure_databases([
+        DataBase(
+            alias='bench',
+            db=client['mongopyd_bench'],
+            is_default=True
+        ),
+        AsyncDataBase(
+            alias='async_bench',
+            db=motor_client['mongopyd_bench'],
+            is_default=True
+        )
+    ])
+
+
+
+def _per_call_ns(func, number: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+
+def run(number: int = 100_000, repeat: int = 5) -> List[Dict[str, Any]]:
+
+    results = []
+
+    for name, func in (
+        ('sync.uncached', BenchModel.legacy_noop),
+        ('sync.cached', BenchModel.noop),
+    ):
+        results.append({
+            'benchmark': 'collection_resolution',
+            'case': name,
+            'ns_per_call': _per_call_ns(func, number, repeat)
+        })
+
+
+    loop = asyncio.new_event_loop()
+
+    async def drive(coro_func, n):
+        for _ in range(n):
+            await coro_func()
+
+    try:
+        for name, coro_func in (
+            ('async.uncached', AsyncBenchModel.legacy_noop),
+            ('async.cached', AsyncBenchModel.noop),
+        ):
+            results.append({
+                'benchmark': 'collection_resolution',
+                'case': name,
+                'ns_per_call': _per_call_ns(
+                    lambda: loop.run_until_complete(drive(coro_func, number)),
+                    1,
+                    repeat
+                    ) / number
+            })
+    finally:
+        loop.close()
+
+    return results
+
+
+
+
+if __name__ == '__main__':
+
+    configure()
+
+    for result in run():
+        print(f"{result['case']:<16} {result['ns_per_call']:>10.1f} ns/call")
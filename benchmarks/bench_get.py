@@ -0,0 +1,142 @@
+"""
+Document.get()/__getitem__ path lookups: the previous implementation
+(model_dump(by_alias=True) on every call) against the live-model walk,
+on documents of growing size and nesting depth.
+
+    python -m benchmarks.bench_get
+"""
+from typing import (
+    Any,
+    Dict,
+    List
+)
+import timeit
+
+from mongopyd.sync_document import Document
+from mongopyd.embedded_document import EmbeddedDocument
+
+
+
+
+def legacy_get(self, field: Any, default: Any=None):
+    """
+    Document.get(...) before the path accessor.
+    """
+
+    if field == 'id':
+        return legacy_get(self, '_id', default=default)
+
+
+    document = self.model_dump(by_alias=True)
+    value = None
+    _refs = field.split('.')
+
+    for _ref in _refs:
+        if value is None:
+            if _ref != _refs[-1]:
+                value = document.get(_ref, {})
+            else:
+                value = document.get(_ref, default)
+        else:
+            if _ref != _refs[-1]:
+                if isinstance(value, dict):
+                    value = value.get(_ref, {})
+                else:
+                    raise ValueError('The value you are trying to get is not a dictionary')
+            else:
+                if isinstance(value, dict):
+                    value = value.get(_ref, default)
+                else:
+                    raise ValueError(f'The value you are trying to get is not a dictionary')
+
+
+    return value
+
+
+
+
+class Address(EmbeddedDocument):
+    street: str = ''
+    city: str = ''
+
+
+
+class BenchModel(Document):
+    name: str = ''
+    address: Address = Address()
+
+    class Settings():
+        name = 'bench_get'
+
+
+
+
+def make_document(fields: int, depth: int) -> BenchModel:
+    """
+    `fields` extra top-level fields, plus `deep`: a dict nested `depth` levels.
+    """
+
+    deep: Dict[str, Any] = {'value': 'leaf'}
+    for level in range(depth):
+        deep = {f'level{level}': deep, 'sibling': list(range(10))}
+
+    return BenchModel(
+        name='bench',
+        address=Address(street='Main', city='Lisbon'),
+        deep=deep,
+        **{f'field{index}': {'index': index, 'tags': ['a', 'b']} for index in range(fields)}
+    )
+
+
+
+def deep_path(depth: int) -> str:
+    return '.'.join(['deep'] + [f'level{level}' for level in reversed(range(depth))] + ['value'])
+
+
+
+
+def run(
+        sizes: List[int] = [10, 100],
+        depths: List[int] = [1, 4, 8],
+        number: int = 2_000,
+        repeat: int = 5
+    ) -> List[Dict[str, Any]]:
+
+    results = []
+
+    for size in sizes:
+        for depth in depths:
+
+            document = make_document(size, depth)
+
+            for path in ('name', 'address.city', deep_path(depth)):
+
+                assert legacy_get(document, path) == document.get(path)
+
+                for case, func in (
+                    ('legacy', lambda: legacy_get(document, path)),
+                    ('path_accessor', lambda: document.get(path)),
+                ):
+                    seconds = min(timeit.repeat(func, number=number, repeat=repeat))
+
+                    results.append({
+                        'benchmark': 'get',
+                        'case': case,
+                        'fields': size,
+                        'depth': depth,
+                        'path': path,
+                        'ns_per_call': seconds / number * 1e9
+                    })
+
+    return results
+
+
+
+
+if __name__ == '__main__':
+
+    for result in run():
+        print(
+            f"{result['case']:<14} fields={result['fields']:<4} depth={result['depth']:<2}"
+            f" {result['path']:<60} {result['ns_per_call']:>12.1f} ns/call"
+        )
@@ -0,0 +1,125 @@
+"""
+find() hydration throughput ('validate' and 'construct' modes, one by one
+and with find_batches) on documents of growing size and nesting depth,
+served by an in-process FakeCollection. 'construct' leaves the nested models
+as dicts (see Hydrator), so its cost barely depends on the nesting.
+
+    python -m benchmarks.bench_hydration
+"""
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional
+)
+import datetime
+import timeit
+
+from mongopyd.sync_document import Document
+from mongopyd.embedded_document import EmbeddedDocument
+
+from .fake import install
+
+
+
+
+class Item(EmbeddedDocument):
+    name: str
+    price: float
+    quantity: int
+    tags: List[str] = []
+
+
+
+class Node(EmbeddedDocument):
+    value: str
+    child: Optional['Node'] = None
+
+
+
+class Order(Document):
+    customer: str
+    created_at: datetime.datetime
+    items: List[Item] = []
+    tree: Optional[Node] = None
+
+    class Settings():
+        name = 'bench_hydration'
+
+
+
+
+def make_raw_document(size: int, depth: int) -> Dict[str, Any]:
+    """
+    An order with `size` items and a tree of `depth` nested nodes, as the
+    server would return it.
+    """
+
+    tree = None
+    for level in range(depth):
+        tree = Node(value=f'level{level}', child=tree)
+
+    order = Order(
+        customer='bench',
+        created_at=datetime.datetime(2024, 1, 1),
+        items=[
+            Item(name=f'item{index}', price=index * 1.5, quantity=index, tags=['a', 'b'])
+            for index in range(size)
+        ],
+        tree=tree
+    )
+    order.id = None
+
+    document = order.model_dump(by_alias=True, exclude_none=True)
+    document.pop('_id', None)
+
+    return document
+
+
+
+
+def run(
+        sizes: List[int] = [1, 10, 100],
+        depths: List[int] = [1, 4, 8],
+        documents: int = 1_000,
+        repeat: int = 5
+    ) -> List[Dict[str, Any]]:
+
+    results = []
+
+    for size in sizes:
+        for depth in depths:
+
+            raw = make_raw_document(size, depth)
+            install(Order, [dict(raw) for _ in range(documents)])
+
+            for mode in ('validate', 'construct'):
+
+                for case, func in (
+                    (f'find.{mode}', lambda: list(Order.find({}, hydration=mode))),
+                    (f'find_batches.{mode}', lambda: list(Order.find_batches({}, hydration=mode))),
+                ):
+                    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+
+                    results.append({
+                        'benchmark': 'hydration',
+                        'case': case,
+                        'size': size,
+                        'depth': depth,
+                        'documents': documents,
+                        'us_per_document': seconds / documents * 1e6,
+                        'documents_per_second': documents / seconds
+                    })
+
+    return results
+
+
+
+
+if __name__ == '__main__':
+
+    for result in run():
+        print(
+            f"{result['case']:<24} size={result['size']:<4} depth={result['depth']:<2}"
+            f" {result['us_per_document']:>10.2f} us/doc {result['documents_per_second']:>12.0f} docs/s"
+        )
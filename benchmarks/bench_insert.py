@@ -0,0 +1,83 @@
+"""
+Client-side cost of insert() (model_dump of one document per call) and of
+insert_many() (batched dumps), per document, on an in-process FakeCollection.
+
+    python -m benchmarks.bench_insert
+"""
+from typing import (
+    Any,
+    Dict,
+    List
+)
+import timeit
+
+from .bench_hydration import Order, make_raw_document
+from .fake import install
+
+
+
+
+def make_documents(size: int, depth: int, count: int) -> List[Order]:
+
+    raw = make_raw_document(size, depth)
+
+    return [Order.model_validate(raw) for _ in range(count)]
+
+
+
+def run(
+        sizes: List[int] = [1, 10, 100],
+        depths: List[int] = [1, 8],
+        documents: int = 1_000,
+        repeat: int = 5
+    ) -> List[Dict[str, Any]]:
+
+    results = []
+
+    install(Order)
+
+    for size in sizes:
+        for depth in depths:
+
+            docs = make_documents(size, depth, documents)
+
+
+            def insert_one_by_one():
+                for doc in docs:
+                    doc.id = None
+                    doc.insert()
+
+
+            def insert_many():
+                for doc in docs:
+                    doc.id = None
+                Order.insert_many(docs)
+
+
+            for case, func in (
+                ('insert', insert_one_by_one),
+                ('insert_many', insert_many),
+            ):
+                seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+
+                results.append({
+                    'benchmark': 'insert',
+                    'case': case,
+                    'size': size,
+                    'depth': depth,
+                    'documents': documents,
+                    'us_per_document': seconds / documents * 1e6
+                })
+
+    return results
+
+
+
+
+if __name__ == '__main__':
+
+    for result in run():
+        print(
+            f"{result['case']:<12} size={result['size']:<4} depth={result['depth']:<2}"
+            f" {result['us_per_document']:>10.2f} us/doc"
+        )
@@ -0,0 +1,86 @@
+"""
+PydanticObjectId validation and serialization: from an ObjectId, from its
+24-character string, and inside a model (the `id` field of every document).
+
+    python -m benchmarks.bench_object_id
+"""
+from typing import (
+    Any,
+    Dict,
+    List
+)
+import timeit
+
+from bson import ObjectId
+from pydantic import TypeAdapter, ConfigDict
+
+from mongopyd.sync_document import Document
+from mongopyd.src.custom_types import PydanticObjectId
+
+
+
+
+class Reference(Document):
+    owner_id: PydanticObjectId
+
+    class Settings():
+        name = 'bench_object_id'
+
+
+
+
+def run(number: int = 100_000, repeat: int = 5) -> List[Dict[str, Any]]:
+
+    """
+    Same config as the models (Document.Config).
+    """
+    adapter = TypeAdapter(PydanticObjectId, config=ConfigDict(arbitrary_types_allowed=True))
+
+    object_id = ObjectId()
+    as_str = str(object_id)
+    raw = {'_id': object_id, 'owner_id': object_id}
+    model = Reference.model_validate(raw)
+
+    results = []
+
+    for case, func in (
+        ('validate.object_id', lambda: adapter.validate_python(object_id)),
+        ('validate.str', lambda: adapter.validate_python(as_str)),
+        ('dump.python', lambda: adapter.dump_python(object_id)),
+        ('dump.json', lambda: adapter.dump_json(object_id)),
+        ('model.validate', lambda: Reference.model_validate(raw)),
+        ('model.dump', lambda: model.model_dump(by_alias=True)),
+    ):
+        try:
+            func()
+        except Exception as err:
+            """
+            Not supported by this version of the type.
+            """
+            results.append({
+                'benchmark': 'object_id',
+                'case': case,
+                'error': f'{err.__class__.__name__}: {err}'
+            })
+            continue
+
+        seconds = min(timeit.repeat(func, number=number, repeat=repeat))
+
+        results.append({
+            'benchmark': 'object_id',
+            'case': case,
+            'ns_per_call': seconds / number * 1e9
+        })
+
+    return results
+
+
+
+
+if __name__ == '__main__':
+
+    for result in run():
+        if 'error' in result:
+            print(f"{result['case']:<20} {result['error']}")
+        else:
+            print(f"{result['case']:<20} {result['ns_per_call']:>10.1f} ns/call")
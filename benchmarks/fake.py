@@ -0,0 +1,113 @@
+"""
+In-process stand-in for a pymongo collection, so the benchmarks measure the
+overhead of mongopyd (hydration, dumps, decorators) and nothing else.
+
+find() serves a fixed list of raw documents (the dicts are returned as they
+are, without the BSON decoding a real cursor would do) and the writes only
+count what they receive.
+"""
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional
+)
+
+import pymongo
+import pymongo.collection
+from pymongo.results import InsertOneResult, InsertManyResult
+from bson import ObjectId
+
+from mongopyd import RESOLVED_COLLECTIONS
+
+
+
+
+class FakeCursor():
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self._documents = documents
+
+
+    def __iter__(self):
+        return iter(self._documents)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+    def close(self):
+        pass
+
+
+
+class FakeCollection(pymongo.collection.Collection):
+
+    def __init__(
+            self,
+            name: str,
+            documents: Optional[List[Dict[str, Any]]] = None
+        ):
+
+        client = pymongo.MongoClient(connect=False)
+        super().__init__(client['mongopyd_bench'], name)
+
+        self.documents = documents or []
+        self.inserted = 0
+
+
+    def find(self, filter: Optional[Mapping[str, Any]] = None, *args: Any, **kwargs: Any) -> FakeCursor:
+        return FakeCursor(self.documents)
+
+
+    def find_one(self, filter: Optional[Any] = None, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        return self.documents[0] if self.documents else None
+
+
+    def count_documents(self, filter: Mapping[str, Any], *args: Any, **kwargs: Any) -> int:
+        return len(self.documents)
+
+
+    def insert_one(self, document: Dict[str, Any], *args: Any, **kwargs: Any) -> InsertOneResult:
+
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+
+        self.inserted += 1
+
+        return InsertOneResult(document['_id'], True)
+
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]], *args: Any, **kwargs: Any) -> InsertManyResult:
+
+        ids = []
+
+        for document in documents:
+            if '_id' not in document:
+                document['_id'] = ObjectId()
+            ids.append(document['_id'])
+
+        self.inserted += len(ids)
+
+        return InsertManyResult(ids, True)
+
+
+
+
+def install(model: type, documents: Optional[List[Dict[str, Any]]] = None) -> FakeCollection:
+    """
+    Makes `model` use a FakeCollection (through the per-class collection cache
+    of the decorators). Call it after configure_databases(...), which clears that cache.
+    """
+
+    collection = FakeCollection(model.Settings.name, documents)
+    RESOLVED_COLLECTIONS[model] = (collection.database, collection)
+
+    return collection
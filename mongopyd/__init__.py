@@ -4,7 +4,9 @@ from typing import (
     Literal,
     Union,
     Dict,
-    List
+    List,
+    Tuple,
+    Any
     )
 
 
@@ -15,6 +17,13 @@ ASYNC_DATABASES: Dict[str, AsyncDataBase] = {}
 DEFAULT_DATABASE_ALIAS = None
 ASYNC_DEFAULT_DATABASE_ALIAS = None
 
+"""
+Database/collection handles resolved for each model class (default path only).
+Filled on first use by the document decorators and cleared whenever the
+databases registry changes.
+"""
+RESOLVED_COLLECTIONS: Dict[type, Tuple[Any, Any]] = {}
+
 
 
 
@@ -87,6 +96,9 @@ def configure_databases(
     ASYNC_DEFAULT_DATABASE_ALIAS = _ASYNC_DEFAULT_DATABASE_ALIAS
 
 
+    RESOLVED_COLLECTIONS.clear()
+
+
     _RETURN_DATABASES = {
         'sync': get_databases(mode='sync'),
         'async': get_databases(mode='async')
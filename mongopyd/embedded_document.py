@@ -3,6 +3,7 @@ from pydantic import (
     Extra
 )
 from .src.custom_types import PydanticObjectId
+from .src.paths import get_path, MISSING
 from typing import (
     Any
 )
@@ -34,43 +35,17 @@ class EmbeddedDocument(BaseModel):
         """
 
         if field == 'id':
-            return self.get('_id', default=default)
-
-
-        document = self.model_dump(by_alias=True)
-        value = None
-        _refs = field.split('.')
-
-        for _ref in _refs:
-            if value is None:
-                if _ref != _refs[-1]:
-                    value = document.get(_ref, {})
-                else:
-                    value = document.get(_ref, default)
-            else:
-                if _ref != _refs[-1]:
-                    if isinstance(value, dict):
-                        value = value.get(_ref, {})
-                    else:
-                        raise ValueError('The value you are trying to get is not a dictionary')
-                else:
-                    if isinstance(value, dict):
-                        value = value.get(_ref, default)
-                    else:
-                        raise ValueError(f'The value you are trying to get is not a dictionary')
+            field = '_id'
 
-
-        return value
+        return get_path(self, field, default)
 
 
 
     def __getitem__(self, __key: Any) -> Any:
 
-        unique_default_identify = 'a450ec79-e2dd-4d90-af14-7d416a4c4316'
-        
-        value = self.get(__key, default=unique_default_identify)
+        value = self.get(__key, default=MISSING)
 
-        if value == unique_default_identify:
+        if value is MISSING:
             raise KeyError(__key)
         
         return value
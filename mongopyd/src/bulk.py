@@ -0,0 +1,167 @@
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+from bson import ObjectId
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+from .hydration import get_list_adapter
+
+
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+
+
+def dump_documents(
+        model: type,
+        documents: Sequence[BaseModel],
+        allow_nulls: bool = False
+    ) -> List[Dict[str, Any]]:
+    """
+    Dumps all the documents with a single call to pydantic-core and gives
+    every document an `_id`, so that the ids are known even if the insert fails.
+    """
+
+    same_model = True
+
+    for document in documents:
+        if not isinstance(document, model):
+            raise ValueError(f'All documents must be instances of `{model}`')
+
+        if type(document) is not model:
+            same_model = False
+
+
+    if same_model:
+
+        docs_data = get_list_adapter(model).dump_python(
+            documents,
+            by_alias=True,
+            exclude_none=not allow_nulls
+        )
+
+    else:
+        """
+        Subclasses have their own serializer.
+        """
+        docs_data = [
+            document.model_dump(
+                by_alias=True,
+                exclude_none=not allow_nulls
+            )
+            for document in documents
+        ]
+
+
+    for doc_data in docs_data:
+        if doc_data.get('_id') is None:
+            doc_data['_id'] = ObjectId()
+
+    return docs_data
+
+
+
+def iter_chunks(
+        docs_data: List[Dict[str, Any]],
+        chunk_size: int
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Yields (offset, chunk). Each chunk is split again by the driver so that
+    every message stays under the server maxBsonObjectSize/maxMessageSizeBytes.
+    """
+
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError('chunk_size must be an integer greater than 0')
+
+    for offset in range(0, len(docs_data), chunk_size):
+        yield offset, docs_data[offset:offset + chunk_size]
+
+
+
+def apply_chunk_result(
+        documents: Sequence[BaseModel],
+        docs_data: List[Dict[str, Any]],
+        offset: int,
+        chunk_length: int,
+        ordered: bool,
+        error: Optional[BulkWriteError] = None
+    ) -> int:
+    """
+    Sets the `_id` back on the documents of the chunk that were inserted
+    and returns how many of them were inserted.
+    """
+
+    if error is None:
+        inserted = range(offset, offset + chunk_length)
+
+    else:
+        failed = set(failed_indexes(error))
+
+        if ordered:
+            """
+            An ordered insert stops at the first error.
+            """
+            inserted = range(offset, offset + min(failed, default=chunk_length))
+        else:
+            inserted = [
+                offset + index for index in range(chunk_length) if index not in failed
+            ]
+
+
+    for index in inserted:
+        documents[index].id = docs_data[index]['_id']
+        documents[index]._mark_clean()
+
+    return len(inserted)
+
+
+
+def merge_bulk_write_errors(
+        errors: List[Tuple[int, BulkWriteError]],
+        inserted_count: int
+    ) -> BulkWriteError:
+    """
+    Merges the errors of several chunks into one BulkWriteError, with the
+    `index` of each write error relative to the whole insert.
+    """
+
+    details = {
+        'writeErrors': [],
+        'writeConcernErrors': [],
+        'nInserted': inserted_count,
+        'nUpserted': 0,
+        'nMatched': 0,
+        'nModified': 0,
+        'nRemoved': 0,
+        'upserted': []
+    }
+
+    for offset, error in errors:
+
+        for write_error in error.details.get('writeErrors', []):
+            details['writeErrors'].append({
+                **write_error,
+                'index': write_error['index'] + offset
+            })
+
+        details['writeConcernErrors'].extend(
+            error.details.get('writeConcernErrors', [])
+            )
+
+    return BulkWriteError(details)
+
+
+
+def failed_indexes(error: BulkWriteError) -> List[int]:
+    return [
+        write_error['index'] for write_error in error.details.get('writeErrors', [])
+    ]
@@ -0,0 +1,389 @@
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Mapping,
+    Optional,
+    Tuple
+)
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+import bson
+from bson.errors import InvalidDocument
+
+from .paths import MISSING
+
+
+
+
+class LRUCache():
+    """
+    Thread-safe LRU cache bounded by number of entries and by bytes,
+    with optional TTL expiry (in seconds).
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            max_bytes: Optional[int] = None,
+            ttl: Optional[float] = None
+        ):
+
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError('max_entries must be an integer greater than 0')
+
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes < 1):
+            raise ValueError('max_bytes must be an integer greater than 0')
+
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be greater than 0')
+
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key: (value, size, expires_at)
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+
+        with self._lock:
+
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+
+    def set(self, key: Hashable, value: Any, size: int = 0):
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            """
+            Would evict the whole cache. Not stored.
+            """
+            self.delete(key)
+            return
+
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+
+    def delete(self, key: Hashable) -> bool:
+
+        with self._lock:
+
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+
+            self._bytes -= entry[1]
+            self.invalidations += 1
+
+            return True
+
+
+    def clear(self):
+
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+
+    def stats(self) -> Dict[str, Any]:
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            }
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+
+
+"""
+find_one(<_id>) cache of each model class, built from its Settings on first use.
+None when the model does not enable it (Settings.cache = False).
+"""
+DOCUMENT_CACHES: Dict[type, Optional[LRUCache]] = {}
+
+
+
+
+def get_document_cache(model: type) -> Optional[LRUCache]:
+
+    try:
+        return DOCUMENT_CACHES[model]
+    except KeyError:
+        pass
+
+
+    settings = getattr(model, 'Settings', None)
+
+    if getattr(settings, 'cache', False):
+        cache = LRUCache(
+            max_entries=getattr(settings, 'cache_max_entries', None) or 1024,
+            max_bytes=getattr(settings, 'cache_max_bytes', None),
+            ttl=getattr(settings, 'cache_ttl', None)
+        )
+    else:
+        cache = None
+
+    return DOCUMENT_CACHES.setdefault(model, cache)
+
+
+
+def get_filter_id(filter: Mapping[str, Any]) -> Any:
+    """
+    The `_id` of a filter that only matches by `_id` equality, else MISSING.
+    Only these lookups are served from the cache (and batched, for AsyncDocument).
+    """
+
+    if len(filter) != 1:
+        return MISSING
+
+    _id = filter.get('_id', MISSING)
+
+    if isinstance(_id, (bson.ObjectId, str, int)):
+        return _id
+
+    return MISSING
+
+
+
+def get_cached_document(
+        cache: LRUCache,
+        collection: Any,
+        _id: Any
+    ) -> Optional[Dict[str, Any]]:
+
+    data = cache.get((collection.full_name, _id), None)
+    if data is None:
+        return None
+
+    return bson.decode(data, codec_options=collection.codec_options)
+
+
+
+def cache_document(
+        model: type,
+        collection: Any,
+        document: Mapping[str, Any]
+    ):
+    """
+    Stores (or refreshes) a full document returned by the server.
+    """
+
+    cache = get_document_cache(model)
+    if cache is None or '_id' not in document:
+        return
+
+    data = bson.encode(document, codec_options=collection.codec_options)
+
+    cache.set(
+        (collection.full_name, document['_id']),
+        data,
+        size=len(data)
+    )
+
+
+
+def invalidate_documents(
+        model: type,
+        collection: Any,
+        ids: Optional[Iterable[Any]] = None
+    ):
+    """
+    Removes the given ids from the cache of the model, or every entry when
+    `ids` is None (writes that can match any document).
+    """
+
+    cache = get_document_cache(model)
+    if cache is None:
+        return
+
+    if ids is None:
+        cache.clear()
+        return
+
+    for _id in ids:
+        cache.delete((collection.full_name, _id))
+
+
+
+
+"""
+count_documents(...) cache of each model class, built from its Settings on
+first use. None when the model does not enable it (Settings.count_cache_ttl = None).
+"""
+COUNT_CACHES: Dict[type, Optional[LRUCache]] = {}
+
+
+"""
+Options that make a count depend on more than the filter (e.g. a snapshot
+of a session). Such counts are never cached.
+"""
+UNCACHED_COUNT_OPTIONS = ('session',)
+
+
+"""
+Options supported by estimated_document_count(...).
+"""
+ESTIMATE_COUNT_OPTIONS = ('maxTimeMS', 'comment')
+
+
+
+
+def get_count_cache(model: type) -> Optional[LRUCache]:
+
+    try:
+        return COUNT_CACHES[model]
+    except KeyError:
+        pass
+
+
+    settings = getattr(model, 'Settings', None)
+    ttl = getattr(settings, 'count_cache_ttl', None)
+
+    if ttl is not None:
+        cache = LRUCache(
+            max_entries=getattr(settings, 'count_cache_max_entries', None) or 256,
+            ttl=ttl
+        )
+    else:
+        cache = None
+
+    return COUNT_CACHES.setdefault(model, cache)
+
+
+
+def can_estimate_count(filter: Mapping[str, Any], kwargs: Mapping[str, Any]) -> bool:
+    """
+    Only the count of the whole collection (empty filter, no skip/limit/...)
+    can be read from the collection metadata.
+    """
+
+    return not filter and all(option in ESTIMATE_COUNT_OPTIONS for option in kwargs)
+
+
+
+def _normalize_filter(value: Any, is_filter: bool = False) -> Any:
+    """
+    The keys of filters and of operator documents ({'$gte': ..., '$lt': ...})
+    are sorted, so the same query written in another order has the same key.
+    Embedded documents compared by equality keep their order (it is significant).
+    """
+
+    if isinstance(value, Mapping):
+
+        if is_filter or all(isinstance(key, str) and key.startswith('$') for key in value):
+            return bson.SON(
+                (key, _normalize_filter(value[key], is_filter=key in ('$and', '$or', '$nor', '$elemMatch')))
+                for key in sorted(value)
+            )
+
+        return bson.SON((key, _normalize_filter(item)) for key, item in value.items())
+
+
+    if isinstance(value, (list, tuple)):
+        """
+        Elements of $and / $or / $nor are filters.
+        """
+        return [_normalize_filter(item, is_filter=is_filter) for item in value]
+
+    return value
+
+
+
+def get_count_key(
+        collection: Any,
+        filter: Mapping[str, Any],
+        estimate: bool,
+        kwargs: Mapping[str, Any]
+    ) -> Any:
+    """
+    (collection, hash of the normalized filter and options) or MISSING when
+    the count cannot be cached.
+    """
+
+    if any(option in kwargs for option in UNCACHED_COUNT_OPTIONS):
+        return MISSING
+
+    try:
+        data = bson.encode({
+            'filter': _normalize_filter(filter, is_filter=True),
+            'estimate': estimate,
+            'options': _normalize_filter(kwargs, is_filter=True)
+        })
+    except InvalidDocument:
+        return MISSING
+
+    return (collection.full_name, hashlib.sha1(data).digest())
+
+
+
+def invalidate_counts(model: type):
+    """
+    Called after every write of the model.
+    """
+
+    cache = COUNT_CACHES.get(model)
+    if cache is not None:
+        cache.clear()
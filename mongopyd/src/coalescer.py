@@ -0,0 +1,217 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple
+)
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    WriteConcernError,
+    WriteError
+)
+
+
+
+
+DEFAULT_WINDOW_US = 1000
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_MAX_PENDING = 10_000
+
+
+
+
+class InsertCoalescer():
+    """
+    Merges the insert_one of concurrent callers into a single unordered
+    `insert_many`: a batch is sent `window_us` microseconds after its first
+    document (the added latency is bounded by the window) or as soon as it
+    holds `max_batch_size` documents. Every caller gets its own `_id` or its
+    own error (DuplicateKeyError, WriteError).
+
+    At most `max_pending` documents wait or are being inserted: the following
+    callers wait for a slot (backpressure).
+
+    Bound to the event loop that created it, like BatchLoader.
+    """
+
+    def __init__(
+            self,
+            collection: Any,
+            window_us: int = DEFAULT_WINDOW_US,
+            max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+            max_pending: int = DEFAULT_MAX_PENDING
+        ):
+
+        if not isinstance(window_us, int) or window_us < 0:
+            raise ValueError('window_us must be an integer greater than or equal to 0')
+
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('max_batch_size must be an integer greater than 0')
+
+        if not isinstance(max_pending, int) or max_pending < max_batch_size:
+            raise ValueError('max_pending must be an integer greater than or equal to max_batch_size')
+
+
+        self.collection = collection
+        self.window_us = window_us
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+
+        self.loop = asyncio.get_running_loop()
+
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._handle: Optional[asyncio.Handle] = None
+
+        # Batches in flight (see BatchLoader._tasks)
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.requested = 0
+
+
+    async def insert(self, document: Dict[str, Any]) -> Any:
+        """
+        Inserts the raw document and returns its `_id` (given to the document
+        if missing, to match the results of the batch).
+        """
+
+        async with self._slots:
+
+            if document.get('_id') is None:
+                document['_id'] = ObjectId()
+
+            future = self.loop.create_future()
+            self._pending.append((document, future))
+            self.requested += 1
+
+
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+
+            elif self._handle is None:
+
+                if self.window_us:
+                    self._handle = self.loop.call_later(self.window_us / 1_000_000, self._dispatch)
+                else:
+                    self._handle = self.loop.call_soon(self._dispatch)
+
+
+            return await future
+
+
+    def _dispatch(self):
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self.batches += 1
+
+        task = self.loop.create_task(self._insert(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    async def _insert(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+
+        errors: Dict[int, Exception] = {}
+        write_concern_error = None
+
+        try:
+            await self.collection.insert_many(
+                [document for document, _ in batch],
+                ordered=False
+            )
+
+        except BulkWriteError as err:
+
+            for write_error in err.details.get('writeErrors', []):
+
+                error_class = DuplicateKeyError if write_error.get('code') == 11000 else WriteError
+                errors[write_error['index']] = error_class(
+                    write_error.get('errmsg'),
+                    write_error.get('code'),
+                    write_error
+                )
+
+            concern_errors = err.details.get('writeConcernErrors', [])
+            if concern_errors:
+                write_concern_error = WriteConcernError(
+                    concern_errors[0].get('errmsg'),
+                    concern_errors[0].get('code'),
+                    concern_errors[0]
+                )
+
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+
+        for index, (document, future) in enumerate(batch):
+
+            if future.done():
+                """
+                The caller was cancelled (the document may still be inserted).
+                """
+                continue
+
+            if index in errors:
+                future.set_exception(errors[index])
+            elif write_concern_error is not None:
+                future.set_exception(write_concern_error)
+            else:
+                future.set_result(document['_id'])
+
+
+
+
+"""
+Coalescer of each (model class, collection), created on first use.
+"""
+INSERT_COALESCERS: Dict[Tuple[type, str], InsertCoalescer] = {}
+
+
+
+
+def get_insert_coalescer(model: type, collection: Any) -> Optional[InsertCoalescer]:
+    """
+    The coalescer of the model for the running event loop.
+    None if Settings.coalesce_inserts is disabled.
+    """
+
+    settings = getattr(model, 'Settings', None)
+
+    if not getattr(settings, 'coalesce_inserts', False):
+        return None
+
+
+    key = (model, collection.full_name)
+
+    coalescer = INSERT_COALESCERS.get(key)
+    if coalescer is None or coalescer.loop is not asyncio.get_running_loop():
+
+        window_us = getattr(settings, 'coalesce_window_us', None)
+
+        coalescer = InsertCoalescer(
+            collection,
+            window_us=DEFAULT_WINDOW_US if window_us is None else window_us,
+            max_batch_size=getattr(settings, 'coalesce_max_size', None) or DEFAULT_MAX_BATCH_SIZE,
+            max_pending=getattr(settings, 'coalesce_max_pending', None) or DEFAULT_MAX_PENDING
+        )
+        INSERT_COALESCERS[key] = coalescer
+
+    return coalescer
@@ -0,0 +1,526 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union
+)
+import asyncio
+import atexit
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .update_builder import get_field_keys
+
+
+
+
+Number = Union[int, float]
+
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_DOCUMENTS = 1000
+
+
+
+
+class BaseCounterAccumulator():
+    """
+    #Sums the `$inc` of hot counters in memory, per `_id` and field, and
+    writes them with one unordered bulk_write (one UpdateOne per document)
+    through Model.bulk_write(...).
+
+    # The increments are written every `interval` seconds by a background
+    #   thread (CounterAccumulator) or task (AsyncCounterAccumulator), as soon
+    #   as `max_documents` documents have pending increments, on flush() and
+    #   on close(). close() is called at the end of a `with` block and at
+    #   interpreter exit.
+    # The increments are written even if the `with` block raises: counted
+    #   events are not rolled back. If that write fails, the exception of the
+    #   block is raised (the write error is in `last_error`).
+    # If the write of close() fails, the increments kept are retried at
+    #   interpreter exit.
+    # The local documents are not updated: read the counters from the server.
+    # If the bulk_write fails (network, ...) the increments are kept for the
+    #   next flush. The increments rejected by the server (write errors) are
+    #   dropped. The last error is in `last_error`.
+    """
+
+    def __init__(
+            self,
+            model: type,
+            interval: float = DEFAULT_INTERVAL,
+            max_documents: int = DEFAULT_MAX_DOCUMENTS,
+            upsert: bool = False,
+            **bulk_write_kwargs: Any
+        ):
+        """
+        # option: interval
+            Default: 1.0
+            Seconds between two flushes of the background thread/task.
+
+        # option: max_documents
+            Default: 1000
+            Documents with pending increments that trigger a flush.
+
+        # option: upsert
+            Default: False
+            Creates the documents that do not exist.
+
+        # option: **bulk_write_kwargs
+            Passed to Model.bulk_write (database, collection, session, ...).
+        """
+
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+
+        if not isinstance(max_documents, int) or max_documents < 1:
+            raise ValueError('max_documents must be an integer greater than 0')
+
+
+        self.model = model
+        self.interval = interval
+        self.max_documents = max_documents
+        self.upsert = upsert
+        self.bulk_write_kwargs = bulk_write_kwargs
+
+        self._increments: Dict[Any, Dict[str, Number]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.flushes = 0
+        self.last_error: Optional[BaseException] = None
+
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.model.__name__} pending={self.pending}>'
+
+
+    @property
+    def pending(self) -> int:
+        """
+        Increments not written yet.
+        """
+        return self._pending
+
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+    def _key(self, field: str) -> str:
+
+        first, _, rest = field.partition('.')
+        key = get_field_keys(self.model).get(first, first)
+
+        return f'{key}.{rest}' if rest else key
+
+
+    def _add(
+            self,
+            _id: Any,
+            field: Union[str, Mapping[str, Number]],
+            amount: Number
+        ) -> bool:
+        """
+        True if the flush threshold is reached.
+        """
+
+        if self._closed:
+            raise RuntimeError('The counter accumulator is closed')
+
+        fields = field if isinstance(field, Mapping) else {field: amount}
+
+        keys = [(self._key(name), value) for name, value in fields.items()]
+
+        with self._lock:
+
+            counters = self._increments.get(_id)
+            if counters is None:
+                counters = self._increments[_id] = {}
+
+            for key, value in keys:
+                counters[key] = counters.get(key, 0) + value
+
+            self._pending += len(keys)
+
+            return len(self._increments) >= self.max_documents
+
+
+    def _take(self) -> Tuple[Dict[Any, Dict[str, Number]], int]:
+
+        with self._lock:
+            increments, pending = self._increments, self._pending
+            self._increments, self._pending = {}, 0
+
+        return increments, pending
+
+
+    def _restore(self, increments: Dict[Any, Dict[str, Number]], pending: int):
+        """
+        Puts back increments that could not be written.
+        """
+
+        with self._lock:
+
+            for _id, fields in increments.items():
+                counters = self._increments.setdefault(_id, {})
+                for key, value in fields.items():
+                    counters[key] = counters.get(key, 0) + value
+
+            self._pending += pending
+
+
+    def _requests(self, increments: Dict[Any, Dict[str, Number]]) -> List[UpdateOne]:
+
+        return [
+            UpdateOne({'_id': _id}, {'$inc': fields}, upsert=self.upsert)
+            for _id, fields in increments.items()
+        ]
+
+
+    def _failed(self, err: BaseException, increments: Dict[Any, Dict[str, Number]], pending: int):
+
+        self.last_error = err
+
+        if not isinstance(err, BulkWriteError):
+            self._restore(increments, pending)
+
+
+
+
+class CounterAccumulator(BaseCounterAccumulator):
+    """
+    For Document, with a background thread.
+
+    with CounterAccumulator(Page) as counters:
+        counters.inc(page_id, 'views')
+        counters.inc(page_id, {'views': 1, 'likes': 1})
+    """
+
+    def __init__(self, model: type, *args: Any, **kwargs: Any):
+        super().__init__(model, *args, **kwargs)
+
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+        return False
+
+
+    def inc(
+            self,
+            _id: Any,
+            field: Union[str, Mapping[str, Number]],
+            amount: Number = 1
+        ):
+        """
+        Adds `amount` to `field` of the document `_id` ({field: amount, ...}
+        for several fields).
+        """
+
+        full = self._add(_id, field, amount)
+
+        if self._thread is None:
+            self._start()
+
+        if full:
+            self._wake.set()
+
+
+    def _start(self):
+
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'mongopyd-counters-{self.model.__name__}',
+                daemon=True
+            )
+            self._thread.start()
+
+        atexit.register(self.close)
+
+
+    def _run(self):
+
+        while not self._closed:
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+            if self._closed:
+                return
+
+            try:
+                self.flush()
+            except Exception:
+                """
+                Kept in last_error, retried at the next flush.
+                """
+                pass
+
+
+    def flush(self) -> int:
+        """
+        Writes the pending increments now. Returns how many were written.
+        """
+
+        with self._flush_lock:
+
+            increments, pending = self._take()
+            if not increments:
+                return 0
+
+            try:
+                self.model.bulk_write(
+                    self._requests(increments),
+                    ordered=False,
+                    **self.bulk_write_kwargs
+                )
+            except Exception as err:
+                self._failed(err, increments, pending)
+                raise
+
+            self.flushes += 1
+
+            return pending
+
+
+    def _stop(self) -> bool:
+        """
+        Stops the background thread. False if already closed.
+        """
+
+        if self._closed:
+            return False
+
+        self._closed = True
+        self._wake.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            atexit.unregister(self.close)
+
+        return True
+
+
+    def close(self):
+        """
+        Stops the background thread and writes the pending increments.
+        """
+
+        if not self._stop():
+            return
+
+        try:
+            self.flush()
+        except Exception:
+            atexit.register(self._flush_at_exit)
+            raise
+
+
+    def _flush_at_exit(self):
+
+        if self.pending:
+            self.flush()
+
+
+
+
+class AsyncCounterAccumulator(BaseCounterAccumulator):
+    """
+    For AsyncDocument, with a background task on the event loop of the
+    first inc(...). At interpreter exit the pending increments are only
+    written if that loop is still usable: prefer `async with` or close().
+
+    async with AsyncCounterAccumulator(Page) as counters:
+        counters.inc(page_id, 'views')
+    """
+
+    def __init__(self, model: type, *args: Any, **kwargs: Any):
+        super().__init__(model, *args, **kwargs)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+
+        try:
+            await self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+        return False
+
+
+    def inc(
+            self,
+            _id: Any,
+            field: Union[str, Mapping[str, Number]],
+            amount: Number = 1
+        ):
+        """
+        Adds `amount` to `field` of the document `_id` ({field: amount, ...}
+        for several fields). Must be called from the event loop.
+        """
+
+        full = self._add(_id, field, amount)
+
+        if self._task is None:
+            self._start()
+
+        if full:
+            self._wake.set()
+
+
+    def _bind(self):
+
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self._flush_lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+
+
+    def _start(self):
+
+        self._bind()
+
+        self._task = self.loop.create_task(self._run())
+        atexit.register(self._close_at_exit)
+
+
+    async def _run(self):
+
+        while not self._closed:
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wake.clear()
+
+            if self._closed:
+                return
+
+            try:
+                await self.flush()
+            except Exception:
+                """
+                Kept in last_error, retried at the next flush.
+                """
+                pass
+
+
+    async def flush(self) -> int:
+        """
+        Writes the pending increments now. Returns how many were written.
+        """
+
+        self._bind()
+
+        async with self._flush_lock:
+
+            increments, pending = self._take()
+            if not increments:
+                return 0
+
+            try:
+                await self.model.bulk_write(
+                    self._requests(increments),
+                    ordered=False,
+                    **self.bulk_write_kwargs
+                )
+            except Exception as err:
+                self._failed(err, increments, pending)
+                raise
+
+            self.flushes += 1
+
+            return pending
+
+
+    async def _stop(self) -> bool:
+        """
+        Stops the background task. False if already closed.
+        """
+
+        if self._closed:
+            return False
+
+        self._closed = True
+
+        if self._task is not None:
+            """
+            Not cancelled: a bulk_write in progress must complete.
+            """
+            self._wake.set()
+            await self._task
+
+            atexit.unregister(self._close_at_exit)
+
+        return True
+
+
+    async def close(self):
+        """
+        Stops the background task and writes the pending increments.
+        """
+
+        if not await self._stop():
+            return
+
+        try:
+            await self.flush()
+        except Exception:
+            atexit.register(self._flush_at_exit)
+            raise
+
+
+    def _flush_at_exit(self):
+
+        if not self.pending or self.loop.is_closed() or self.loop.is_running():
+            return
+
+        self.loop.run_until_complete(self.flush())
+
+
+    def _close_at_exit(self):
+
+        if self._closed or self.loop is None:
+            return
+
+        if self.loop.is_closed() or self.loop.is_running():
+            return
+
+        self.loop.run_until_complete(self.close())
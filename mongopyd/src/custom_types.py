@@ -1,54 +1,155 @@
 from typing_extensions import Annotated
 from typing import Union, Any, Dict
+import copy
+import functools
+import json
 from bson import ObjectId
+from bson.errors import InvalidId
 from pydantic import (
-    # PlainSerializer,
     AfterValidator,
-    # WithJsonSchema
+    GetCoreSchemaHandler,
+    GetJsonSchemaHandler
     )
+from pydantic.json_schema import JsonSchemaValue
+from pydantic_core import core_schema
 import yaml
 
 
 
 
 def func_validade_objectid(value: Any):
-    
-    if not ObjectId.is_valid(value):
+
+    if isinstance(value, ObjectId):
+        return value
+
+    """
+    ObjectId(...) already checks the value: parsing it once is enough.
+    """
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
         raise ValueError('Invalid ObjectId')
 
-    return ObjectId(value)
 
 
+class ObjectIdAnnotation():
+    """
+    #Pydantic core schema of PydanticObjectId.
 
-def func_validade_json_or_dict(value: Any):
-    valid = None
+    # python: ObjectId instances pass through as they are (checked in
+    #   pydantic-core, no Python callback), str is parsed once.
+    # json: 24-character hex string.
+    # serialization: ObjectId in python mode, str in json mode.
+    """
 
-    if not valid:
-        if isinstance(value, dict):
-            valid = True
+    @classmethod
+    def __get_pydantic_core_schema__(
+            self,
+            source: Any,
+            handler: GetCoreSchemaHandler
+        ) -> core_schema.CoreSchema:
 
-    if not valid:
-        try:
-            value = yaml.load(value, Loader=yaml.Loader)
-            valid = True
-        except yaml.parser.ParserError:
-            valid = False
+        from_str = core_schema.chain_schema([
+            core_schema.str_schema(),
+            core_schema.no_info_plain_validator_function(func_validade_objectid)
+        ])
 
+        return core_schema.json_or_python_schema(
+            json_schema=from_str,
+            python_schema=core_schema.union_schema([
+                core_schema.is_instance_schema(ObjectId),
+                from_str
+            ]),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                str,
+                when_used='json'
+            )
+        )
+
+
+    @classmethod
+    def __get_pydantic_json_schema__(
+            self,
+            schema: core_schema.CoreSchema,
+            handler: GetJsonSchemaHandler
+        ) -> JsonSchemaValue:
+
+        return {
+            'type': 'string',
+            'pattern': '^[0-9a-fA-F]{24}$',
+            'examples': ['5eb7cf5a86d9755df3a6c593']
+        }
+
+
+
+"""
+C implementation of the safe loader when PyYAML was built with libyaml.
+The full loader (yaml.Loader) can build arbitrary Python objects.
+"""
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+"""
+Strings longer than this are parsed without going through the cache.
+"""
+YAML_CACHE_MAX_LENGTH = 64 * 1024
+
+
+
+def _load_yaml(value: str) -> Any:
+    return yaml.load(value, Loader=YAML_LOADER)
 
-    if not valid:
-        raise ValueError("Invalid DICT/JSON")
 
+_cached_load_yaml = functools.lru_cache(maxsize=1024)(_load_yaml)
 
-    return value
+
+
+def configure_json_or_dict_cache(maxsize: int = 1024):
+    """
+    #Size of the cache of parsed YAML strings (JsonORDictField).
+
+    # option: maxsize
+        Number of distinct strings kept. 0 disables the cache.
+    """
+    global _cached_load_yaml
+
+    if maxsize:
+        _cached_load_yaml = functools.lru_cache(maxsize=maxsize)(_load_yaml)
+    else:
+        _cached_load_yaml = _load_yaml
+
+
+
+def func_validade_json_or_dict(value: Any):
+
+    if isinstance(value, dict):
+        return value
+
+    """
+    Most payloads are JSON: json.loads is much faster than any YAML loader.
+    """
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        pass
+
+    try:
+        if len(value) > YAML_CACHE_MAX_LENGTH:
+            return _load_yaml(value)
+
+        """
+        The cached result is shared: every caller gets its own copy.
+        """
+        return copy.deepcopy(_cached_load_yaml(value))
+
+    except yaml.YAMLError:
+        raise ValueError("Invalid DICT/JSON")
 
 
 
 
 PydanticObjectId = Annotated[
-    Union[str, ObjectId],
-    AfterValidator(func_validade_objectid)
-    # PlainSerializer(lambda x: str(x), return_type=str),
-    # WithJsonSchema({"type": "string"}, mode="serialization")
+    ObjectId,
+    ObjectIdAnnotation
 ]
 
 
@@ -0,0 +1,219 @@
+from typing import (
+    Any,
+    Dict,
+    Literal,
+    Mapping,
+    Optional,
+    Callable,
+    List,
+    Tuple
+)
+import functools
+import itertools
+
+from pydantic import (
+    BaseModel,
+    TypeAdapter
+)
+
+
+
+
+HydrationMode = Literal['validate', 'construct']
+
+HYDRATION_MODES = ('validate', 'construct')
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+"""
+One counter per model class, so `validate_sample` keeps its 1 in N ratio
+across calls (e.g. many find_one(...) calls) and not only inside one cursor.
+"""
+_SAMPLE_COUNTERS: Dict[type, 'itertools.count'] = {}
+
+_CONSTRUCT_PLANS: Dict[type, Tuple[Dict[str, str], List[Tuple[str, Any, Optional[Callable]]], bool]] = {}
+
+_IMMUTABLE_DEFAULT_TYPES = (type(None), bool, int, float, str, bytes, frozenset)
+
+_LIST_ADAPTERS: Dict[type, TypeAdapter] = {}
+
+
+
+
+def get_list_adapter(model: type) -> TypeAdapter:
+    """
+    TypeAdapter(List[model]): validates or dumps a whole list of documents
+    with a single call to pydantic-core.
+    """
+
+    adapter = _LIST_ADAPTERS.get(model)
+    if adapter is None:
+        adapter = _LIST_ADAPTERS.setdefault(model, TypeAdapter(List[model]))
+
+    return adapter
+
+
+
+
+def _get_construct_plan(model: type) -> Tuple[Dict[str, str], List[Tuple[str, Any, Optional[Callable]]], bool]:
+
+    plan = _CONSTRUCT_PLANS.get(model)
+    if plan is not None:
+        return plan
+
+
+    keys_to_fields = {}
+    optional_fields = []
+
+    for name, field in model.model_fields.items():
+
+        keys_to_fields[name] = name
+
+        if isinstance(field.validation_alias, str):
+            keys_to_fields[field.validation_alias] = name
+
+        if field.alias is not None:
+            keys_to_fields[field.alias] = name
+
+        if field.is_required():
+            continue
+
+        if field.default_factory is None and isinstance(field.default, _IMMUTABLE_DEFAULT_TYPES):
+            """
+            Shared as is, only mutable defaults need a copy per instance.
+            """
+            optional_fields.append((name, field.default, None))
+        else:
+            optional_fields.append((
+                name,
+                None,
+                functools.partial(field.get_default, call_default_factory=True)
+                ))
+
+
+    plan = (
+        keys_to_fields,
+        optional_fields,
+        model.model_config.get('extra') == 'allow'
+    )
+    _CONSTRUCT_PLANS[model] = plan
+
+    return plan
+
+
+
+def construct(model: type, document: Mapping[str, Any]) -> BaseModel:
+    """
+    Same result as `model.model_construct(**document)`, but the key/alias
+    mapping of the model is computed once per class instead of on every call.
+    """
+
+    keys_to_fields, optional_fields, allow_extra = _get_construct_plan(model)
+
+    fields_values = {}
+    extra = {} if allow_extra else None
+
+    for key, value in document.items():
+        name = keys_to_fields.get(key)
+        if name is not None:
+            fields_values[name] = value
+        elif extra is not None:
+            extra[key] = value
+
+    fields_set = set(fields_values)
+
+    for name, default, get_default in optional_fields:
+        if name not in fields_values:
+            fields_values[name] = default if get_default is None else get_default()
+
+
+    instance = model.__new__(model)
+    object.__setattr__(instance, '__dict__', fields_values)
+    object.__setattr__(instance, '__pydantic_fields_set__', fields_set)
+    object.__setattr__(instance, '__pydantic_extra__', extra)
+
+    if model.__pydantic_post_init__:
+        instance.model_post_init(None)
+    else:
+        object.__setattr__(instance, '__pydantic_private__', None)
+
+    return instance
+
+
+
+
+class Hydrator():
+    """
+    Builds model instances from documents returned by the server.
+
+    # 'validate' (default): full Pydantic validation, same as `Model(**document)`.
+    # 'construct': trusted data, built with `Model.model_construct(...)`.
+        Nested models are not built and stay as dicts. See: construct(...)
+        With `validate_sample=N`, one document in N is still fully validated
+        so that schema drift raises a ValidationError.
+
+    Both values can be set per model in `Settings.hydration` and
+    `Settings.hydration_validate_sample`, and overridden per call.
+    """
+
+    __slots__ = ('model', 'mode', 'validate_sample', '_counter')
+
+
+    def __init__(
+            self,
+            model: type,
+            mode: Optional[HydrationMode] = None,
+            validate_sample: Optional[int] = None
+        ):
+
+        settings = getattr(model, 'Settings', None)
+
+        if mode is None:
+            mode = getattr(settings, 'hydration', None) or 'validate'
+
+        if mode not in HYDRATION_MODES:
+            raise ValueError(f'Hydration mode `{mode}` is invalid. Use one of: {HYDRATION_MODES}')
+
+
+        if validate_sample is None:
+            validate_sample = getattr(settings, 'hydration_validate_sample', None)
+
+        if validate_sample is not None:
+            if not isinstance(validate_sample, int) or validate_sample < 1:
+                raise ValueError('validate_sample must be an integer greater than 0')
+
+
+        self.model = model
+        self.mode = mode
+        self.validate_sample = validate_sample
+        self._counter = None
+
+        if mode == 'construct' and validate_sample is not None:
+            counter = _SAMPLE_COUNTERS.get(model)
+            if counter is None:
+                counter = _SAMPLE_COUNTERS.setdefault(model, itertools.count())
+            self._counter = counter
+
+
+    def __call__(self, document: Mapping[str, Any]) -> BaseModel:
+
+        if self.mode == 'validate':
+            return self.model(**document)
+
+        if self._counter is not None and next(self._counter) % self.validate_sample == 0:
+            return self.model(**document)
+
+        return construct(self.model, document)
+
+
+    def many(self, documents: List[Mapping[str, Any]]) -> List[BaseModel]:
+        """
+        Same as `[hydrate(document) for document in documents]`. In 'validate'
+        mode the whole batch is validated with a single call to pydantic-core.
+        """
+
+        if self.mode == 'validate':
+            return get_list_adapter(self.model).validate_python(documents)
+
+        return [self(document) for document in documents]
@@ -0,0 +1,337 @@
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from pymongo import IndexModel
+
+
+
+
+"""
+Options that the server adds to index_information() or that do not change
+the index.
+"""
+IGNORED_OPTIONS = frozenset((
+    'v',
+    'ns',
+    'key',
+    'name',
+    'background',
+    'textIndexVersion',
+    '2dsphereIndexVersion'
+))
+
+
+"""
+Options that the server fills with defaults when they are not given. They
+are only compared when declared (and for documents, only the declared keys).
+"""
+DEFAULTED_OPTIONS = frozenset((
+    'weights',
+    'default_language',
+    'language_override',
+    'collation',
+    'bits',
+    'min',
+    'max'
+))
+
+
+
+
+@dataclass
+class IndexPlan:
+    """
+    Diff between Settings.indexes and the indexes of the collection, by
+    index name. `applied` is False for a dry run.
+
+    # conflicts: declared indexes that cannot be created without dropping an
+    #   existing one (build_indexes raises, unless replace_conflicts).
+    # undeclared: existing indexes that no model of the collection declares
+    #   (only dropped with drop_undeclared).
+    """
+
+    collection: str
+    create: List[str] = field(default_factory=list)
+    drop: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    undeclared: List[str] = field(default_factory=list)
+    applied: bool = False
+
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.create or self.drop)
+
+
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Numbers as the server returns them (1.0 for 1) compare equal, documents
+    are compared as plain dicts.
+    """
+
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    if isinstance(value, Mapping):
+        return {key: _normalize(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+
+    return value
+
+
+
+def _normalize_key(key: Any) -> Tuple[Tuple[str, Any], ...]:
+    """
+    The key of a text index is stored as `_fts`/`_ftsx` in place of the text fields.
+    """
+
+    if isinstance(key, Mapping):
+        key = key.items()
+
+    normalized = []
+    has_text = False
+
+    for name, direction in key:
+
+        direction = _normalize(direction)
+
+        if direction == 'text' or name in ('_fts', '_ftsx'):
+            if not has_text:
+                normalized.extend((('_fts', 'text'), ('_ftsx', 1)))
+                has_text = True
+            continue
+
+        normalized.append((name, direction))
+
+    return tuple(normalized)
+
+
+
+def _options_match(declared: Mapping[str, Any], existing: Mapping[str, Any]) -> bool:
+
+    names = (set(declared) | set(existing)) - IGNORED_OPTIONS
+
+    for name in names:
+
+        declared_value = _normalize(declared.get(name))
+        existing_value = _normalize(existing.get(name))
+
+        if name in DEFAULTED_OPTIONS:
+
+            if name not in declared:
+                continue
+
+            if isinstance(declared_value, dict) and isinstance(existing_value, dict):
+                existing_value = {key: existing_value.get(key) for key in declared_value}
+
+        elif declared_value is False or existing_value is False:
+            """
+            unique=False, sparse=False... are not stored by the server.
+            """
+            declared_value = declared_value or None
+            existing_value = existing_value or None
+
+        if declared_value != existing_value:
+            return False
+
+    return True
+
+
+
+def _match_index(
+        index: IndexModel,
+        existing: Mapping[str, Mapping[str, Any]],
+        existing_keys: Mapping[str, Tuple[Tuple[str, Any], ...]]
+    ) -> Tuple[Optional[str], List[str]]:
+    """
+    (name of the existing index identical to `index` or None, names of the
+    existing indexes with the same key).
+    """
+
+    if not isinstance(index, IndexModel):
+        raise ValueError('Settings.indexes must be a list of `pymongo.IndexModel`')
+
+    document = index.document
+    key = _normalize_key(document['key'])
+
+    same_key = [name for name, existing_key in existing_keys.items() if existing_key == key]
+
+    match = next(
+        (name for name in same_key if _options_match(document, existing[name])),
+        None
+    )
+
+    return match, same_key
+
+
+
+def plan_indexes(
+        collection_name: str,
+        declared: Sequence[IndexModel],
+        existing: Mapping[str, Mapping[str, Any]],
+        drop_undeclared: bool = False,
+        replace_conflicts: bool = False,
+        shared: Sequence[IndexModel] = ()
+    ) -> Tuple[IndexPlan, List[IndexModel]]:
+    """
+    (plan, indexes to create) from the declared IndexModels and the result
+    of collection.index_information().
+
+    # replace_conflicts: the existing indexes that block a declared one are
+    #   dropped and the declared one is created.
+    # shared: the indexes declared by the other models of the collection.
+    #   They are not created here, but they are not undeclared either.
+    """
+
+    plan = IndexPlan(collection=collection_name)
+
+    existing_keys = {
+        name: _normalize_key(info['key'])
+        for name, info in existing.items()
+    }
+
+    matched = {'_id_'}
+    pending = []
+
+
+    for index in declared:
+
+        match, same_key = _match_index(index, existing, existing_keys)
+
+        if match is not None:
+            plan.unchanged.append(match)
+            matched.add(match)
+        else:
+            pending.append((index, same_key))
+
+
+    for index in shared:
+
+        match, _ = _match_index(index, existing, existing_keys)
+
+        if match is not None:
+            matched.add(match)
+
+
+    plan.undeclared = [name for name in existing if name not in matched]
+
+    if drop_undeclared:
+        plan.drop = list(plan.undeclared)
+
+
+    to_create = []
+
+    for index, same_key in pending:
+
+        name = index.document['name']
+
+        blocked = [
+            existing_name for existing_name in dict.fromkeys(same_key + [name])
+            if existing_name in existing and existing_name not in plan.drop
+        ]
+
+        if blocked and replace_conflicts and not any(name in matched for name in blocked):
+            plan.drop.extend(blocked)
+            blocked = []
+
+        if blocked:
+            """
+            Same key with other options, or same name with another key: the
+            server would refuse to create it.
+            """
+            plan.conflicts.append(name)
+        else:
+            plan.create.append(name)
+            to_create.append(index)
+
+    return plan, to_create
+
+
+
+def check_conflicts(plan: IndexPlan):
+
+    if plan.conflicts:
+        raise RuntimeError(
+            f'The indexes {", ".join(map(repr, plan.conflicts))} of {plan.collection} conflict with'
+            ' existing indexes (same key with other options, or same name with another key).'
+            ' Use replace_conflicts=True to drop and recreate them.'
+        )
+
+
+
+def get_shared_indexes(
+        root: type,
+        model: type,
+        collection_name: str,
+        get_collection_name: Callable[[type], str]
+    ) -> List[IndexModel]:
+    """
+    Settings.indexes of the other models (subclasses of `root`) whose
+    collection is `collection_name` (full name). The models whose collection
+    cannot be resolved are skipped.
+    """
+
+    indexes = []
+    settings = getattr(model, 'Settings', None)
+
+    for other in get_index_models(root):
+
+        if other is model or getattr(other, 'Settings', None) is settings:
+            continue
+
+        try:
+            other_name = get_collection_name(other)
+        except Exception:
+            continue
+
+        if other_name == collection_name:
+            indexes.extend(other.Settings.indexes)
+
+    return indexes
+
+
+
+def get_index_models(model: type) -> List[type]:
+    """
+    `model` and every subclass of it, recursively, that declares Settings.indexes.
+    Subclasses that inherit the Settings of their parent are skipped (same collection).
+    """
+
+    models = []
+    seen = set()
+    settings_seen = set()
+    stack = [model]
+
+    while stack:
+
+        subclass = stack.pop(0)
+        if subclass in seen:
+            continue
+
+        seen.add(subclass)
+        stack.extend(subclass.__subclasses__())
+
+        settings = getattr(subclass, 'Settings', None)
+
+        if settings is None or settings in settings_seen:
+            continue
+
+        settings_seen.add(settings)
+
+        if getattr(settings, 'indexes', None) and getattr(settings, 'name', None):
+            models.append(subclass)
+
+    return models
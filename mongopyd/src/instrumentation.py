@@ -0,0 +1,563 @@
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    AsyncIterator,
+    Mapping,
+    Optional,
+    Tuple
+)
+from contextvars import ContextVar
+import functools
+import math
+import threading
+import time
+import warnings
+
+import bson
+from bson.errors import InvalidDocument
+
+from .query_shapes import FilterShape, filter_shape
+
+
+
+
+@dataclass
+class OperationEvent:
+    """
+    One call of an instrumented method, passed to the hooks.
+
+    Before the call (pre) only the model, method, collection and filter are
+    set. After it (post), `duration` (seconds), `documents` (returned by the
+    server) and `error` (the exception raised, if any).
+    For cursors (find), `duration` only counts the waits for the server.
+
+    `bytes` (BSON size of the returned documents) costs one bson.encode per
+    document: it stays 0 unless a registered hook sets `count_bytes`.
+
+    `collection_handle` is the pymongo (or motor) collection used.
+    """
+
+    model: type
+    method: str
+    collection: str
+    filter: Optional[Mapping[str, Any]] = None
+    duration: float = 0.0
+    documents: int = 0
+    bytes: int = 0
+    error: Optional[BaseException] = None
+    collection_handle: Any = field(default=None, repr=False, compare=False)
+
+
+    @property
+    def shape(self) -> FilterShape:
+        """
+        The filter without its values. See: mongopyd.src.query_shapes.filter_shape
+        """
+        return filter_shape(self.filter or {})
+
+
+
+
+class InstrumentationHook():
+    """
+    Base class of the hooks. Override `pre` and/or `post`.
+    They run in the thread (or task) of the operation, keep them cheap.
+    An exception raised by a hook is turned into a RuntimeWarning: it never
+    replaces the result or the error of the operation.
+    """
+
+    """
+    Set to True to get `event.bytes` counted.
+    """
+    count_bytes = False
+
+    def pre(self, event: OperationEvent):
+        pass
+
+
+    def post(self, event: OperationEvent):
+        pass
+
+
+
+
+"""
+The registered hooks. An empty tuple (the default) turns the instrumentation
+off: the decorated methods then only pay for one truth test.
+"""
+_HOOKS: Tuple[InstrumentationHook, ...] = ()
+_HOOKS_LOCK = threading.Lock()
+
+
+"""
+True when a registered hook has `count_bytes`.
+"""
+_COUNT_BYTES = False
+
+
+"""
+The event of the operation running in this context, to count what it reads.
+"""
+_CURRENT_EVENT: ContextVar[Optional[OperationEvent]] = ContextVar('mongopyd_operation_event', default=None)
+
+
+
+
+def register_hook(hook: InstrumentationHook) -> InstrumentationHook:
+
+    if not isinstance(hook, InstrumentationHook):
+        raise ValueError(f'The hook must be an instance of `{InstrumentationHook}`')
+
+    global _HOOKS, _COUNT_BYTES
+    with _HOOKS_LOCK:
+        if hook not in _HOOKS:
+            _HOOKS = _HOOKS + (hook,)
+            _COUNT_BYTES = any(registered.count_bytes for registered in _HOOKS)
+
+    return hook
+
+
+
+def unregister_hook(hook: InstrumentationHook):
+
+    global _HOOKS, _COUNT_BYTES
+    with _HOOKS_LOCK:
+        _HOOKS = tuple(registered for registered in _HOOKS if registered is not hook)
+        _COUNT_BYTES = any(registered.count_bytes for registered in _HOOKS)
+
+
+
+def get_hooks() -> Tuple[InstrumentationHook, ...]:
+    return _HOOKS
+
+
+
+def note_result(document: Optional[Mapping[str, Any]], codec_options: Any = None):
+    """
+    Counts a document read by the current operation (and its BSON size, see
+    OperationEvent.bytes).
+    Does nothing outside of an instrumented operation.
+    """
+
+    if document is None:
+        return
+
+    event = _CURRENT_EVENT.get()
+    if event is None:
+        return
+
+    _count_document(event, document, codec_options)
+
+
+
+
+def start_operation(
+        model: type,
+        method: str,
+        collection: Any,
+        filter: Optional[Mapping[str, Any]]
+    ) -> OperationEvent:
+    """
+    Creates the event of an operation and runs the pre hooks.
+    """
+
+    event = OperationEvent(
+        model=model,
+        method=method,
+        collection=getattr(collection, 'full_name', str(collection)),
+        filter=filter,
+        collection_handle=collection
+    )
+
+    for hook in _HOOKS:
+        _run_hook(hook.pre, event)
+
+    return event
+
+
+
+def _run_hook(method: Callable[[OperationEvent], Any], event: OperationEvent):
+
+    try:
+        method(event)
+    except Exception as err:
+        warnings.warn(
+            f'Instrumentation hook {method.__qualname__} failed on {event.method}: {err!r}',
+            RuntimeWarning,
+            stacklevel=2
+        )
+
+
+
+def _start_event(
+        method: str,
+        self: Any,
+        args: Tuple[Any, ...],
+        kwargs: Mapping[str, Any],
+        collection: Any
+    ) -> OperationEvent:
+
+    if isinstance(self, type):
+        model = self
+        filter = kwargs.get('filter', args[0] if args else None)
+        if filter is not None and not isinstance(filter, Mapping):
+            """
+            find_one(<ObjectId | str>)
+            """
+            filter = {'_id': filter}
+    else:
+        model = self.__class__
+        filter = {'_id': getattr(self, 'id', None)}
+        extra_filter = kwargs.get('filter', args[0] if args else None)
+        if isinstance(extra_filter, Mapping):
+            filter.update(extra_filter)
+
+    return start_operation(model, method, collection, filter)
+
+
+
+def _end_event(event: OperationEvent, started: float):
+
+    event.duration = time.perf_counter() - started
+
+    for hook in _HOOKS:
+        _run_hook(hook.post, event)
+
+
+
+def _count_document(event: OperationEvent, document: Any, codec_options: Any):
+
+    event.documents += 1
+
+    if not _COUNT_BYTES:
+        return
+
+    try:
+        event.bytes += len(bson.encode(document, codec_options=codec_options or bson.DEFAULT_CODEC_OPTIONS))
+    except InvalidDocument:
+        pass
+
+
+
+def instrument_cursor(
+        model: type,
+        method: str,
+        collection: Any,
+        filter: Optional[Mapping[str, Any]],
+        results: Iterator[Any]
+    ) -> Iterator[Any]:
+    """
+    The cursor itself when no hook is registered, else a generator over it
+    that runs the post hooks once it is exhausted (or closed).
+    """
+
+    if not _HOOKS:
+        return results
+
+    return _iter_instrumented(
+        start_operation(model, method, collection, filter),
+        results,
+        collection.codec_options
+        )
+
+
+
+def _iter_instrumented(
+        event: OperationEvent,
+        results: Iterator[Any],
+        codec_options: Any
+    ) -> Iterator[Any]:
+
+    results = iter(results)
+
+    try:
+        while True:
+
+            started = time.perf_counter()
+
+            try:
+                result = next(results)
+            except StopIteration:
+                return
+            except BaseException as err:
+                event.error = err
+                raise
+            finally:
+                event.duration += time.perf_counter() - started
+
+            _count_document(event, result, codec_options)
+
+            yield result
+
+    finally:
+        for hook in _HOOKS:
+            _run_hook(hook.post, event)
+
+
+
+def instrument_async_cursor(
+        model: type,
+        method: str,
+        collection: Any,
+        filter: Optional[Mapping[str, Any]],
+        results: AsyncIterator[Any]
+    ) -> AsyncIterator[Any]:
+    """
+    instrument_cursor(...) for motor cursors.
+    """
+
+    if not _HOOKS:
+        return results
+
+    return _aiter_instrumented(
+        start_operation(model, method, collection, filter),
+        results,
+        collection.codec_options
+        )
+
+
+
+async def _aiter_instrumented(
+        event: OperationEvent,
+        results: AsyncIterator[Any],
+        codec_options: Any
+    ) -> AsyncIterator[Any]:
+
+    results = results.__aiter__()
+
+    try:
+        while True:
+
+            started = time.perf_counter()
+
+            try:
+                result = await results.__anext__()
+            except StopAsyncIteration:
+                return
+            except BaseException as err:
+                event.error = err
+                raise
+            finally:
+                event.duration += time.perf_counter() - started
+
+            _count_document(event, result, codec_options)
+
+            yield result
+
+    finally:
+        for hook in _HOOKS:
+            _run_hook(hook.post, event)
+
+
+
+def instrumented(method: str) -> Callable:
+    """
+    Runs the hooks around a method decorated with need_database_and_collection
+    (it must be placed under it, to receive the resolved collection).
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+
+            if not _HOOKS:
+                return func(self, *args, **kwargs)
+
+
+            event = _start_event(method, self, args, kwargs, kwargs.get('collection'))
+            token = _CURRENT_EVENT.set(event)
+            started = time.perf_counter()
+
+            try:
+                return func(self, *args, **kwargs)
+            except BaseException as err:
+                event.error = err
+                raise
+            finally:
+                _CURRENT_EVENT.reset(token)
+                _end_event(event, started)
+
+
+        return wrapper
+
+    return decorator
+
+
+
+def instrumented_async(method: str) -> Callable:
+    """
+    instrumented(...) for coroutine methods.
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+
+            if not _HOOKS:
+                return await func(self, *args, **kwargs)
+
+
+            event = _start_event(method, self, args, kwargs, kwargs.get('collection'))
+            token = _CURRENT_EVENT.set(event)
+            started = time.perf_counter()
+
+            try:
+                return await func(self, *args, **kwargs)
+            except BaseException as err:
+                event.error = err
+                raise
+            finally:
+                _CURRENT_EVENT.reset(token)
+                _end_event(event, started)
+
+
+        return wrapper
+
+    return decorator
+
+
+
+
+"""
+Bucket width of the histograms: 8 buckets per power of two, so a
+percentile is within ~9% of the real value.
+"""
+BUCKETS_PER_OCTAVE = 8
+
+
+
+
+class _Series():
+
+    __slots__ = ('count', 'errors', 'total', 'min', 'max', 'documents', 'bytes', 'buckets')
+
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.documents = 0
+        self.bytes = 0
+        self.buckets: Dict[int, int] = {}
+
+
+    def add(self, event: OperationEvent):
+
+        duration = event.duration
+
+        self.count += 1
+        self.total += duration
+        self.documents += event.documents
+        self.bytes += event.bytes
+
+        if event.error is not None:
+            self.errors += 1
+
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+
+        """
+        Microseconds, on a log scale.
+        """
+        microseconds = duration * 1_000_000
+        bucket = int(math.log2(microseconds) * BUCKETS_PER_OCTAVE) if microseconds > 1 else 0
+
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+
+    def percentile(self, percent: float) -> float:
+        """
+        Upper bound of the bucket of the percentile, in seconds (at most the max).
+        """
+
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1_000_000
+                return min(max(upper, self.min), self.max)
+
+        return self.max
+
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'documents': self.documents,
+            'bytes': self.bytes
+        }
+
+
+
+
+class LatencyHistogram(InstrumentationHook):
+    """
+    In-process latency histograms per model and per method.
+
+    histogram = register_hook(LatencyHistogram())
+    ...
+    histogram.dump() -> {'app.models.User': {'find_one': {'count': ..., 'p50': ..., 'p95': ..., 'p99': ...}}}
+
+    The models are keyed by module and qualified name, so models sharing a
+    name do not overwrite each other. The times are in seconds.
+    """
+
+    def __init__(self, count_bytes: bool = False):
+        """
+        # option: count_bytes
+            Default: False
+            Also sums the BSON size of the returned documents ('bytes').
+        """
+
+        self.count_bytes = count_bytes
+        self._series: Dict[Tuple[type, str], _Series] = {}
+        self._lock = threading.Lock()
+
+
+    def post(self, event: OperationEvent):
+
+        key = (event.model, event.method)
+
+        with self._lock:
+
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+
+            series.add(event)
+
+
+    def dump(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+
+        with self._lock:
+
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+            for (model, method), series in self._series.items():
+                result.setdefault(f'{model.__module__}.{model.__qualname__}', {})[method] = series.dump()
+
+            return result
+
+
+    def reset(self):
+
+        with self._lock:
+            self._series.clear()
@@ -0,0 +1,187 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple
+)
+import asyncio
+import copy
+
+
+
+
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+
+
+
+class BatchLoader():
+    """
+    Coalesces the `_id` lookups requested during the same event loop tick
+    (or during `window_us` microseconds) into a single
+    `find({'_id': {'$in': [...]}})`, then resolves every waiting caller.
+
+    Bound to the event loop that created it.
+    """
+
+    def __init__(
+            self,
+            collection: Any,
+            window_us: int = 0,
+            max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+        ):
+
+        if not isinstance(window_us, int) or window_us < 0:
+            raise ValueError('window_us must be an integer greater than or equal to 0')
+
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('max_batch_size must be an integer greater than 0')
+
+
+        self.collection = collection
+        self.window_us = window_us
+        self.max_batch_size = max_batch_size
+
+        self.loop = asyncio.get_running_loop()
+
+        # _id: futures of the callers waiting for it
+        self._pending: Dict[Any, List[asyncio.Future]] = {}
+        self._handle: Optional[asyncio.Handle] = None
+
+        """
+        The loop only keeps weak references to its tasks: a batch in flight
+        must stay referenced until it resolves its callers.
+        """
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.requested = 0
+
+
+    async def load(self, _id: Any) -> Optional[Dict[str, Any]]:
+        """
+        The raw document with this `_id`, or None.
+        """
+
+        future = self.loop.create_future()
+
+        waiters = self._pending.get(_id)
+        if waiters is None:
+            self._pending[_id] = [future]
+        else:
+            waiters.append(future)
+
+        self.requested += 1
+
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+
+        elif self._handle is None:
+
+            if self.window_us:
+                self._handle = self.loop.call_later(self.window_us / 1_000_000, self._dispatch)
+            else:
+                self._handle = self.loop.call_soon(self._dispatch)
+
+
+        return await future
+
+
+    def _dispatch(self):
+
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = {}
+        self.batches += 1
+
+        task = self.loop.create_task(self._fetch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    async def _fetch(self, batch: Dict[Any, List[asyncio.Future]]):
+
+        try:
+            documents = await self.collection.find(
+                {'_id': {'$in': list(batch)}}
+            ).to_list(length=None)
+
+        except Exception as err:
+            for waiters in batch.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(err)
+            return
+
+
+        documents_by_id = {document['_id']: document for document in documents}
+
+        for _id, waiters in batch.items():
+
+            document = documents_by_id.get(_id)
+
+            for index, future in enumerate(waiters):
+
+                if future.done():
+                    """
+                    The caller was cancelled.
+                    """
+                    continue
+
+                if document is not None and index > 0:
+                    """
+                    Every caller gets its own copy.
+                    """
+                    future.set_result(copy.deepcopy(document))
+                else:
+                    future.set_result(document)
+
+
+
+
+"""
+Loader of each (model class, collection), created on first use.
+"""
+BATCH_LOADERS: Dict[Tuple[type, str], BatchLoader] = {}
+
+
+
+
+def get_batch_loader(
+        model: type,
+        collection: Any,
+        required: bool = False
+    ) -> Optional[BatchLoader]:
+    """
+    The loader of the model for the running event loop.
+    None if Settings.batch_find_one is disabled, unless `required`.
+    """
+
+    settings = getattr(model, 'Settings', None)
+
+    if not required and not getattr(settings, 'batch_find_one', False):
+        return None
+
+
+    key = (model, collection.full_name)
+
+    loader = BATCH_LOADERS.get(key)
+    if loader is None or loader.loop is not asyncio.get_running_loop():
+
+        loader = BatchLoader(
+            collection,
+            window_us=getattr(settings, 'batch_window_us', None) or 0,
+            max_batch_size=getattr(settings, 'batch_max_size', None) or DEFAULT_MAX_BATCH_SIZE
+        )
+        BATCH_LOADERS[key] = loader
+
+    return loader
@@ -0,0 +1,336 @@
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+import base64
+import binascii
+
+import bson
+from bson.errors import BSONError
+
+from .partitions import get_key_value
+from .paths import split_path
+
+
+
+
+SortSpec = Union[str, Sequence[Tuple[str, int]], Mapping[str, int]]
+
+
+"""
+Cursor options that are replaced by the page range.
+"""
+UNSUPPORTED_OPTIONS = ('sort', 'skip', 'limit')
+
+
+
+
+@dataclass
+class Page:
+    """
+    One page of paginate(...). `next_token` is passed as `after` to get the
+    next page, and is None on the last one.
+    """
+
+    items: List[Any] = field(default_factory=list)
+    next_token: Optional[str] = None
+
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_token is not None
+
+
+
+
+def normalize_sort(sort: Optional[SortSpec]) -> List[Tuple[str, int]]:
+    """
+    [(key, 1 | -1), ...] always ending with `_id`, the tiebreaker that makes
+    the order of the documents total.
+    """
+
+    if sort is None:
+        sort = []
+    elif isinstance(sort, str):
+        sort = [(sort, 1)]
+    elif isinstance(sort, Mapping):
+        sort = list(sort.items())
+
+
+    normalized = []
+
+    for key, direction in sort:
+
+        if direction not in (1, -1):
+            raise ValueError(f'The sort direction of `{key}` must be 1 or -1')
+
+        normalized.append((key, direction))
+
+
+    keys = [key for key, _ in normalized]
+
+    if len(set(keys)) != len(keys):
+        raise ValueError('The sort keys must be unique')
+
+    if '_id' not in keys:
+        normalized.append(('_id', normalized[-1][1] if normalized else 1))
+
+    return normalized
+
+
+
+def seek_filter(
+        filter: Mapping[str, Any],
+        sort: List[Tuple[str, int]],
+        values: List[Any]
+    ) -> Mapping[str, Any]:
+    """
+    Documents strictly after `values` in the `sort` order:
+    (k1 > v1) or (k1 == v1 and k2 > v2) or ...
+    """
+
+    branches = []
+
+    for index, (key, direction) in enumerate(sort):
+
+        branch = {
+            sort_key: values[sort_index] for sort_index, (sort_key, _) in enumerate(sort[:index])
+        }
+        branch[key] = {'$gt' if direction == 1 else '$lt': values[index]}
+
+        branches.append(branch)
+
+
+    seek = branches[0] if len(branches) == 1 else {'$or': branches}
+
+    if filter:
+        return {'$and': [filter, seek]}
+
+    return seek
+
+
+
+def encode_token(sort: List[Tuple[str, int]], document: Mapping[str, Any]) -> str:
+
+    data = bson.encode({
+        's': [[key, direction] for key, direction in sort],
+        'v': [get_key_value(document, key) for key, _ in sort]
+    })
+
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+
+def _has_operator(value: Any) -> bool:
+    """
+    True if `value` holds a key starting with `$`: the values of a token go
+    in `$gt` / `$lt` and must not bring operators into the filter.
+    """
+
+    if isinstance(value, Mapping):
+        return any(
+            not isinstance(key, str) or key.startswith('$') or _has_operator(item)
+            for key, item in value.items()
+        )
+
+    if isinstance(value, list):
+        return any(_has_operator(item) for item in value)
+
+    return False
+
+
+
+def decode_token(token: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    """
+    The values of the sort keys stored in `token`. The token comes from the
+    client: anything else than what encode_token(...) builds for this sort
+    raises ValueError.
+    """
+
+    if not isinstance(token, str):
+        raise ValueError('Invalid pagination token')
+
+    try:
+        data = bson.decode(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (BSONError, binascii.Error, ValueError, UnicodeError):
+        raise ValueError('Invalid pagination token')
+
+
+    token_sort = data.get('s')
+    values = data.get('v')
+
+    if set(data) != {'s', 'v'} or not isinstance(token_sort, list) or not isinstance(values, list):
+        raise ValueError('Invalid pagination token')
+
+    if not all(isinstance(item, list) and len(item) == 2 for item in token_sort):
+        raise ValueError('Invalid pagination token')
+
+    if [tuple(item) for item in token_sort] != sort:
+        raise ValueError('The pagination token was created with another sort')
+
+    if len(values) != len(sort) or _has_operator(values):
+        raise ValueError('Invalid pagination token')
+
+    return values
+
+
+
+def _is_prefix(path: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    return other[:len(path)] == path
+
+
+
+def page_projection(
+        projection: Any,
+        sort: List[Tuple[str, int]]
+    ) -> Tuple[Any, List[str]]:
+    """
+    (projection that returns the sort keys, fields to remove from the
+    results). The next token is built from the sort keys of the last
+    document: a projection that hides them would build a wrong token.
+    """
+
+    if projection is None:
+        return None, []
+
+    if not isinstance(projection, Mapping):
+        projection = {name: 1 for name in projection}
+
+    projection = dict(projection)
+    hidden = []
+
+    inclusion = any(
+        value not in (0, False) for name, value in projection.items() if name != '_id'
+    )
+
+    for key, _ in sort:
+
+        path = split_path(key)
+
+        if key == '_id':
+            if projection.get('_id', 1) in (0, False):
+                """
+                `_id: 1` alone would turn an exclusion into an inclusion.
+                """
+                if inclusion:
+                    projection['_id'] = 1
+                else:
+                    del projection['_id']
+                hidden.append('_id')
+            continue
+
+        related = [
+            name for name in projection
+            if _is_prefix(path, split_path(name)) or _is_prefix(split_path(name), path)
+        ]
+
+        if inclusion:
+
+            if any(_is_prefix(split_path(name), path) for name in related):
+                """
+                The key or one of its parents is returned.
+                """
+                continue
+
+            if related:
+                raise ValueError(
+                    f'The projection returns only parts of the sort key `{key}`. Add `{key}` to it.'
+                )
+
+            projection[key] = 1
+            hidden.append(key)
+
+        else:
+            for name in related:
+                del projection[name]
+                hidden.append(name)
+
+
+    return projection or None, hidden
+
+
+
+def _remove_path(document: Any, field: str):
+
+    *parents, last = split_path(field)
+
+    for ref in parents:
+        if not isinstance(document, dict):
+            return
+        document = document.get(ref)
+
+    if isinstance(document, dict):
+        document.pop(last, None)
+
+
+
+def page_query(
+        filter: Mapping[str, Any],
+        sort: Optional[SortSpec],
+        page_size: int,
+        after: Optional[str],
+        kwargs: Mapping[str, Any]
+    ) -> Tuple[List[Tuple[str, int]], Dict[str, Any], List[str]]:
+    """
+    (normalized sort, kwargs of collection.find(...), fields to remove from
+    the results: see page_projection) of a page. One document more than
+    `page_size` is read to know whether there is a next page.
+    """
+
+    if not isinstance(page_size, int) or page_size < 1:
+        raise ValueError('page_size must be an integer greater than 0')
+
+    for option in UNSUPPORTED_OPTIONS:
+        if option in kwargs:
+            raise ValueError(f'`{option}` cannot be used with paginate, use `sort`, `page_size` and `after`')
+
+
+    sort = normalize_sort(sort)
+
+    if after is not None:
+        filter = seek_filter(filter, sort, decode_token(after, sort))
+
+    find_kwargs = {
+        'filter': filter,
+        'sort': sort,
+        'limit': page_size + 1,
+        **kwargs
+    }
+
+    hidden = []
+    if 'projection' in kwargs:
+        find_kwargs['projection'], hidden = page_projection(kwargs['projection'], sort)
+
+    return sort, find_kwargs, hidden
+
+
+
+def build_page(
+        results: List[Mapping[str, Any]],
+        sort: List[Tuple[str, int]],
+        page_size: int,
+        hydrate: Any,
+        hidden: Sequence[str] = ()
+    ) -> Page:
+
+    if len(results) > page_size:
+        results = results[:page_size]
+        next_token = encode_token(sort, results[-1])
+    else:
+        next_token = None
+
+    for field in hidden:
+        for result in results:
+            _remove_path(result, field)
+
+    return Page(
+        items=hydrate.many(results),
+        next_token=next_token
+    )
@@ -0,0 +1,318 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence
+)
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import datetime
+import queue
+import threading
+
+from bson import ObjectId
+
+
+
+
+"""
+Cursor options that do not make sense once the results of several
+partitions are merged.
+"""
+UNSUPPORTED_OPTIONS = ('sort', 'skip', 'limit')
+
+
+
+
+def check_options(kwargs: Mapping[str, Any]):
+
+    for option in UNSUPPORTED_OPTIONS:
+        if option in kwargs:
+            raise ValueError(f'`{option}` cannot be used with a partitioned find')
+
+
+
+"""
+`$type` aliases of the keys split_points(...) supports, in the order they
+are tried when the key values of a filter have several types.
+"""
+RANGE_TYPES = ('objectId', 'date', 'number')
+
+
+
+
+def range_type(value: Any) -> Optional[str]:
+    """
+    The `$type` alias of a key value that split_points(...) supports, None
+    for the other values.
+    """
+
+    if isinstance(value, ObjectId):
+        return 'objectId'
+
+    if isinstance(value, datetime.datetime):
+        return 'date'
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return 'number'
+
+    return None
+
+
+
+def type_filter(filter: Mapping[str, Any], key: str, alias: str) -> Mapping[str, Any]:
+    """
+    `filter` restricted to the documents whose `key` has the `$type` alias.
+    """
+
+    if filter:
+        return {'$and': [filter, {key: {'$type': alias}}]}
+
+    return {key: {'$type': alias}}
+
+
+
+def split_points(lower: Any, upper: Any, partitions: int) -> List[Any]:
+    """
+    `partitions - 1` increasing values that split [lower, upper] in ranges of
+    the same width. Supports ObjectId, int, float and datetime keys.
+    """
+
+    if not isinstance(partitions, int) or partitions < 1:
+        raise ValueError('partitions must be an integer greater than 0')
+
+
+    if isinstance(lower, ObjectId) and isinstance(upper, ObjectId):
+        start = int.from_bytes(lower.binary, 'big')
+        end = int.from_bytes(upper.binary, 'big')
+        to_key = lambda value: ObjectId(int(value).to_bytes(12, 'big'))
+
+    elif isinstance(lower, datetime.datetime) and isinstance(upper, datetime.datetime):
+        start = 0
+        end = (upper - lower).total_seconds()
+        to_key = lambda value: lower + datetime.timedelta(seconds=value)
+
+    elif isinstance(lower, (int, float)) and isinstance(upper, (int, float)) \
+            and not isinstance(lower, bool) and not isinstance(upper, bool):
+        start = lower
+        end = upper
+        if isinstance(lower, int) and isinstance(upper, int):
+            to_key = int
+        else:
+            to_key = float
+
+    else:
+        raise ValueError(
+            f'Cannot split the range between `{lower!r}` and `{upper!r}`. Pass the `boundaries` explicitly.'
+            )
+
+
+    points = []
+
+    for index in range(1, partitions):
+
+        if isinstance(start, int) and isinstance(end, int):
+            point = to_key(start + (end - start) * index // partitions)
+        else:
+            point = to_key(start + (end - start) * index / partitions)
+
+        if point > lower and (not points or point > points[-1]):
+            points.append(point)
+
+    return points
+
+
+
+def partition_filters(
+        filter: Mapping[str, Any],
+        key: str,
+        boundaries: Sequence[Any]
+    ) -> List[Dict[str, Any]]:
+    """
+    One filter per partition: (not >= b1), (>= b1 and < b2), ..., (>= bN).
+    Together they match every document of `filter`, once: the ranges only
+    match values of the type of the boundaries, so the documents whose `key`
+    has another type (or is missing) are read by the first partition.
+    """
+
+    boundaries = list(boundaries)
+
+    if any(boundaries[index] >= boundaries[index + 1] for index in range(len(boundaries) - 1)):
+        raise ValueError('boundaries must be strictly increasing')
+
+    if not boundaries:
+        return [dict(filter)]
+
+
+    ranges = []
+
+    for index in range(len(boundaries) + 1):
+
+        if index == 0:
+            key_range = {'$not': {'$gte': boundaries[0]}}
+        elif index < len(boundaries):
+            key_range = {'$gte': boundaries[index - 1], '$lt': boundaries[index]}
+        else:
+            key_range = {'$gte': boundaries[index - 1]}
+
+        ranges.append(key_range)
+
+
+    filters = []
+
+    for key_range in ranges:
+
+        if filter:
+            filters.append({'$and': [filter, {key: key_range}]})
+        else:
+            filters.append({key: key_range})
+
+    return filters
+
+
+
+def get_key_value(document: Optional[Mapping[str, Any]], key: str) -> Any:
+
+    value = document
+    for ref in key.split('.'):
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(ref)
+
+    return value
+
+
+
+def iter_partition_batches(
+        model: type,
+        filters: List[Dict[str, Any]],
+        find_kwargs: Dict[str, Any]
+    ) -> Iterator[List[Any]]:
+    """
+    Runs `model.find_batches(...)` for every partition filter on its own
+    thread and merges the batches into a single iterator, in arrival order.
+    At most two batches per partition wait in memory for the consumer.
+    """
+
+    if not filters:
+        return
+
+    results = queue.Queue(maxsize=len(filters) * 2)
+    stop = threading.Event()
+    partition_done = object()
+
+
+    def put(item) -> bool:
+
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+
+    def scan(partition_filter):
+
+        batches = model.find_batches(partition_filter, **find_kwargs)
+
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+        except BaseException as err:
+            put(err)
+        finally:
+            batches.close()
+            put(partition_done)
+
+
+    executor = ThreadPoolExecutor(
+        max_workers=len(filters),
+        thread_name_prefix='mongopyd-parallel-find'
+        )
+
+    try:
+
+        for partition_filter in filters:
+            executor.submit(scan, partition_filter)
+
+        remaining = len(filters)
+
+        while remaining:
+
+            item = results.get()
+
+            if item is partition_done:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+
+async def aiter_partition_batches(
+        model: type,
+        filters: List[Dict[str, Any]],
+        find_kwargs: Dict[str, Any]
+    ) -> AsyncIterator[List[Any]]:
+    """
+    Same as iter_partition_batches(...), with one concurrent cursor (task)
+    per partition instead of one thread.
+    """
+
+    if not filters:
+        return
+
+    results = asyncio.Queue(maxsize=len(filters) * 2)
+    partition_done = object()
+
+
+    async def scan(partition_filter):
+
+        try:
+            async for batch in model.find_batches(partition_filter, **find_kwargs):
+                await results.put(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            await results.put(err)
+            return
+
+        await results.put(partition_done)
+
+
+    tasks = [asyncio.ensure_future(scan(partition_filter)) for partition_filter in filters]
+
+    try:
+
+        remaining = len(filters)
+
+        while remaining:
+
+            item = await results.get()
+
+            if item is partition_done:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+
+    finally:
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,207 @@
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Optional,
+    Tuple,
+    get_args,
+    get_origin
+)
+from typing_extensions import Annotated
+import functools
+
+from pydantic import (
+    BaseModel,
+    PlainSerializer,
+    WrapSerializer
+)
+
+
+
+
+MISSING = object()
+
+
+_ALIAS_MAPS: Dict[type, Dict[str, str]] = {}
+
+"""
+{model class: attribute names of the fields with a custom serializer and of
+the computed fields}, or None when the whole model has one (model_serializer).
+"""
+_SERIALIZED_FIELDS: Dict[type, Optional[FrozenSet[str]]] = {}
+
+
+
+
+@functools.lru_cache(maxsize=4096)
+def split_path(field: str) -> Tuple[str, ...]:
+    return tuple(field.split('.'))
+
+
+
+def _get_alias_map(model_class: type) -> Dict[str, str]:
+    """
+    {key in model_dump(by_alias=True): attribute name}
+    """
+
+    alias_map = _ALIAS_MAPS.get(model_class)
+    if alias_map is None:
+
+        alias_map = {
+            (field.serialization_alias or field.alias or name): name
+            for name, field in model_class.model_fields.items()
+        }
+
+        for name, field in model_class.model_computed_fields.items():
+            alias_map[field.alias or name] = name
+
+        _ALIAS_MAPS[model_class] = alias_map
+
+    return alias_map
+
+
+
+def _has_serializer(annotation: Any) -> bool:
+    """
+    PlainSerializer/WrapSerializer anywhere in the type (List[Annotated[...]], ...).
+    """
+
+    if get_origin(annotation) is Annotated:
+        base, *metadata = get_args(annotation)
+        if any(isinstance(item, (PlainSerializer, WrapSerializer)) for item in metadata):
+            return True
+        return _has_serializer(base)
+
+    return any(_has_serializer(arg) for arg in get_args(annotation))
+
+
+
+def _get_serialized_fields(model_class: type) -> Optional[FrozenSet[str]]:
+
+    if model_class in _SERIALIZED_FIELDS:
+        return _SERIALIZED_FIELDS[model_class]
+
+
+    decorators = model_class.__pydantic_decorators__
+
+    if decorators.model_serializers:
+        serialized = None
+
+    else:
+        names = set(model_class.model_computed_fields)
+
+        for decorator in decorators.field_serializers.values():
+            if '*' in decorator.info.fields:
+                names.update(model_class.model_fields)
+            else:
+                names.update(decorator.info.fields)
+
+        for name, field in model_class.model_fields.items():
+            if (
+                any(isinstance(item, (PlainSerializer, WrapSerializer)) for item in field.metadata)
+                or _has_serializer(field.annotation)
+            ):
+                names.add(name)
+
+        serialized = frozenset(names)
+
+
+    _SERIALIZED_FIELDS[model_class] = serialized
+
+    return serialized
+
+
+
+def _get_model_value(model: BaseModel, key: str) -> Any:
+
+    serialized = _get_serialized_fields(model.__class__)
+
+    if serialized is None:
+        """
+        model_serializer: only the full dump has the right keys and values.
+        """
+        return model.model_dump(by_alias=True).get(key, MISSING)
+
+
+    name = _get_alias_map(model.__class__).get(key)
+    if name is not None:
+
+        if name in serialized:
+            return model.model_dump(by_alias=True, include={name}).get(key, MISSING)
+
+        return model.__dict__.get(name, MISSING)
+
+    extra = model.__pydantic_extra__
+    if extra:
+        return extra.get(key, MISSING)
+
+    return MISSING
+
+
+
+def _to_python(value: Any) -> Any:
+    """
+    Nested models (at any depth in dicts, lists and tuples) are returned as
+    dicts, as in model_dump(by_alias=True). The containers are copies, as
+    in model_dump: changing them does not change the model behind the back
+    of its dirty tracking (see save(...)).
+    """
+
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+
+    if isinstance(value, list):
+        return [_to_python(item) for item in value]
+
+    if isinstance(value, tuple):
+        return tuple(_to_python(item) for item in value)
+
+    if isinstance(value, dict):
+        return {key: _to_python(item) for key, item in value.items()}
+
+    if isinstance(value, set):
+        return set(value)
+
+    return value
+
+
+
+def get_path(model: BaseModel, field: str, default: Any = None) -> Any:
+    """
+    Reads `field` ('name' or 'name.sub_name...') from the live model, with the
+    same keys as model_dump(by_alias=True) but without dumping the model.
+
+    # Missing key at any level: returns `default`.
+    # A level that is not a dictionary (or a model): raises ValueError.
+
+    Dicts and lists are returned as copies. Fields with a custom serializer
+    and computed fields are dumped.
+    """
+
+    refs = split_path(field)
+
+    if len(refs) == 1:
+        value = _get_model_value(model, field)
+        return default if value is MISSING else _to_python(value)
+
+
+    value = model
+    last_index = len(refs) - 1
+
+    for index, ref in enumerate(refs):
+
+        if isinstance(value, BaseModel):
+            value = _get_model_value(value, ref)
+        elif isinstance(value, dict):
+            value = value.get(ref, MISSING)
+        else:
+            raise ValueError('The value you are trying to get is not a dictionary')
+
+        if value is MISSING:
+            return default
+
+        if value is None and index != last_index:
+            return default
+
+
+    return _to_python(value)
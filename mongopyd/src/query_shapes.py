@@ -0,0 +1,547 @@
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple
+)
+import re
+import threading
+import time
+
+import bson
+
+
+
+
+"""
+Operators that an index can serve as an equality on the field (they go
+first in a suggested index).
+"""
+EQUALITY_OPERATORS = frozenset(('$eq', '$in'))
+
+
+"""
+Top-level operators whose sub-filters are not matched by a single index prefix.
+"""
+LOGICAL_OPERATORS = frozenset(('$and', '$or', '$nor'))
+
+
+
+
+FilterShape = Tuple[Tuple[str, Any], ...]
+SortShape = Tuple[Tuple[str, Any], ...]
+
+
+
+
+def filter_shape(filter: Mapping[str, Any]) -> FilterShape:
+    """
+    Field names and operators of the filter, with the values stripped.
+    {'age': {'$gte': 18}, 'name': 'x'} -> (('age', ('$gte',)), ('name', ('$eq',)))
+    """
+
+    shape = []
+
+    for key in sorted(filter):
+
+        value = filter[key]
+
+        if key in LOGICAL_OPERATORS and isinstance(value, (list, tuple)):
+            branches = {filter_shape(item) for item in value if isinstance(item, Mapping)}
+            shape.append((key, tuple(sorted(branches, key=repr))))
+
+        elif key.startswith('$'):
+            """
+            $expr, $text, $where...
+            """
+            shape.append((key, None))
+
+        elif isinstance(value, Mapping) and value and all(
+                isinstance(operator, str) and operator.startswith('$') for operator in value
+                ):
+            shape.append((key, tuple(sorted(value))))
+
+        elif isinstance(value, (re.Pattern, bson.Regex)):
+            shape.append((key, ('$regex',)))
+
+        else:
+            shape.append((key, ('$eq',)))
+
+    return tuple(shape)
+
+
+
+def sort_shape(sort: Any) -> SortShape:
+
+    if not sort:
+        return ()
+
+    if isinstance(sort, str):
+        return ((sort, 1),)
+
+    if isinstance(sort, Mapping):
+        sort = sort.items()
+
+    return tuple((key, direction) for key, direction in sort)
+
+
+
+def format_shape(shape: FilterShape) -> str:
+    """
+    Readable form: {age: {$gte: ?}, name: ?}
+    """
+
+    items = []
+
+    for key, operators in shape:
+
+        if key in LOGICAL_OPERATORS and operators is not None:
+            items.append(f'{key}: [{", ".join(format_shape(branch) for branch in operators)}]')
+        elif operators is None:
+            items.append(f'{key}: ?')
+        elif operators == ('$eq',):
+            items.append(f'{key}: ?')
+        else:
+            items.append(f'{key}: {{{", ".join(f"{operator}: ?" for operator in operators)}}}')
+
+    return '{' + ', '.join(items) + '}'
+
+
+
+
+@dataclass
+class QueryShape:
+    """
+    Frequency and latency (seconds) of one query shape of a model.
+    For cursors, the latency is the time spent waiting for the server.
+    """
+
+    model: type
+    collection: str
+    filter: FilterShape
+    sort: SortShape = ()
+    operations: Set[str] = field(default_factory=set)
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+
+    def describe(self) -> str:
+
+        description = f'{self.model.__name__} {format_shape(self.filter)}'
+
+        if self.sort:
+            description += ' sort ' + ', '.join(f'{key}: {direction}' for key, direction in self.sort)
+
+        return description
+
+
+
+@dataclass
+class IndexAdvice:
+    """
+    A recorded shape that no declared index fully serves.
+
+    # reason: 'no index' (no index prefix can be used) or 'partial' (the
+    #   best index only covers some of the fields of the shape).
+    # suggested_key: index key that serves the shape (equality fields,
+    #   then sort, then ranges).
+    """
+
+    shape: QueryShape
+    reason: str
+    suggested_key: List[Tuple[str, Any]]
+    best_index: Optional[str] = None
+
+
+
+
+def _declared_index_keys(model: type) -> Dict[str, List[str]]:
+
+    keys = {'_id_': ['_id']}
+
+    for index in getattr(getattr(model, 'Settings', None), 'indexes', None) or []:
+
+        document = getattr(index, 'document', None)
+        if document is None:
+            continue
+
+        keys[document['name']] = [name for name, _ in document['key'].items()]
+
+    return keys
+
+
+
+def _suggest_key(shape: QueryShape) -> List[Tuple[str, Any]]:
+
+    equality = []
+    ranges = []
+
+    for key, operators in shape.filter:
+
+        if key.startswith('$'):
+            continue
+
+        if set(operators) <= EQUALITY_OPERATORS:
+            equality.append(key)
+        else:
+            ranges.append(key)
+
+    suggested = [(key, 1) for key in equality]
+    suggested += [(key, direction) for key, direction in shape.sort if key not in equality]
+    suggested += [(key, 1) for key in ranges if key not in dict(suggested)]
+
+    return suggested
+
+
+
+def advise_shape(shape: QueryShape) -> Optional[IndexAdvice]:
+    """
+    None if a declared index (or `_id_`) has a prefix made only of, and
+    covering every, field of the shape.
+    """
+
+    operators = dict(shape.filter)
+
+    if '_id' in operators and set(operators['_id'] or ()) <= EQUALITY_OPERATORS:
+        """
+        Lookup by `_id`: served by `_id_` whatever the other fields are.
+        """
+        return None
+
+
+    fields = {key for key, _ in shape.filter if not key.startswith('$')}
+    fields |= {key for key, _ in shape.sort}
+
+    if not fields:
+        return None
+
+
+    best_index = None
+    best_prefix = 0
+
+    for name, key in _declared_index_keys(shape.model).items():
+
+        prefix = 0
+        for index_field in key:
+            if index_field not in fields:
+                break
+            prefix += 1
+
+        if prefix > best_prefix:
+            best_index, best_prefix = name, prefix
+
+
+    if best_prefix == len(fields):
+        return None
+
+    return IndexAdvice(
+        shape=shape,
+        reason='partial' if best_prefix else 'no index',
+        suggested_key=_suggest_key(shape),
+        best_index=best_index
+    )
+
+
+
+
+class QueryShapeRecorder():
+    """
+    Thread-safe aggregation of the query shapes of every model, up to
+    `max_shapes` distinct shapes (the later ones are counted in `dropped`).
+    """
+
+    def __init__(self, max_shapes: int = 1000):
+
+        if not isinstance(max_shapes, int) or max_shapes < 1:
+            raise ValueError('max_shapes must be an integer greater than 0')
+
+        self.max_shapes = max_shapes
+        self.dropped = 0
+
+        self._shapes: Dict[Tuple[type, str, FilterShape, SortShape], QueryShape] = {}
+        self._lock = threading.Lock()
+
+
+    def record(
+            self,
+            model: type,
+            collection: str,
+            operation: str,
+            filter: Mapping[str, Any],
+            sort: Any,
+            duration: float
+        ):
+
+        shape_filter = filter_shape(filter or {})
+        shape_sort = sort_shape(sort)
+        key = (model, collection, shape_filter, shape_sort)
+
+        with self._lock:
+
+            shape = self._shapes.get(key)
+
+            if shape is None:
+
+                if len(self._shapes) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+
+                shape = QueryShape(
+                    model=model,
+                    collection=collection,
+                    filter=shape_filter,
+                    sort=shape_sort
+                )
+                self._shapes[key] = shape
+
+            shape.operations.add(operation)
+            shape.count += 1
+            shape.total_time += duration
+            if duration > shape.max_time:
+                shape.max_time = duration
+
+
+    def shapes(self, model: Optional[type] = None) -> List[QueryShape]:
+        """
+        The recorded shapes (of `model`, or of every model), most expensive first.
+        """
+
+        with self._lock:
+            shapes = [
+                shape for shape in self._shapes.values()
+                if model is None or shape.model is model
+            ]
+
+        return sorted(shapes, key=lambda shape: (shape.total_time, shape.count), reverse=True)
+
+
+    def advise(
+            self,
+            model: Optional[type] = None,
+            min_count: int = 1
+        ) -> List[IndexAdvice]:
+        """
+        The shapes that Settings.indexes does not serve, ranked by total
+        time spent (frequency x latency).
+        """
+
+        advice = []
+
+        for shape in self.shapes(model):
+
+            if shape.count < min_count:
+                continue
+
+            shape_advice = advise_shape(shape)
+            if shape_advice is not None:
+                advice.append(shape_advice)
+
+        return advice
+
+
+    def reset(self):
+
+        with self._lock:
+            self._shapes.clear()
+            self.dropped = 0
+
+
+
+
+"""
+The active recorder. None: recording disabled (the default).
+"""
+_RECORDER: Optional[QueryShapeRecorder] = None
+
+
+
+
+def start_query_recording(max_shapes: int = 1000) -> QueryShapeRecorder:
+
+    global _RECORDER
+    _RECORDER = QueryShapeRecorder(max_shapes=max_shapes)
+
+    return _RECORDER
+
+
+
+def stop_query_recording() -> Optional[QueryShapeRecorder]:
+    """
+    Disables the recording and returns the recorder with what it recorded.
+    """
+
+    global _RECORDER
+    recorder, _RECORDER = _RECORDER, None
+
+    return recorder
+
+
+
+def get_query_recorder() -> Optional[QueryShapeRecorder]:
+    return _RECORDER
+
+
+
+
+class QueryRecording():
+    """
+    Times one operation of a model and records it when it ends.
+    """
+
+    __slots__ = ('recorder', 'model', 'collection', 'operation', 'filter', 'sort', 'duration', '_started')
+
+
+    def __init__(
+            self,
+            recorder: QueryShapeRecorder,
+            model: type,
+            collection: Any,
+            operation: str,
+            filter: Mapping[str, Any],
+            sort: Any
+        ):
+
+        self.recorder = recorder
+        self.model = model
+        self.collection = collection.full_name
+        self.operation = operation
+        self.filter = filter
+        self.sort = sort
+        self.duration = 0.0
+        self._started = 0.0
+
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.duration += time.perf_counter() - self._started
+        self.finish()
+
+
+    def finish(self):
+        self.recorder.record(
+            self.model,
+            self.collection,
+            self.operation,
+            self.filter,
+            self.sort,
+            self.duration
+        )
+
+
+    def iterate(self, results: Iterator[Any]) -> Iterator[Any]:
+        """
+        Yields from the cursor, only timing the waits for the server.
+        """
+
+        results = iter(results)
+
+        try:
+            while True:
+
+                started = time.perf_counter()
+
+                try:
+                    result = next(results)
+                except StopIteration:
+                    return
+                finally:
+                    self.duration += time.perf_counter() - started
+
+                yield result
+
+        finally:
+            self.finish()
+
+
+    async def aiterate(self, results: AsyncIterator[Any]) -> AsyncIterator[Any]:
+
+        results = results.__aiter__()
+
+        try:
+            while True:
+
+                started = time.perf_counter()
+
+                try:
+                    result = await results.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    self.duration += time.perf_counter() - started
+
+                yield result
+
+        finally:
+            self.finish()
+
+
+
+
+class _NoRecording():
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NO_RECORDING = _NoRecording()
+
+
+
+
+def record_query(
+        model: type,
+        collection: Any,
+        operation: str,
+        filter: Mapping[str, Any],
+        sort: Any = None
+    ) -> Any:
+    """
+    `with record_query(...):` around a server call. A shared no-op when the
+    recording is disabled.
+    """
+
+    recorder = _RECORDER
+    if recorder is None:
+        return NO_RECORDING
+
+    return QueryRecording(recorder, model, collection, operation, filter, sort)
+
+
+
+def recording_for(
+        model: type,
+        collection: Any,
+        operation: str,
+        filter: Mapping[str, Any],
+        sort: Any = None
+    ) -> Optional[QueryRecording]:
+    """
+    Same as record_query(...) for cursors (see QueryRecording.iterate). None when disabled.
+    """
+
+    recorder = _RECORDER
+    if recorder is None:
+        return None
+
+    return QueryRecording(recorder, model, collection, operation, filter, sort)
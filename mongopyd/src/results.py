@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Optional
+)
+
+from pymongo.results import (
+    UpdateResult,
+    DeleteResult
+)
+
+
+
+
+"""
+The counts are None when the write was not acknowledged (w=0).
+"""
+
+
+
+
+@dataclass
+class UpdateManyResult:
+    """
+    Result of update_many(...).
+    """
+
+    matched_count: Optional[int] = None
+    modified_count: Optional[int] = None
+    acknowledged: bool = True
+
+
+    @classmethod
+    def from_result(self, result: UpdateResult) -> 'UpdateManyResult':
+
+        if not result.acknowledged:
+            return self(acknowledged=False)
+
+        return self(
+            matched_count=result.matched_count,
+            modified_count=result.modified_count
+        )
+
+
+
+@dataclass
+class DeleteManyResult:
+    """
+    Result of delete_many(...).
+    """
+
+    deleted_count: Optional[int] = None
+    acknowledged: bool = True
+
+
+    @classmethod
+    def from_result(self, result: DeleteResult) -> 'DeleteManyResult':
+
+        if not result.acknowledged:
+            return self(acknowledged=False)
+
+        return self(deleted_count=result.deleted_count)
+
+
+
+@dataclass
+class UpsertResult:
+    """
+    Result of upsert(...). `upserted_id` is the `_id` of the inserted
+    document, None if an existing document was updated.
+    """
+
+    matched_count: Optional[int] = None
+    modified_count: Optional[int] = None
+    upserted_id: Optional[Any] = None
+    acknowledged: bool = True
+
+
+    @property
+    def inserted(self) -> bool:
+        return self.upserted_id is not None
+
+
+    @classmethod
+    def from_result(self, result: UpdateResult) -> 'UpsertResult':
+
+        if not result.acknowledged:
+            return self(acknowledged=False)
+
+        return self(
+            matched_count=result.matched_count,
+            modified_count=result.modified_count,
+            upserted_id=result.upserted_id
+        )
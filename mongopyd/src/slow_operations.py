@@ -0,0 +1,390 @@
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple
+)
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import datetime
+import inspect
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+from .instrumentation import InstrumentationHook, OperationEvent
+from .query_shapes import FilterShape, format_shape
+
+
+
+
+"""
+Methods watched by default.
+"""
+DEFAULT_METHODS = ('find', 'find_one', 'count_documents', 'update')
+
+
+"""
+Frames of mongopyd and of the standard library are skipped to find the call site.
+"""
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STDLIB_DIR = os.path.abspath(sysconfig.get_paths()['stdlib'])
+
+
+
+
+@dataclass
+class ExplainSummary:
+    """
+    What explain('executionStats') says about the winning plan.
+    """
+
+    collscan: bool
+    stages: List[str] = field(default_factory=list)
+    indexes: List[str] = field(default_factory=list)
+    docs_examined: Optional[int] = None
+    keys_examined: Optional[int] = None
+    returned: Optional[int] = None
+    execution_time_ms: Optional[int] = None
+
+
+
+@dataclass
+class SlowOperation:
+    """
+    One operation slower than the threshold. `plan` is filled later (by a
+    background explain), when enabled.
+    """
+
+    model: type
+    method: str
+    collection: str
+    shape: FilterShape
+    duration: float
+    call_site: Optional[str]
+    at: datetime.datetime
+    error: Optional[str] = None
+    plan: Optional[ExplainSummary] = None
+    explain_error: Optional[str] = None
+
+
+    def describe(self) -> str:
+
+        description = (
+            f'{self.model.__name__}.{self.method} {format_shape(self.shape)}'
+            f' took {self.duration * 1000:.1f}ms'
+        )
+
+        if self.call_site:
+            description += f' at {self.call_site}'
+
+        if self.plan is not None:
+            description += (
+                f' [{"COLLSCAN" if self.plan.collscan else ", ".join(self.plan.stages)},'
+                f' docs examined: {self.plan.docs_examined}]'
+            )
+
+        return description
+
+
+
+
+def _iter_plan_stages(plan: Mapping[str, Any]) -> Iterable[Mapping[str, Any]]:
+
+    stack = [plan]
+
+    while stack:
+
+        node = stack.pop()
+        if not isinstance(node, Mapping):
+            continue
+
+        if 'stage' in node:
+            yield node
+
+        for key in ('queryPlan', 'inputStage', 'winningPlan'):
+            if key in node:
+                stack.append(node[key])
+
+        for key in ('inputStages', 'shards'):
+            stack.extend(node.get(key) or [])
+
+
+
+def summarize_explain(explain: Mapping[str, Any]) -> ExplainSummary:
+    """
+    ExplainSummary of the result of an `explain` command with the
+    `executionStats` verbosity (classic and slot based plans, sharded or not).
+    """
+
+    planner = explain.get('queryPlanner') or {}
+    stats = explain.get('executionStats') or {}
+
+    stages = list(_iter_plan_stages(planner.get('winningPlan') or {}))
+
+    return ExplainSummary(
+        collscan=any(stage['stage'] == 'COLLSCAN' for stage in stages),
+        stages=[stage['stage'] for stage in stages],
+        indexes=[stage['indexName'] for stage in stages if 'indexName' in stage],
+        docs_examined=stats.get('totalDocsExamined'),
+        keys_examined=stats.get('totalKeysExamined'),
+        returned=stats.get('nReturned'),
+        execution_time_ms=stats.get('executionTimeMillis')
+    )
+
+
+
+def explain_command(method: str, collection_name: str, filter: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    The command to explain. Updates are explained as a find of their filter:
+    the plan that selects the document is the same, and nothing is written.
+    """
+
+    if method == 'count_documents':
+        return {'count': collection_name, 'query': filter}
+
+    command = {'find': collection_name, 'filter': filter}
+
+    if method in ('find_one', 'update', 'upsert'):
+        command['limit'] = 1
+
+    return command
+
+
+
+def _is_internal(filename: str) -> bool:
+
+    if filename.startswith('<'):
+        return True
+
+    filename = os.path.abspath(filename)
+
+    if filename.startswith(_PACKAGE_DIR):
+        return True
+
+    return filename.startswith(_STDLIB_DIR) and 'site-packages' not in filename
+
+
+
+def get_call_site() -> Optional[str]:
+    """
+    'file:line in function' of the first frame outside mongopyd and the
+    standard library (asyncio, contextlib...).
+    """
+
+    frame = sys._getframe(1)
+
+    while frame is not None:
+
+        if not _is_internal(frame.f_code.co_filename):
+            return f'{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+        frame = frame.f_back
+
+    return None
+
+
+
+
+class SlowOperationLog(InstrumentationHook):
+    """
+    Instrumentation hook that keeps the last `max_entries` operations
+    slower than `threshold` (seconds), with their filter shape and call site.
+
+    slow_log = register_hook(SlowOperationLog(threshold=0.2, explain=True))
+    ...
+    for operation in slow_log.entries():
+        print(operation.describe())
+
+    # explain: runs explain('executionStats') of the slow filter in the
+    #   background (a thread for Document, a task for AsyncDocument) to
+    #   record whether it was a COLLSCAN and how many documents it examined.
+    # explain_interval: seconds between two explains of the same shape.
+    # callback: called with every new SlowOperation (in the thread of the operation).
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.1,
+            methods: Iterable[str] = DEFAULT_METHODS,
+            explain: bool = False,
+            explain_interval: float = 60.0,
+            max_entries: int = 1000,
+            callback: Optional[Callable[[SlowOperation], Any]] = None
+        ):
+
+        if threshold < 0:
+            raise ValueError('threshold must be greater than or equal to 0')
+
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError('max_entries must be an integer greater than 0')
+
+
+        self.threshold = threshold
+        self.methods = frozenset(methods)
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.callback = callback
+
+        self._entries: 'deque[SlowOperation]' = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+        """
+        (model, method, shape): time.monotonic() of its last explain.
+        """
+        self._explained: Dict[Tuple[type, str, FilterShape], float] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks = set()
+
+
+    def post(self, event: OperationEvent):
+
+        if event.duration < self.threshold or event.method not in self.methods:
+            return
+
+
+        operation = SlowOperation(
+            model=event.model,
+            method=event.method,
+            collection=event.collection,
+            shape=event.shape,
+            duration=event.duration,
+            call_site=get_call_site(),
+            at=datetime.datetime.now(datetime.timezone.utc),
+            error=repr(event.error) if event.error is not None else None
+        )
+
+        with self._lock:
+            self._entries.append(operation)
+
+        if self.explain and event.filter is not None and self._should_explain(operation):
+            self._start_explain(operation, event)
+
+        if self.callback is not None:
+            self.callback(operation)
+
+
+    def entries(self) -> List[SlowOperation]:
+
+        with self._lock:
+            return list(self._entries)
+
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._explained.clear()
+
+
+    def _should_explain(self, operation: SlowOperation) -> bool:
+        """
+        At most one explain per shape every `explain_interval` seconds.
+        """
+
+        key = (operation.model, operation.method, operation.shape)
+        now = time.monotonic()
+
+        with self._lock:
+
+            last = self._explained.get(key)
+            if last is not None and now - last < self.explain_interval:
+                return False
+
+            self._explained[key] = now
+            return True
+
+
+    def run_explain(self, collection: Any, method: str, filter: Mapping[str, Any]) -> Any:
+        """
+        The explain result: a dict for pymongo, an awaitable for motor.
+        """
+
+        return collection.database.command(
+            'explain',
+            explain_command(method, collection.name, filter),
+            verbosity='executionStats'
+        )
+
+
+    def _set_plan(self, operation: SlowOperation, explain: Any):
+
+        with self._lock:
+            operation.plan = summarize_explain(explain)
+
+
+    def _set_explain_error(self, operation: SlowOperation, err: BaseException):
+
+        with self._lock:
+            operation.explain_error = repr(err)
+
+
+    def _start_explain(self, operation: SlowOperation, event: OperationEvent):
+
+        collection = event.collection_handle
+        filter = dict(event.filter)
+
+        if not inspect.iscoroutinefunction(event.model.count_documents):
+            """
+            Document (pymongo): on a background thread.
+            """
+
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1,
+                        thread_name_prefix='mongopyd-explain'
+                        )
+
+            self._executor.submit(self._explain_sync, operation, collection, filter)
+            return
+
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        task = loop.create_task(self._explain_async(operation, collection, filter))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    def _explain_sync(self, operation: SlowOperation, collection: Any, filter: Mapping[str, Any]):
+
+        try:
+            self._set_plan(operation, self.run_explain(collection, operation.method, filter))
+        except Exception as err:
+            self._set_explain_error(operation, err)
+
+
+    async def _explain_async(self, operation: SlowOperation, collection: Any, filter: Mapping[str, Any]):
+
+        try:
+            explain = self.run_explain(collection, operation.method, filter)
+            if asyncio.iscoroutine(explain) or asyncio.isfuture(explain):
+                explain = await explain
+
+            self._set_plan(operation, explain)
+        except Exception as err:
+            self._set_explain_error(operation, err)
+
+
+    def wait_explains(self, timeout: Optional[float] = None):
+        """
+        Waits for the pending explains of Document operations (tests, shutdown).
+        """
+
+        executor = self._executor
+        if executor is None:
+            return
+
+        executor.submit(lambda: None).result(timeout=timeout)
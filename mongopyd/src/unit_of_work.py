@@ -0,0 +1,402 @@
+from dataclasses import dataclass, field
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple
+)
+
+from pymongo import (
+    InsertOne,
+    UpdateOne,
+    DeleteOne
+)
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult
+
+from .cache import invalidate_documents, invalidate_counts
+
+
+
+
+DEFAULT_MAX_OPERATIONS = 1000
+
+
+OperationKind = Literal['insert', 'update', 'delete', 'save']
+
+
+"""
+{kind: (request class, options of insert(), update(), ... kept by a queued
+write)}. The options of the whole bulk_write (session, comment,
+bypass_document_validation, ...) are given to the unit of work.
+"""
+REQUESTS: Dict[str, Tuple[type, Tuple[str, ...]]] = {
+    'insert': (InsertOne, ()),
+    'update': (UpdateOne, ('upsert', 'collation', 'array_filters', 'hint')),
+    'save': (UpdateOne, ('upsert', 'collation', 'array_filters', 'hint')),
+    'delete': (DeleteOne, ('collation', 'hint'))
+}
+
+
+
+
+@dataclass
+class PendingOperation:
+    """
+    One write queued by a unit of work. `error` is the write error of the
+    server (from BulkWriteError.details), `executed` is False for the
+    operations not sent or not applied (a previous error with ordered=True).
+    """
+
+    document: Any
+    kind: OperationKind
+    request: Any = field(repr=False)
+    on_success: Optional[Callable[[], None]] = field(default=None, repr=False)
+    executed: bool = False
+    error: Optional[Dict[str, Any]] = None
+
+
+
+
+def make_request(kind: OperationKind, *args: Any, **kwargs: Any) -> Any:
+    """
+    The pymongo request of a queued write. The options it cannot carry raise
+    ValueError when the write is queued, not when the queue is sent.
+    """
+
+    request_class, options = REQUESTS[kind]
+
+    unsupported = [name for name in kwargs if name not in options]
+    if unsupported:
+        raise ValueError(
+            f'{", ".join(map(repr, unsupported))} cannot be used with {kind}() inside a unit of work'
+            f' (supported: {", ".join(map(repr, options)) or "none"}).'
+            ' Pass the options of the whole bulk_write to the unit of work.'
+        )
+
+    return request_class(*args, **kwargs)
+
+
+
+
+class BaseUnitOfWork():
+    """
+    #Queues the insert(), update(), delete() and save() of the documents and
+    sends them with one bulk_write per collection.
+
+    # The queue is sent at the end of the `with` block, or for a collection as
+    #   soon as it holds `max_operations` writes. Nothing more is sent if the
+    #   block raises: the queued writes are discarded.
+    # Inside the block insert() returns the `_id` given to the document (set
+    #   on it once written), update() and delete() return None: the documents
+    #   are not reloaded. save() marks the fields clean once written.
+    # Only the options of the pymongo requests (see REQUESTS) can be passed
+    #   to the queued writes, the others raise ValueError right away.
+    # A write error raises BulkWriteError after the flush; the error of each
+    #   write is on its PendingOperation (see `operations`).
+    """
+
+    def __init__(
+            self,
+            max_operations: int = DEFAULT_MAX_OPERATIONS,
+            ordered: bool = True,
+            **bulk_write_kwargs: Any
+        ):
+        """
+        # option: max_operations
+            Default: 1000
+            Writes queued for one collection before they are sent.
+
+        # option: ordered
+            Default: True
+            bulk_write(ordered=...). With True, a collection stops at its first
+            error and the following collections are not sent.
+
+        # option: **bulk_write_kwargs
+            Passed to bulk_write (session, bypass_document_validation, ...).
+        """
+
+        if max_operations < 1:
+            raise ValueError('max_operations must be greater than 0')
+
+        self.max_operations = max_operations
+        self.ordered = ordered
+        self.bulk_write_kwargs = bulk_write_kwargs
+
+        self.operations: List[PendingOperation] = []
+        self.results: List[BulkWriteResult] = []
+
+        self._queues: Dict[str, Tuple[Any, List[PendingOperation]]] = {}
+        self._token = None
+
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} pending={self.pending}>'
+
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for _, queue in self._queues.values())
+
+
+    def _queue(
+            self,
+            document: Any,
+            collection: Any,
+            kind: OperationKind,
+            request: Any,
+            on_success: Optional[Callable[[], None]] = None
+        ) -> Tuple[Any, List[PendingOperation]]:
+
+        operation = PendingOperation(document, kind, request, on_success)
+        self.operations.append(operation)
+
+        key = collection.full_name
+        if key not in self._queues:
+            self._queues[key] = (collection, [])
+
+        self._queues[key][1].append(operation)
+
+        return self._queues[key]
+
+
+    def _take(self, key: str) -> Tuple[Any, List[PendingOperation]]:
+        return self._queues.pop(key)
+
+
+    def discard(self):
+        """
+        Drops the writes not sent yet.
+        """
+        self._queues.clear()
+
+
+    def _apply_result(
+            self,
+            collection: Any,
+            queue: List[PendingOperation],
+            result: Optional[BulkWriteResult],
+            error: Optional[BulkWriteError]
+        ):
+
+        failed = {}
+        if error is not None:
+            failed = {
+                write_error['index']: write_error
+                for write_error in error.details.get('writeErrors', [])
+            }
+
+        last_index = min(failed) if failed and self.ordered else len(queue)
+
+        for index, operation in enumerate(queue):
+
+            if index in failed:
+                operation.error = failed[index]
+            elif index < last_index:
+                operation.executed = True
+
+                if operation.on_success is not None:
+                    operation.on_success()
+
+
+        """
+        The failed (or never sent) operations changed nothing (a failed insert
+        has no id).
+        """
+        executed = [operation for operation in queue if operation.executed]
+
+        for model in {operation.document.__class__ for operation in executed}:
+            invalidate_documents(
+                model,
+                collection,
+                [operation.document.id for operation in executed if operation.document.__class__ is model]
+                )
+            invalidate_counts(model)
+
+        if result is not None:
+            self.results.append(result)
+
+
+
+
+class UnitOfWork(BaseUnitOfWork):
+    """
+    For Document.
+
+    with UnitOfWork():
+        for doc in docs:
+            doc.update({}, {'$inc': {'visits': 1}})
+    """
+
+    def __enter__(self):
+        self._token = _CURRENT_UNIT.set(self)
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        _CURRENT_UNIT.reset(self._token)
+
+        if exc_type is not None:
+            self.discard()
+            return False
+
+        self.flush()
+        return False
+
+
+    def add(
+            self,
+            document: Any,
+            collection: Any,
+            kind: OperationKind,
+            request: Any,
+            on_success: Optional[Callable[[], None]] = None
+        ):
+
+        _, queue = self._queue(document, collection, kind, request, on_success)
+
+        if len(queue) >= self.max_operations:
+            self._flush_collection(collection.full_name)
+
+
+    def _flush_collection(self, key: str):
+
+        collection, queue = self._take(key)
+
+        try:
+            result = collection.bulk_write(
+                [operation.request for operation in queue],
+                ordered=self.ordered,
+                **self.bulk_write_kwargs
+            )
+        except BulkWriteError as err:
+            self._apply_result(collection, queue, None, err)
+            raise
+
+        self._apply_result(collection, queue, result, None)
+
+
+    def flush(self):
+        """
+        Sends the queued writes now.
+        """
+
+        first_error = None
+
+        for key in list(self._queues):
+            try:
+                self._flush_collection(key)
+            except BulkWriteError as err:
+                if self.ordered:
+                    self.discard()
+                    raise
+                first_error = first_error or err
+
+        if first_error is not None:
+            raise first_error
+
+
+
+
+class AsyncUnitOfWork(BaseUnitOfWork):
+    """
+    For AsyncDocument.
+
+    async with AsyncUnitOfWork():
+        for doc in docs:
+            await doc.update({}, {'$inc': {'visits': 1}})
+    """
+
+    async def __aenter__(self):
+        self._token = _CURRENT_ASYNC_UNIT.set(self)
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+
+        _CURRENT_ASYNC_UNIT.reset(self._token)
+
+        if exc_type is not None:
+            self.discard()
+            return False
+
+        await self.flush()
+        return False
+
+
+    async def add(
+            self,
+            document: Any,
+            collection: Any,
+            kind: OperationKind,
+            request: Any,
+            on_success: Optional[Callable[[], None]] = None
+        ):
+
+        _, queue = self._queue(document, collection, kind, request, on_success)
+
+        if len(queue) >= self.max_operations:
+            await self._flush_collection(collection.full_name)
+
+
+    async def _flush_collection(self, key: str):
+
+        collection, queue = self._take(key)
+
+        try:
+            result = await collection.bulk_write(
+                [operation.request for operation in queue],
+                ordered=self.ordered,
+                **self.bulk_write_kwargs
+            )
+        except BulkWriteError as err:
+            self._apply_result(collection, queue, None, err)
+            raise
+
+        self._apply_result(collection, queue, result, None)
+
+
+    async def flush(self):
+        """
+        Sends the queued writes now.
+        """
+
+        first_error = None
+
+        for key in list(self._queues):
+            try:
+                await self._flush_collection(key)
+            except BulkWriteError as err:
+                if self.ordered:
+                    self.discard()
+                    raise
+                first_error = first_error or err
+
+        if first_error is not None:
+            raise first_error
+
+
+
+
+"""
+The unit of work of the current context, one for each kind of document: a
+Document used inside an AsyncUnitOfWork is written right away.
+"""
+_CURRENT_UNIT: ContextVar[Optional[UnitOfWork]] = ContextVar('mongopyd_unit_of_work', default=None)
+_CURRENT_ASYNC_UNIT: ContextVar[Optional[AsyncUnitOfWork]] = ContextVar('mongopyd_async_unit_of_work', default=None)
+
+
+
+
+def get_unit_of_work() -> Optional[UnitOfWork]:
+    return _CURRENT_UNIT.get()
+
+
+
+def get_async_unit_of_work() -> Optional[AsyncUnitOfWork]:
+    return _CURRENT_ASYNC_UNIT.get()
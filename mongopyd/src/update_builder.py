@@ -0,0 +1,362 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+import copy
+
+from pydantic import BaseModel
+
+from .paths import split_path, MISSING
+
+
+
+
+"""
+{model class: {attribute name or alias: key in the database}}
+"""
+_FIELD_KEYS: Dict[type, Dict[str, str]] = {}
+
+
+
+
+def get_field_keys(model: type) -> Dict[str, str]:
+
+    keys = _FIELD_KEYS.get(model)
+    if keys is None:
+
+        keys = {}
+        for name, field in model.model_fields.items():
+            key = field.alias or name
+            keys[name] = key
+            keys[key] = key
+
+        _FIELD_KEYS[model] = keys
+
+    return keys
+
+
+
+def dump_value(value: Any) -> Any:
+    """
+    Models (EmbeddedDocument, ...) are stored as they are by insert(...).
+    """
+
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+
+    if isinstance(value, (list, tuple)):
+        return [dump_value(item) for item in value]
+
+    if isinstance(value, dict):
+        return {key: dump_value(item) for key, item in value.items()}
+
+    return value
+
+
+
+def paths_conflict(path: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    """
+    'a' and 'a.b' conflict (the server rejects the update), 'a.b' and 'a.c' do not.
+    """
+
+    length = min(len(path), len(other))
+
+    return path[:length] == other[:length]
+
+
+
+
+class UpdateBuilder():
+    """
+    #Update document of a model, built operator by operator.
+
+    Model.updates().set('name', 'John').inc('visits', 1).push('tags', 'new')
+
+    # Field names are checked against the model (attribute names are replaced
+    #   by their alias) and two operators on conflicting paths (`a` and `a.b`,
+    #   or the same path twice) raise ValueError before anything is sent.
+    # compile() builds the update document once: a builder can be created at
+    #   import time and passed to update(...) on every call.
+    """
+
+    def __init__(self, model: type, strict: bool = True):
+        """
+        # option: strict
+            Default: True
+            Fields not declared in the model raise ValueError. Use False with
+            models that store undeclared (extra) fields.
+        """
+
+        self.model = model
+        self.strict = strict
+
+        self._operators: Dict[str, Dict[str, Any]] = {}
+        self._paths: List[Tuple[Tuple[str, ...], str]] = []
+        self._compiled: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+    def __repr__(self):
+        return f'<UpdateBuilder {self.model.__name__} {self.compile() if self._operators else {}}>'
+
+
+    def __bool__(self):
+        return bool(self._operators)
+
+
+    def _key(self, field: str) -> str:
+
+        if not isinstance(field, str) or not field:
+            raise ValueError('The field name must be a non-empty string')
+
+        if field.startswith('$'):
+            raise ValueError(f'Invalid field name `{field}`')
+
+        first, _, rest = field.partition('.')
+
+        key = get_field_keys(self.model).get(first)
+        if key is None:
+            if self.strict:
+                raise ValueError(f'`{first}` is not a field of {self.model.__name__}')
+            key = first
+
+        return f'{key}.{rest}' if rest else key
+
+
+    def _add_path(self, key: str, operator: str):
+
+        path = split_path(key)
+
+        for other, other_operator in self._paths:
+            if paths_conflict(path, other):
+                raise ValueError(
+                    f'Updating `{key}` ({operator}) conflicts with `{".".join(other)}` ({other_operator})'
+                )
+
+        self._paths.append((path, operator))
+
+
+    def operator(self, operator: str, fields: Mapping[str, Any]) -> 'UpdateBuilder':
+        """
+        Adds `{operator: fields}`. The methods below cover the usual operators.
+        """
+
+        if not isinstance(operator, str) or not operator.startswith('$'):
+            raise ValueError('The operator must start with $')
+
+        for field, value in fields.items():
+            key = self._key(field)
+            self._add_path(key, operator)
+
+            self._operators.setdefault(operator, {})[key] = dump_value(value)
+
+        self._compiled = None
+
+        return self
+
+
+    def _fields(
+            self,
+            operator: str,
+            field: Union[str, Mapping[str, Any]],
+            value: Any
+        ) -> 'UpdateBuilder':
+
+        if isinstance(field, Mapping):
+            if value is not MISSING:
+                raise ValueError('Pass either a mapping of fields or a field and a value')
+            return self.operator(operator, field)
+
+        if value is MISSING:
+            raise ValueError(f'Missing the value of `{field}`')
+
+        return self.operator(operator, {field: value})
+
+
+    def set(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$set', field, value)
+
+
+    def set_on_insert(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$setOnInsert', field, value)
+
+
+    def unset(self, *fields: str) -> 'UpdateBuilder':
+        return self.operator('$unset', {field: '' for field in fields})
+
+
+    def inc(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$inc', field, value)
+
+
+    def mul(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$mul', field, value)
+
+
+    def min(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$min', field, value)
+
+
+    def max(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$max', field, value)
+
+
+    def current_date(self, *fields: str) -> 'UpdateBuilder':
+        return self.operator('$currentDate', {field: True for field in fields})
+
+
+    def rename(self, field: str, new_name: str) -> 'UpdateBuilder':
+        """
+        The new name is checked for conflicts too.
+        """
+
+        self._add_path(self._key(new_name), '$rename')
+
+        return self.operator('$rename', {field: self._key(new_name)})
+
+
+    def push(
+            self,
+            field: str,
+            *values: Any,
+            position: Optional[int] = None,
+            slice: Optional[int] = None,
+            sort: Optional[Union[int, Mapping[str, int]]] = None
+        ) -> 'UpdateBuilder':
+        """
+        One value is pushed as it is, several (or any modifier) use `$each`.
+        """
+
+        if not values:
+            raise ValueError('push(...) needs at least one value')
+
+        modifiers = {
+            name: modifier for name, modifier in (
+                ('$position', position),
+                ('$slice', slice),
+                ('$sort', sort)
+            ) if modifier is not None
+        }
+
+        if len(values) == 1 and not modifiers:
+            return self.operator('$push', {field: values[0]})
+
+        return self.operator('$push', {field: {'$each': list(values), **modifiers}})
+
+
+    def add_to_set(self, field: str, *values: Any) -> 'UpdateBuilder':
+
+        if not values:
+            raise ValueError('add_to_set(...) needs at least one value')
+
+        if len(values) == 1:
+            return self.operator('$addToSet', {field: values[0]})
+
+        return self.operator('$addToSet', {field: {'$each': list(values)}})
+
+
+    def pull(self, field: Union[str, Mapping[str, Any]], value: Any = MISSING) -> 'UpdateBuilder':
+        return self._fields('$pull', field, value)
+
+
+    def pop(self, field: str, last: bool = True) -> 'UpdateBuilder':
+        return self.operator('$pop', {field: 1 if last else -1})
+
+
+    def copy(self) -> 'UpdateBuilder':
+        """
+        Independent builder with the same operators, to extend a shared one.
+        """
+
+        builder = UpdateBuilder(self.model, self.strict)
+        builder._operators = copy.deepcopy(self._operators)
+        builder._paths = list(self._paths)
+
+        return builder
+
+
+    def compile(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The update document. It is built once and reused until the builder
+        changes: do not modify it.
+        """
+
+        if not self._operators:
+            raise ValueError('The update is empty')
+
+        if self._compiled is None:
+            self._compiled = {
+                operator: dict(fields) for operator, fields in self._operators.items()
+            }
+
+        return self._compiled
+
+
+
+
+def compile_update(
+        model: type,
+        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]], UpdateBuilder]
+    ) -> Union[Mapping[str, Any], Sequence[Mapping[str, Any]]]:
+    """
+    The update document of update(...) and co. Mappings and pipelines are
+    passed as they are.
+    """
+
+    if not isinstance(update, UpdateBuilder):
+        return update
+
+    if not issubclass(model, update.model):
+        raise ValueError(
+            f'The update was built for {update.model.__name__}, not for {model.__name__}'
+        )
+
+    return update.compile()
+
+
+
+Returning = Literal['full', 'none', 'fields']
+
+RETURNING_MODES = ('full', 'none', 'fields')
+
+
+
+def check_returning(returning: str, allowed: Sequence[str] = RETURNING_MODES):
+
+    if returning not in allowed:
+        raise ValueError(
+            f'returning must be one of {", ".join(map(repr, allowed))}, not {returning!r}'
+        )
+
+
+
+def updated_fields_projection(update: Any) -> Dict[str, int]:
+    """
+    Projection of the top-level fields changed by an update document, for
+    returning='fields'. Whole top-level fields are returned: a projection of
+    `a.b` alone would come back as a partial `a`.
+    """
+
+    if not isinstance(update, Mapping):
+        raise ValueError("returning='fields' needs an update document, not a pipeline")
+
+    projection = {}
+
+    for operator, fields in update.items():
+
+        if not operator.startswith('$'):
+            raise ValueError("returning='fields' needs an update document with operators")
+
+        for field, value in fields.items():
+            projection[split_path(field)[0]] = 1
+
+            if operator == '$rename':
+                projection[split_path(value)[0]] = 1
+
+    return projection
@@ -1,6 +1,7 @@
 from pydantic import (
     BaseModel,
     Field,
+    PrivateAttr,
     Extra
 )
 from typing import (
@@ -10,7 +11,11 @@ from typing import (
     Mapping,
     Union,
     Sequence,
-    Optional
+    Optional,
+    Tuple,
+    Iterable,
+    Set,
+    Callable
 )
 import pymongo
 from pymongo import (
@@ -18,99 +23,215 @@ from pymongo import (
 )
 from bson import ObjectId
 from pymongo.errors import (
-    DuplicateKeyError
+    DuplicateKeyError,
+    BulkWriteError
 )
+from pymongo.results import BulkWriteResult
+from concurrent.futures import ThreadPoolExecutor
 import functools
 
 
-from . import get_database
+from . import get_database, RESOLVED_COLLECTIONS
 from .src.custom_types import PydanticObjectId
+from .src.hydration import Hydrator, HydrationMode, DEFAULT_BATCH_SIZE
+from .src.paths import get_path, MISSING
+from .src.cache import (
+    get_document_cache,
+    get_filter_id,
+    get_cached_document,
+    cache_document,
+    invalidate_documents,
+    get_count_cache,
+    get_count_key,
+    can_estimate_count,
+    invalidate_counts
+)
+from .src.partitions import (
+    check_options,
+    split_points,
+    partition_filters,
+    get_key_value,
+    range_type,
+    type_filter,
+    RANGE_TYPES,
+    iter_partition_batches
+)
+from .src.indexes import (
+    IndexPlan,
+    plan_indexes,
+    check_conflicts,
+    get_index_models,
+    get_shared_indexes
+)
+from .src.query_shapes import (
+    record_query,
+    recording_for
+)
+from .src.instrumentation import (
+    instrumented,
+    instrument_cursor,
+    note_result
+)
+from .src.update_builder import (
+    UpdateBuilder,
+    Returning,
+    compile_update,
+    check_returning,
+    updated_fields_projection
+)
+from .src.results import (
+    UpdateManyResult,
+    DeleteManyResult,
+    UpsertResult
+)
+from .src.unit_of_work import get_unit_of_work, make_request
+from .src.pagination import (
+    SortSpec,
+    Page,
+    page_query,
+    build_page
+)
+from .src.bulk import (
+    DEFAULT_CHUNK_SIZE,
+    dump_documents,
+    iter_chunks,
+    apply_chunk_result,
+    merge_bulk_write_errors
+)
 
 
 
-def need_database_and_collection(func):
-
-    @functools.wraps(func)
-    def wrapper(
+def _resolve_database_and_collection(
         self,
-        *args,
         database: Optional[Union[str, pymongo.database.Database]] = None,
-        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
-        **kwargs):
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None
+    ) -> Tuple[pymongo.database.Database, pymongo.collection.Collection]:
 
 
-        if database is None or isinstance(database, str):
+    if database is None or isinstance(database, str):
 
-            if database is not None:
-                
-                _database = get_database(
-                    mode='sync',
-                    alias=database
-                )
+        if database is not None:
+            
+            _database = get_database(
+                mode='sync',
+                alias=database
+            )
 
-                if _database is None:
-                    raise RuntimeError(
-                        f'No database was found for the alias `{database}` and no default database was found either.'
-                        )
-                else:
-                    database = _database.db
+            if _database is None:
+                raise RuntimeError(
+                    f'No database was found for the alias `{database}` and no default database was found either.'
+                    )
+            else:
+                database = _database.db
 
+        else:
+
+            try:
+                db_alias = self.Settings.db_alias
+            except AttributeError:
+                """
+                It will get the default database configured in the method: configure database(...)
+                """
+                db_alias = None
+
+            _database = get_database(
+                mode='sync',
+                alias=db_alias
+            )
+
+            if _database is None:
+                raise RuntimeError(
+                    f'No database was found for the alias `{db_alias}` and no default database was found either.'
+                    )
             else:
+                database = _database.db
 
-                try:
-                    db_alias = self.Settings.db_alias
-                except AttributeError:
-                    """
-                    It will get the default database configured in the method: configure database(...)
-                    """
-                    db_alias = None
 
-                _database = get_database(
-                    mode='sync',
-                    alias=db_alias
-                )
+    if not isinstance(database, pymongo.database.Database):
+        raise RuntimeError(
+            f"Database instance `{database.__class__}` is invalid." \
+                 f" It must be an instance of: `<class 'pymongo.database.Database'>`"
+            )
 
-                if _database is None:
-                    raise RuntimeError(
-                        f'No database was found for the alias `{db_alias}` and no default database was found either.'
-                        )
-                else:
-                    database = _database.db
 
+    if collection is None or isinstance(collection, str):
 
-        if not isinstance(database, pymongo.database.Database):
-            raise RuntimeError(
-                f"Database instance `{database.__class__}` is invalid." \
-                     f" It must be an instance of: `<class 'pymongo.database.Database'>`"
+        if collection is not None:
+
+            collection = database.get_collection(
+                collection
                 )
+        else:
 
+            try:
+                coll_name = self.Settings.name
+            except AttributeError:
+                raise AttributeError(f'The Settings.name must be specified in the model.')
+            
+            if coll_name is None:
+                raise ValueError('The Settings.name must be specified in the model.')
 
-        if collection is None or isinstance(collection, str):
+            collection = database.get_collection(
+                coll_name
+                )
 
-            if collection is not None:
 
-                collection = database.get_collection(
-                    collection
-                    )
-            else:
+    if not isinstance(collection, pymongo.collection.Collection):
+        raise RuntimeError(
+            f"Collection instance `{collection.__class__}` is invalid." \
+                 f" It must be an instance of: `<class 'pymongo.collection.Collection'>`"
+            )
 
-                try:
-                    coll_name = self.Settings.name
-                except AttributeError:
-                    raise AttributeError(f'The Settings.name must be specified in the model.')
-                
-                if coll_name is None:
-                    raise ValueError('The Settings.name must be specified in the model.')
 
-                collection = database.get_collection(
-                    coll_name
-                    )
+    return database, collection
 
 
-        if not isinstance(collection, pymongo.collection.Collection):
-            raise RuntimeError(
-                f"Collection instance `{collection.__class__}` is invalid." \
-                     f" It must be an instance of: `<class 'pymongo.collection.Collection'>`"
+
+def _cache_model_database_and_collection(
+        self
+    ) -> Tuple[pymongo.database.Database, pymongo.collection.Collection]:
+    """
+    The default handles only depend on the model class and on the databases
+    registry, so they are resolved once per class and reused by every call.
+    The cache is cleared by configure_databases(...).
+    """
+
+    model = self if isinstance(self, type) else self.__class__
+
+    resolved = _resolve_database_and_collection(model)
+    RESOLVED_COLLECTIONS[model] = resolved
+
+    return resolved
+
+
+
+def need_database_and_collection(func):
+
+    @functools.wraps(func)
+    def wrapper(
+        self,
+        *args,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs):
+
+
+        if database is None and collection is None:
+
+            resolved = RESOLVED_COLLECTIONS.get(
+                self if isinstance(self, type) else self.__class__
+                )
+            if resolved is None:
+                resolved = _cache_model_database_and_collection(self)
+
+            database, collection = resolved
+
+        else:
+
+            database, collection = _resolve_database_and_collection(
+                self,
+                database=database,
+                collection=collection
                 )
 
 
@@ -125,10 +246,64 @@ def need_database_and_collection(func):
 
 
 
+def _get_partition_filters(
+        collection: pymongo.collection.Collection,
+        filter: Mapping[str, Any],
+        partitions: int,
+        key: str,
+        boundaries: Optional[Sequence[Any]] = None
+    ) -> List[Dict[str, Any]]:
+
+    if boundaries is None:
+
+        if partitions == 1:
+            return [dict(filter)]
+
+        lower = collection.find_one(filter, projection={key: 1}, sort=[(key, 1)])
+        if lower is None:
+            return []
+
+        upper = collection.find_one(filter, projection={key: 1}, sort=[(key, -1)])
+
+        lower, upper = get_key_value(lower, key), get_key_value(upper, key)
+
+        if range_type(lower) is None or range_type(lower) != range_type(upper):
+            """
+            Mixed or unsupported types: the range of the first type of
+            RANGE_TYPES found is split, the other documents are read by the
+            first partition.
+            """
+            lower = upper = None
+
+            for alias in RANGE_TYPES:
+
+                typed_filter = type_filter(filter, key, alias)
+
+                upper = collection.find_one(typed_filter, projection={key: 1}, sort=[(key, -1)])
+                if upper is not None:
+                    lower = collection.find_one(typed_filter, projection={key: 1}, sort=[(key, 1)])
+                    lower, upper = get_key_value(lower, key), get_key_value(upper, key)
+                    break
+
+            if upper is None:
+                """
+                No value can be split (strings, ...): a single partition.
+                """
+                return [dict(filter)]
+
+        boundaries = split_points(lower, upper, partitions)
+
+    return partition_filters(filter, key, boundaries)
+
+
+
 class Document(BaseModel):
 
     id: Optional[PydanticObjectId] = Field(default=None, alias='_id')
 
+    # Fields assigned since the document was loaded or saved. See: save(...)
+    _changed_fields: Set[str] = PrivateAttr(default_factory=set)
+
 
     # Pydantic configs: https://docs.pydantic.dev/latest/usage/model_config/#options
     class Config():
@@ -143,6 +318,17 @@ class Document(BaseModel):
         name = None
         db_alias = None
         indexes = []
+        # 'validate' or 'construct'. See: mongopyd.src.hydration.Hydrator
+        hydration = 'validate'
+        hydration_validate_sample = None
+        # In-process find_one(<_id>) cache. See: mongopyd.src.cache.LRUCache
+        cache = False
+        cache_max_entries = 1024
+        cache_max_bytes = None
+        cache_ttl = None
+        # TTL (seconds) of cached count_documents(...) results. None: disabled.
+        count_cache_ttl = None
+        count_cache_max_entries = 256
 
 
 
@@ -150,25 +336,95 @@ class Document(BaseModel):
     @need_database_and_collection
     def build_indexes(
         self,
+        drop_undeclared: bool = False,
+        dry_run: bool = False,
+        replace_conflicts: bool = False,
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None
-        ):
+        ) -> Optional[IndexPlan]:
+        """
+        Reads the indexes of the collection once (index_information) and
+        creates only the indexes of Settings.indexes that are missing,
+        compared by key and options. None if the model declares no indexes.
+
+        # drop_undeclared: also drops the indexes that no model of the
+        #   collection declares (except `_id_`).
+        # dry_run: only returns the plan, nothing is changed.
+        # replace_conflicts: drops and recreates the existing indexes whose
+        #   definition changed. Without it they raise RuntimeError.
+        """
 
-        try:
-            getattr(self, 'Settings')
-        except AttributeError:
+        indexes = getattr(getattr(self, 'Settings', None), 'indexes', None)
+        if not indexes:
             return None
-    
 
-        try:
-            indexes = getattr(self.Settings, 'indexes')
-            if not indexes:
-                return None
-        except AttributeError:
-            return None
-        
 
-        return  collection.create_indexes(indexes)
+        shared = []
+        if drop_undeclared:
+            shared = get_shared_indexes(
+                Document,
+                self,
+                collection.full_name,
+                lambda model: _cache_model_database_and_collection(model)[1].full_name
+                )
+
+        plan, to_create = plan_indexes(
+            collection.full_name,
+            indexes,
+            collection.index_information(),
+            drop_undeclared=drop_undeclared,
+            replace_conflicts=replace_conflicts,
+            shared=shared
+            )
+
+        if dry_run:
+            return plan
+
+        check_conflicts(plan)
+
+
+        for name in plan.drop:
+            collection.drop_index(name)
+
+        if to_create:
+            collection.create_indexes(to_create)
+
+        plan.applied = True
+
+        return plan
+
+
+    @classmethod
+    def build_all_indexes(
+        self,
+        drop_undeclared: bool = False,
+        dry_run: bool = False,
+        replace_conflicts: bool = False,
+        max_workers: int = 8
+        ) -> List[IndexPlan]:
+        """
+        build_indexes(...) of this model and of every subclass of it (every
+        model, from Document) that declares Settings.indexes, on up to
+        `max_workers` threads.
+        """
+
+        models = get_index_models(self)
+        if not models:
+            return []
+
+        with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(models)),
+                thread_name_prefix='mongopyd-build-indexes'
+                ) as executor:
+
+            return list(executor.map(
+                lambda model: model.build_indexes(
+                    drop_undeclared=drop_undeclared,
+                    dry_run=dry_run,
+                    replace_conflicts=replace_conflicts
+                    ),
+                models
+            ))
 
 
     @classmethod
@@ -176,24 +432,299 @@ class Document(BaseModel):
     def find(
         self,
         filter: Mapping[str, Any],
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
         **kwargs: Any
         ):
         
+        hydrate = Hydrator(
+            self,
+            mode=hydration,
+            validate_sample=validate_sample
+            )
 
         results = collection.find(filter, **kwargs)
+
+        recording = recording_for(self, collection, 'find', filter, kwargs.get('sort'))
+        if recording is not None:
+            results = recording.iterate(results)
+
+        results = instrument_cursor(self, 'find', collection, filter, results)
+
         for result in results:
-            ins_result = self(**result)
+            ins_result = hydrate(result)
             yield ins_result
 
 
     @classmethod
     @need_database_and_collection
+    def find_batches(
+        self,
+        filter: Mapping[str, Any],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ):
+        """
+        Like find(...), but yields lists of up to `batch_size` models, each
+        list hydrated at once. The cursor uses the same `batch_size`, so every
+        list matches one batch of the server.
+        """
+
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('batch_size must be an integer greater than 0')
+
+        hydrate = Hydrator(
+            self,
+            mode=hydration,
+            validate_sample=validate_sample
+            )
+
+        with collection.find(filter, batch_size=batch_size, **kwargs) as results:
+
+            batch = []
+
+            for result in results:
+                batch.append(result)
+
+                if len(batch) == batch_size:
+                    yield hydrate.many(batch)
+                    batch = []
+
+            if batch:
+                yield hydrate.many(batch)
+
+
+    @classmethod
+    @need_database_and_collection
+    def parallel_find(
+        self,
+        filter: Mapping[str, Any],
+        partitions: int = 4,
+        key: str = '_id',
+        boundaries: Optional[Sequence[Any]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ):
+        """
+        Like find(...), but the range of `key` (default: `_id`) is split in
+        `partitions` disjoint ranges that are read at the same time, one
+        thread and one cursor per partition. The results come in no particular order.
+
+        The split points are computed from the lowest and highest `key` (ObjectId,
+        int, float or datetime), or given in `boundaries` (N values -> N + 1
+        partitions). Every document of `filter` is returned, as with find(...):
+        the documents whose `key` has another type than the split points (or no
+        `key`) are read by the first partition.
+        Keys that cannot be split (strings, ...) are read by a single partition.
+        """
+
+        for batch in self._iter_parallel_batches(
+                filter,
+                partitions=partitions,
+                key=key,
+                boundaries=boundaries,
+                batch_size=batch_size,
+                hydration=hydration,
+                validate_sample=validate_sample,
+                database=database,
+                collection=collection,
+                **kwargs
+                ):
+            yield from batch
+
+
+    @classmethod
+    @need_database_and_collection
+    def parallel_find_into(
+        self,
+        sink: Callable[[List['Document']], Any],
+        filter: Mapping[str, Any],
+        partitions: int = 4,
+        key: str = '_id',
+        boundaries: Optional[Sequence[Any]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> int:
+        """
+        parallel_find(...) that calls `sink(batch)` for every batch of models,
+        always from the calling thread. Returns the number of documents read.
+        """
+
+        count = 0
+
+        for batch in self._iter_parallel_batches(
+                filter,
+                partitions=partitions,
+                key=key,
+                boundaries=boundaries,
+                batch_size=batch_size,
+                hydration=hydration,
+                validate_sample=validate_sample,
+                database=database,
+                collection=collection,
+                **kwargs
+                ):
+            sink(batch)
+            count += len(batch)
+
+        return count
+
+
+    @classmethod
+    def _iter_parallel_batches(
+        self,
+        filter: Mapping[str, Any],
+        partitions: int,
+        key: str,
+        boundaries: Optional[Sequence[Any]],
+        batch_size: int,
+        hydration: Optional[HydrationMode],
+        validate_sample: Optional[int],
+        database: pymongo.database.Database,
+        collection: pymongo.collection.Collection,
+        **kwargs: Any
+        ):
+
+        check_options(kwargs)
+
+        filters = _get_partition_filters(
+            collection,
+            filter,
+            partitions,
+            key,
+            boundaries=boundaries
+            )
+
+        return iter_partition_batches(
+            self,
+            filters,
+            {
+                'batch_size': batch_size,
+                'hydration': hydration,
+                'validate_sample': validate_sample,
+                'database': database,
+                'collection': collection,
+                **kwargs
+            }
+            )
+
+
+    @classmethod
+    @need_database_and_collection
+    def aggregate(
+        self,
+        pipeline: Sequence[Mapping[str, Any]],
+        output_model: Optional[type] = None,
+        batch_size: Optional[int] = None,
+        allow_disk_use: Optional[bool] = None,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ):
+        """
+        Streams the results of the aggregation pipeline on the collection of
+        the model: raw dicts, or instances of `output_model` (this model or any
+        other Pydantic model matching the output of the pipeline), hydrated as in find(...).
+        """
+
+        if output_model is not None:
+
+            if not isinstance(output_model, type) or not issubclass(output_model, BaseModel):
+                raise ValueError('output_model must be a Pydantic model class')
+
+            hydrate = Hydrator(
+                output_model,
+                mode=hydration,
+                validate_sample=validate_sample
+                )
+        else:
+            hydrate = None
+
+
+        if batch_size is not None:
+            kwargs['batchSize'] = batch_size
+
+        if allow_disk_use is not None:
+            kwargs['allowDiskUse'] = allow_disk_use
+
+
+        with collection.aggregate(pipeline, **kwargs) as results:
+
+            if hydrate is None:
+                yield from results
+            else:
+                for result in results:
+                    yield hydrate(result)
+
+
+    @classmethod
+    @need_database_and_collection
+    def paginate(
+        self,
+        filter: Mapping[str, Any],
+        sort: Optional[SortSpec] = None,
+        page_size: int = 20,
+        after: Optional[str] = None,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> Page:
+        """
+        Keyset (seek) pagination: one page of `page_size` models in `sort`
+        order ('key', [(key, 1 | -1), ...] or {key: 1 | -1}; default `_id`).
+        `_id` is always added as the last sort key to break ties.
+
+        Pass the `next_token` of a page as `after` to read the next one. The
+        next page starts with a range on the sort keys, so its cost does not
+        grow with the page number as with skip. Use an index matching `sort`.
+
+        The sort keys should be present (and not null) in every document.
+        A `projection` that leaves them out is extended to read them (they
+        are removed from the results).
+        """
+
+        sort, find_kwargs, hidden = page_query(filter, sort, page_size, after, kwargs)
+
+        hydrate = Hydrator(
+            self,
+            mode=hydration,
+            validate_sample=validate_sample
+            )
+
+        with record_query(self, collection, 'paginate', filter, sort):
+            with collection.find(**find_kwargs) as cursor:
+                results = list(cursor)
+
+        return build_page(results, sort, page_size, hydrate, hidden)
+
+
+    @classmethod
+    @need_database_and_collection
+    @instrumented('find_one')
     def find_one(
         self,
         filter: Union[Dict[str, Any], ObjectId, str],
-        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]]]=None,
+        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]], UpdateBuilder]=None,
+        hydration: Optional[HydrationMode] = None,
+        validate_sample: Optional[int] = None,
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
         **kwargs: Any
@@ -203,6 +734,9 @@ class Document(BaseModel):
         if 'return_document' in kwargs:
             raise ValueError('You cannot use return_document as a parameter')
 
+        if update is not None:
+            update = compile_update(self, update)
+
 
         if isinstance(filter, ObjectId):
             filter = {'_id': filter}
@@ -211,30 +745,103 @@ class Document(BaseModel):
             filter = {'_id': ObjectId(filter)}
 
 
-        if not update:
-            result =  collection.find_one(filter, **kwargs)
+        filter_id = get_filter_id(filter) if not update and not kwargs else MISSING
+
+
+        if filter_id is not MISSING:
+
+            cache = get_document_cache(self)
+            result = None
+
+            if cache is not None:
+                result = get_cached_document(cache, collection, filter_id)
+
+            if result is None:
+                with record_query(self, collection, 'find_one', filter):
+                    result = collection.find_one(filter)
+                    note_result(result, collection.codec_options)
+
+                if result is not None:
+                    cache_document(self, collection, result)
+
+        elif not update:
+            with record_query(self, collection, 'find_one', filter, kwargs.get('sort')):
+                result = collection.find_one(filter, **kwargs)
+                note_result(result, collection.codec_options)
         else:
-            result =  collection.find_one_and_update(
-                filter=filter,
-                update=update,
-                return_document=ReturnDocument.AFTER,
-                **kwargs)
+            with record_query(self, collection, 'find_one_and_update', filter, kwargs.get('sort')):
+                result = collection.find_one_and_update(
+                    filter=filter,
+                    update=update,
+                    return_document=ReturnDocument.AFTER,
+                    **kwargs)
+                note_result(result, collection.codec_options)
+
+            if result is not None:
+                if kwargs.get('projection') is None:
+                    cache_document(self, collection, result)
+                else:
+                    """
+                    A projected document is partial: it must not be cached.
+                    """
+                    invalidate_documents(
+                        self,
+                        collection,
+                        [result['_id']] if '_id' in result else None
+                        )
+                invalidate_counts(self)
         
         
         if result is None:
             return None
 
-        return self(**result)
+        return Hydrator(
+            self,
+            mode=hydration,
+            validate_sample=validate_sample
+            )(result)
     
 
+    @classmethod
+    def updates(self, strict: bool = True) -> UpdateBuilder:
+        """
+        #Builder of an update document for update(...) and find_one(...),
+        checked against the model.
+
+        doc.update({}, Model.updates().set('name', 'John').inc('visits', 1))
+
+        # option: strict
+            Default: True
+            Fields not declared in the model raise ValueError.
+        """
+        return UpdateBuilder(self, strict=strict)
+
+
     @need_database_and_collection
+    @instrumented('update')
     def update(self,
         filter: Mapping[str, Any],
-        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]]],
+        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]], UpdateBuilder],
+        returning: Returning = 'full',
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
         **kwargs: Any
         ):
+        """
+        #Applies `update` to this document (`filter` is added to its `_id`).
+        Returns False if no document matched.
+
+        # option: returning
+            Default: 'full'
+            'full': the updated document is returned and reloaded into this one.
+            'fields': only the top-level fields changed by the update are
+                returned and reloaded (not with pipelines).
+            'none': update_one(...), nothing is returned nor reloaded.
+                None if the write was not acknowledged (w=0).
+
+        Inside a unit of work the update is queued and None is returned
+        (see mongopyd.src.unit_of_work).
+        """
 
         try:
             if self.id is None:
@@ -253,19 +860,66 @@ class Document(BaseModel):
         if 'return_document' in kwargs:
             raise ValueError('You cannot use return_document as a parameter')
 
-        result =  collection.find_one_and_update(
+        update = compile_update(self.__class__, update)
+        check_returning(returning)
+
+        unit = get_unit_of_work()
+        if unit is not None:
+            unit.add(self, collection, 'update', make_request('update', base_filter, update, **kwargs))
+            return None
+
+        if returning == 'none':
+            with record_query(self.__class__, collection, 'update', base_filter):
+                result = collection.update_one(
+                    base_filter,
+                    update,
+                    **kwargs)
+
+            invalidate_documents(self.__class__, collection, [self.id])
+
+            if not result.acknowledged:
+                invalidate_counts(self.__class__)
+                return None
+
+            if not result.matched_count:
+                return False
+
+            invalidate_counts(self.__class__)
+            return True
+
+
+        if returning == 'fields':
+            if 'projection' in kwargs:
+                raise ValueError("You cannot use projection with returning='fields'")
+
+            kwargs['projection'] = updated_fields_projection(update)
+
+        with record_query(self.__class__, collection, 'update', base_filter):
+            result = collection.find_one_and_update(
                 filter=base_filter,
                 update=update,
                 return_document=ReturnDocument.AFTER,
                 **kwargs)
+            note_result(result, collection.codec_options)
 
         if not result:
             """
             Document not found. Not even a document corresponds to query of consultation.
             """
+            invalidate_documents(self.__class__, collection, [self.id])
             return False
         
-        self.reload_with_dict(result)
+        self._reload_from_server(result)
+
+        if kwargs.get('projection') is None:
+            cache_document(self.__class__, collection, result)
+        else:
+            """
+            Partial document (returning='fields' or a projection): not cached.
+            """
+            invalidate_documents(self.__class__, collection, [self.id])
+
+        invalidate_counts(self.__class__)
 
         return True
 
@@ -276,29 +930,36 @@ class Document(BaseModel):
         queryes: list,
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        validate: bool = False,
         **kwargs
         ):
+        """
+        Merges `[{operator: {field: value}}, ...]` into one update document
+        (the last value of a field wins). The `$match` pseudo-operator is
+        added to the filter.
+
+        # option: validate
+            Default: False
+            Builds the update with UpdateBuilder(strict=False): conflicting
+            paths raise ValueError and attribute names are replaced by their alias.
+        """
 
-        query_update = {}
-        # fields_reload = []
+        match_query = {}
+        query_update = UpdateBuilder(self.__class__, strict=False) if validate else {}
 
         for custom_query in queryes:
             for operator, data in custom_query.items():
                 if not operator.startswith('$'):
                     raise ValueError('The custom query key must start with $')
 
-                if data and not operator in query_update:
-                    query_update[operator] = {}
-
-                for field_name, field_value in data.items():
-                    query_update[operator][field_name] = field_value
-                    # fields_reload.append(field_name)
-                
-        
-        match_query = query_update.get('$match', {})
-        if '$match' in query_update: del query_update['$match']
+                if operator == '$match':
+                    match_query.update(data)
+                elif data and validate:
+                    query_update.operator(operator, data)
+                elif data:
+                    query_update.setdefault(operator, {}).update(data)
 
-        return  self.update(
+        return self.update(
             filter=match_query,
             update=query_update,
             database=database,
@@ -308,6 +969,7 @@ class Document(BaseModel):
 
 
     @need_database_and_collection
+    @instrumented('insert')
     def insert(
         self,
         allow_nulls: bool= False,
@@ -329,6 +991,21 @@ class Document(BaseModel):
             del doc_data['_id']
 
 
+        unit = get_unit_of_work()
+        if unit is not None:
+            """
+            The `_id` is known now, it is set on the document once written.
+            """
+            inserted_id = doc_data.setdefault('_id', ObjectId())
+
+            def inserted():
+                self.reload_with_dict({'_id': inserted_id})
+                self._mark_clean()
+
+            unit.add(self, collection, 'insert', make_request('insert', doc_data, **kwargs), inserted)
+            return inserted_id
+
+
         try:
             result = collection.insert_one(
                 doc_data,
@@ -341,18 +1018,192 @@ class Document(BaseModel):
             )
 
         self.reload_with_dict({'_id': result.inserted_id})
+        self._mark_clean()
+
+        invalidate_documents(self.__class__, collection, [result.inserted_id])
+        invalidate_counts(self.__class__)
 
         return result.inserted_id
 
 
+    @classmethod
     @need_database_and_collection
+    def insert_many(
+        self,
+        documents: Iterable['Document'],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ordered: bool = True,
+        allow_nulls: bool = False,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs
+        ) -> List[ObjectId]:
+        """
+        Inserts the documents in chunks of `chunk_size` with `insert_many`.
+        The `_id` of each inserted document is set back on the instance.
+
+        # ordered=True: stops at the first error.
+        # ordered=False: inserts every chunk and raises a single BulkWriteError at the end.
+        """
+
+        documents = list(documents)
+        docs_data = dump_documents(
+            self,
+            documents,
+            allow_nulls=allow_nulls
+        )
+
+        inserted_count = 0
+        errors = []
+
+        for offset, chunk in iter_chunks(docs_data, chunk_size):
+
+            try:
+                collection.insert_many(
+                    chunk,
+                    ordered=ordered,
+                    **kwargs
+                )
+            except BulkWriteError as err:
+                errors.append((offset, err))
+                inserted_count += apply_chunk_result(
+                    documents, docs_data, offset, len(chunk), ordered, error=err
+                    )
+
+                if ordered:
+                    break
+
+                continue
+
+            inserted_count += apply_chunk_result(
+                documents, docs_data, offset, len(chunk), ordered
+                )
+
+
+        invalidate_documents(
+            self,
+            collection,
+            (doc_data['_id'] for doc_data in docs_data)
+            )
+        invalidate_counts(self)
+
+        if errors:
+            raise merge_bulk_write_errors(errors, inserted_count)
+
+        return [doc_data['_id'] for doc_data in docs_data]
+
+
+    @need_database_and_collection
+    def save(
+        self,
+        allow_nulls: bool = False,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs
+        ) -> bool:
+        """
+        Saves only the fields assigned since the document was loaded, with a
+        single `update_one` of `$set`/`$unset`. Nothing is sent if no field changed.
+        A document without `_id` is inserted.
+
+        Only assignments are tracked (`doc.field = value`, `del doc.field` and
+        `reload_with_dict`). In-place changes such as `doc.items.append(...)`
+        are not detected: assign the field again to save them.
+        """
+
+        if self.id is None:
+            self.insert(
+                allow_nulls=allow_nulls,
+                database=database,
+                collection=collection,
+                **kwargs
+                )
+            return True
+
+
+        changed_fields = self._changed_fields - {'id'}
+        if not changed_fields:
+            return False
+
+
+        doc_data = self.model_dump(
+            by_alias=True,
+            include=changed_fields
+        )
+
+        query_set = {}
+        query_unset = {}
+
+        for field_name in changed_fields:
+
+            field = self.model_fields.get(field_name)
+            key = (field.alias or field_name) if field is not None else field_name
+
+            if key not in doc_data:
+                query_unset[key] = ''
+            elif doc_data[key] is None and not allow_nulls:
+                query_unset[key] = ''
+            else:
+                query_set[key] = doc_data[key]
+
+
+        update = {}
+        if query_set:
+            update['$set'] = query_set
+        if query_unset:
+            update['$unset'] = query_unset
+
+        unit = get_unit_of_work()
+        if unit is not None:
+            unit.add(
+                self,
+                collection,
+                'save',
+                make_request('save', {'_id': self.id}, update, **kwargs),
+                lambda: self._mark_clean(changed_fields)
+                )
+            return True
+
+        result = collection.update_one(
+            {'_id': self.id},
+            update,
+            **kwargs
+        )
+
+        invalidate_documents(self.__class__, collection, [self.id])
+        invalidate_counts(self.__class__)
+
+        if not result.matched_count:
+            """
+            Document not found. The changes are kept to be saved later.
+            """
+            return False
+
+        self._mark_clean(changed_fields)
+
+        return True
+
+
+    @need_database_and_collection
+    @instrumented('delete')
     def delete(
         self,
         filter: Union[Dict[str, Any], ObjectId, str],
+        returning: Returning = 'full',
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
         **kwargs):
-        
+        """
+        #Deletes this document (`filter` is added to its `_id`).
+        Returns False if no document matched.
+
+        # option: returning
+            Default: 'full'
+            'full': the deleted document is returned and reloaded into this one.
+            'none': delete_one(...), nothing is returned.
+                None if the write was not acknowledged (w=0).
+        """
+
         try:
             if self.id is None:
                 raise RuntimeError('You must fetch a document first')
@@ -367,9 +1218,34 @@ class Document(BaseModel):
             **filter
         }
 
-        result =  collection.find_one_and_delete(
+        check_returning(returning, ('full', 'none'))
+
+        unit = get_unit_of_work()
+        if unit is not None:
+            unit.add(self, collection, 'delete', make_request('delete', base_filter, **kwargs))
+            return None
+
+        if returning == 'none':
+            result = collection.delete_one(
+                base_filter,
+                **kwargs)
+
+            invalidate_documents(self.__class__, collection, [self.id])
+            invalidate_counts(self.__class__)
+
+            if not result.acknowledged:
+                return None
+
+            return bool(result.deleted_count)
+
+
+        result = collection.find_one_and_delete(
             filter=base_filter,
             **kwargs)
+        note_result(result, collection.codec_options)
+
+        invalidate_documents(self.__class__, collection, [self.id])
+        invalidate_counts(self.__class__)
 
         if not result:
             """
@@ -377,24 +1253,185 @@ class Document(BaseModel):
             """
             return False
         
-        self.reload_with_dict(result)
+        self._reload_from_server(result)
         return True
 
 
     @classmethod
     @need_database_and_collection
+    @instrumented('update_many')
+    def update_many(
+        self,
+        filter: Mapping[str, Any],
+        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]], UpdateBuilder],
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> UpdateManyResult:
+        """
+        Updates every document matching `filter` with a single update_many,
+        without loading them.
+        """
+
+        update = compile_update(self, update)
+
+        with record_query(self, collection, 'update_many', filter):
+            result = collection.update_many(
+                filter,
+                update,
+                **kwargs)
+
+        invalidate_documents(self, collection)
+        invalidate_counts(self)
+
+        return UpdateManyResult.from_result(result)
+
+
+    @classmethod
+    @need_database_and_collection
+    @instrumented('delete_many')
+    def delete_many(
+        self,
+        filter: Mapping[str, Any],
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> DeleteManyResult:
+        """
+        Deletes every document matching `filter` with a single delete_many,
+        without loading them.
+        """
+
+        with record_query(self, collection, 'delete_many', filter):
+            result = collection.delete_many(
+                filter,
+                **kwargs)
+
+        invalidate_documents(self, collection)
+        invalidate_counts(self)
+
+        return DeleteManyResult.from_result(result)
+
+
+    @classmethod
+    @need_database_and_collection
+    @instrumented('upsert')
+    def upsert(
+        self,
+        filter: Mapping[str, Any],
+        update: Union[Mapping[str, Any], Sequence[Mapping[str, Any]], UpdateBuilder],
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> UpsertResult:
+        """
+        Updates the first document matching `filter`, or inserts one built
+        from the equality fields of `filter` and `update` (update_one with
+        upsert=True). See UpsertResult.upserted_id.
+        """
+
+        if 'upsert' in kwargs:
+            raise ValueError('You cannot use upsert as a parameter')
+
+        update = compile_update(self, update)
+
+        with record_query(self, collection, 'upsert', filter):
+            result = collection.update_one(
+                filter,
+                update,
+                upsert=True,
+                **kwargs)
+
+        filter_id = get_filter_id(filter)
+        invalidate_documents(
+            self,
+            collection,
+            None if filter_id is MISSING else [filter_id]
+            )
+        invalidate_counts(self)
+
+        return UpsertResult.from_result(result)
+
+
+    @classmethod
+    @need_database_and_collection
+    def bulk_write(
+        self,
+        requests: Sequence[Any],
+        ordered: bool = True,
+        database: Optional[Union[str, pymongo.database.Database]] = None,
+        collection: Optional[Union[str, pymongo.collection.Collection]] = None,
+        **kwargs: Any
+        ) -> BulkWriteResult:
+        """
+        collection.bulk_write(...) of raw requests (pymongo InsertOne,
+        UpdateOne, ...). The document and count caches of the model are
+        cleared afterwards, even if it fails.
+        """
+
+        try:
+            return collection.bulk_write(
+                requests,
+                ordered=ordered,
+                **kwargs)
+        finally:
+            invalidate_documents(self, collection)
+            invalidate_counts(self)
+
+
+    @classmethod
+    @need_database_and_collection
+    @instrumented('count_documents')
     def count_documents(
         self,
         filter: Mapping[str, Any],
+        estimate: bool = False,
         database: Optional[Union[str, pymongo.database.Database]] = None,
         collection: Optional[Union[str, pymongo.collection.Collection]] = None,
         **kwargs: Any
         ) -> int:
+        """
+        Number of documents matching `filter`.
+
+        With `estimate` and an empty filter, the count comes from the metadata
+        of the collection (estimated_document_count) instead of a scan. It can
+        be off after an unclean shutdown, or with orphaned documents in a
+        sharded cluster. Any other query is counted exactly.
+
+        With Settings.count_cache_ttl (seconds), the counts are cached for that
+        long. Every write made through this model drops them.
+        """
+
+        estimate = estimate and can_estimate_count(filter, kwargs)
+
+        cache = get_count_cache(self)
+        if cache is not None:
+
+            count_key = get_count_key(collection, filter, estimate, kwargs)
+
+            if count_key is MISSING:
+                cache = None
+            else:
+                count = cache.get(count_key, None)
+                if count is not None:
+                    return count
+
+
+        with record_query(self, collection, 'count_documents', filter):
+
+            if estimate:
+                count = collection.estimated_document_count(**kwargs)
+            else:
+                count = collection.count_documents(filter, **kwargs)
+
+        if cache is not None:
+            cache.set(count_key, count)
 
-        return collection.count_documents(filter, **kwargs) 
+        return count
 
 
     @need_database_and_collection
+    @instrumented('reload')
     def reload(
         self,
         fields: List[str]=[],
@@ -420,15 +1457,46 @@ class Document(BaseModel):
                 )
         else:
             result =  collection.find_one(base_filter, **kwargs)
-        
+
+        note_result(result, collection.codec_options)
+
         if not result:
             return Exception('This document does not exist')
 
 
-        self.reload_with_dict(result)
+        self._reload_from_server(result)
+
+        if isinstance(fields, list) and fields:
+            invalidate_documents(self.__class__, collection, [self.id])
+        else:
+            cache_document(self.__class__, collection, result)
+
         return True
 
         
+    @classmethod
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Counters of the find_one(<_id>) cache (Settings.cache). None if disabled.
+        """
+
+        cache = get_document_cache(self)
+        if cache is None:
+            return None
+
+        return cache.stats()
+
+
+    @classmethod
+    def clear_cache(self):
+
+        cache = get_document_cache(self)
+        if cache is not None:
+            cache.clear()
+
+        invalidate_counts(self)
+
+        
     def get(self, field: Any, default: Any=None):
         """
         #Grab data in the document in the following ways:
@@ -442,33 +1510,9 @@ class Document(BaseModel):
         """
 
         if field == 'id':
-            return self.get('_id', default=default)
+            field = '_id'
 
-
-        document = self.model_dump(by_alias=True)
-        value = None
-        _refs = field.split('.')
-
-        for _ref in _refs:
-            if value is None:
-                if _ref != _refs[-1]:
-                    value = document.get(_ref, {})
-                else:
-                    value = document.get(_ref, default)
-            else:
-                if _ref != _refs[-1]:
-                    if isinstance(value, dict):
-                        value = value.get(_ref, {})
-                    else:
-                        raise ValueError('The value you are trying to get is not a dictionary')
-                else:
-                    if isinstance(value, dict):
-                        value = value.get(_ref, default)
-                    else:
-                        raise ValueError(f'The value you are trying to get is not a dictionary')
-
-
-        return value
+        return get_path(self, field, default)
 
 
     def reload_with_dict(self, data: Dict[str, Any]):
@@ -481,6 +1525,41 @@ class Document(BaseModel):
             except AttributeError:
                 pass
 
+
+    def _reload_from_server(self, data: Dict[str, Any]):
+        """
+        Same as reload_with_dict(...), for data that came from the server:
+        the fields of `data` are no longer pending for save().
+        """
+        self.reload_with_dict(data)
+        self._mark_clean(data.keys())
+
+
+    def _mark_clean(self, fields: Optional[Iterable[str]] = None):
+
+        if fields is None:
+            self._changed_fields.clear()
+            return
+
+        for field_name in fields:
+            self._changed_fields.discard(
+                'id' if field_name == '_id' else field_name
+                )
+
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+
+        if name[0] != '_':
+            self._changed_fields.add(name)
+
+
+    def __delattr__(self, name: str) -> None:
+        super().__delattr__(name)
+
+        if name[0] != '_':
+            self._changed_fields.add(name)
+
     
     def reload_with_db(self):
         ...
@@ -488,11 +1567,9 @@ class Document(BaseModel):
 
     def __getitem__(self, __key: Any) -> Any:
 
-        unique_default_identify = 'a450ec79-e2dd-4d90-af14-7d416a4c4316'
-
-        value = self.get(__key, default=unique_default_identify)
+        value = self.get(__key, default=MISSING)
 
-        if value == unique_default_identify:
+        if value is MISSING:
             raise KeyError(__key)
         
         return value
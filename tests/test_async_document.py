@@ -1,8 +1,11 @@
 import pymongo.errors
 from mongopyd.async_document import AsyncDocument as Document
 import asyncio
+import gc
 import pymongo
 import bson
+import motor.motor_asyncio
+from typing import ClassVar
 
 
 
@@ -258,3 +261,1275 @@ def test_find_one_result_is_instance_of_model(
     asyncio.get_event_loop().run_until_complete(
         main()
     )
+
+
+
+
+"""
+Database/collection resolution tests.
+"""
+
+
+def test_collection_is_cached_per_model(
+        ):
+
+    from mongopyd import RESOLVED_COLLECTIONS
+
+    async def main():
+
+        class MyModel(Document):
+            
+            class Settings():
+                name = 'mymodel'
+        
+
+        await MyModel.count_documents({})
+
+        _, collection = RESOLVED_COLLECTIONS[MyModel]
+        assert collection.name == 'mymodel'
+
+        async for _ in MyModel.find({}, limit=1):
+            pass
+
+        assert RESOLVED_COLLECTIONS[MyModel][1] is collection
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+Hydration tests.
+"""
+
+
+def test_find_hydration_construct(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+            
+            name: str = 'default'
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        doc = MyModel(name='Construct')
+        await doc.insert()
+
+        docs = [
+            result async for result in MyModel.find(
+                filter={
+                    '_id': doc.id
+                },
+                hydration='construct'
+            )
+        ]
+
+        assert len(docs) == 1
+        assert isinstance(docs[0], MyModel)
+        assert docs[0].name == 'Construct'
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_find_one_hydration_validate_sample_catches_drift(
+        motor_database
+        ):
+
+    import pydantic
+
+    async def main():
+
+        class MyModel(Document):
+
+            age: int = 0
+
+            class Settings():
+                name = 'mymodel'
+                hydration = 'construct'
+                hydration_validate_sample = 1
+        
+
+        result = await motor_database['mymodel'].insert_one({'age': 'not a number'})
+
+        try:
+            await MyModel.find_one(result.inserted_id)
+            assert False
+        except pydantic.ValidationError:
+            pass
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.insert_many tests.
+"""
+
+
+def test_insert_many(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            position: int
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        docs = [MyModel(position=position) for position in range(25)]
+
+        inserted_ids = await MyModel.insert_many(
+            docs,
+            chunk_size=5,
+            ordered=False,
+            max_concurrency=3
+        )
+
+        assert len(inserted_ids) == 25
+        assert [doc.id for doc in docs] == inserted_ids
+
+        assert await MyModel.count_documents({'_id': {'$in': inserted_ids}}) == 25
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_insert_many_unordered_reports_every_chunk(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        duplicated = MyModel()
+        await duplicated.insert()
+
+        docs = [MyModel(_id=duplicated.id), MyModel(), MyModel(), MyModel(_id=duplicated.id)]
+
+        try:
+            await MyModel.insert_many(docs, chunk_size=2, ordered=False)
+            assert False
+        except pymongo.errors.BulkWriteError as err:
+            assert err.details['nInserted'] == 2
+            assert [error['index'] for error in err.details['writeErrors']] == [0, 3]
+
+        assert docs[1].id is not None
+        assert docs[2].id is not None
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.save tests.
+"""
+
+
+def test_save_sends_only_changed_fields(
+        motor_database
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+            age: int = 0
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        doc = MyModel(name='Python', age=10)
+        await doc.insert()
+
+        assert await doc.save() is False
+
+        await motor_database['mymodel'].update_one({'_id': doc.id}, {'$set': {'name': 'Mongo'}})
+
+        doc.age = 11
+        assert await doc.save() is True
+
+        raw = await motor_database['mymodel'].find_one({'_id': doc.id})
+
+        assert raw['name'] == 'Mongo'
+        assert raw['age'] == 11
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+find_one(<_id>) cache tests.
+"""
+
+
+def test_find_one_cache_hit_and_invalidation(
+        motor_database
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+
+            class Settings():
+                name = 'mymodel'
+                cache = True
+                cache_ttl = 60
+        
+
+        doc = MyModel(name='Cached')
+        await doc.insert()
+
+        await MyModel.find_one(doc.id)
+        await motor_database['mymodel'].update_one({'_id': doc.id}, {'$set': {'name': 'Outside'}})
+
+        assert (await MyModel.find_one(doc.id)).name == 'Cached'
+        assert MyModel.cache_stats()['hits'] == 1
+
+        await doc.reload()
+
+        assert (await MyModel.find_one(doc.id)).name == 'Outside'
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_find_one_cache_projected_update(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+            age: int = 0
+
+            class Settings():
+                name = 'mymodel'
+                cache = True
+        
+
+        doc = MyModel(name='a', age=3)
+        await doc.insert()
+
+        await MyModel.find_one(doc.id, update={'$inc': {'age': 1}}, projection={'age': 1})
+
+        doc_found = await MyModel.find_one(doc.id)
+        assert doc_found.name == 'a' and doc_found.age == 4
+
+        await doc.update({}, {'$inc': {'age': 1}}, projection={'age': 1})
+
+        doc_found = await MyModel.find_one(doc.id)
+        assert doc_found.name == 'a' and doc_found.age == 5
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+Batched find_one(<_id>) tests.
+"""
+
+
+def test_find_one_batches_concurrent_calls(
+        ):
+
+    from mongopyd import RESOLVED_COLLECTIONS
+    from mongopyd.src.loader import get_batch_loader
+
+    async def main():
+
+        class MyModel(Document):
+
+            position: int
+
+            class Settings():
+                name = 'mymodel'
+                batch_find_one = True
+        
+
+        docs = [MyModel(position=position) for position in range(10)]
+        await MyModel.insert_many(docs)
+
+        results = await asyncio.gather(
+            *[MyModel.find_one(doc.id) for doc in docs],
+            MyModel.find_one(docs[0].id),
+            MyModel.find_one(bson.ObjectId())
+        )
+
+        assert [result.position for result in results[:10]] == list(range(10))
+        assert results[10].position == 0
+        assert results[10] is not results[0]
+        assert results[11] is None
+
+        _, collection = RESOLVED_COLLECTIONS[MyModel]
+        loader = get_batch_loader(MyModel, collection)
+
+        assert loader.batches == 1
+        assert loader.requested == 12
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_load_many(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            position: int
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        docs = [MyModel(position=position) for position in range(3)]
+        await MyModel.insert_many(docs)
+
+        results = await MyModel.load_many(
+            [docs[2].id, bson.ObjectId(), str(docs[0].id)]
+        )
+
+        assert results[0].position == 2
+        assert results[1] is None
+        assert results[2].position == 0
+
+        assert (await MyModel.load(docs[1].id)).position == 1
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.find_batches tests.
+"""
+
+
+def test_find_batches(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            position: int
+            batch_test: str
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        batch_test = str(bson.ObjectId())
+
+        await MyModel.insert_many([
+            MyModel(position=position, batch_test=batch_test) for position in range(20)
+        ])
+
+        for prefetch in (True, False):
+
+            batches = [
+                batch async for batch in MyModel.find_batches(
+                    {'batch_test': batch_test},
+                    batch_size=10,
+                    prefetch=prefetch,
+                    sort=[('position', 1)]
+                )
+            ]
+
+            assert [len(batch) for batch in batches] == [10, 10]
+            assert [doc.position for batch in batches for doc in batch] == list(range(20))
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_find_batches_stop_early(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        await MyModel.insert_many([MyModel() for _ in range(5)])
+
+        batches = MyModel.find_batches({}, batch_size=2)
+
+        async for batch in batches:
+            assert len(batch) == 2
+            break
+
+        await batches.aclose()
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+def test_find_batches_stop_early_failed_prefetch(
+        motor_database,
+        monkeypatch
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        await MyModel.insert_many([MyModel() for _ in range(5)])
+
+        cursor_class = type(motor_database['mymodel'].find({}))
+        to_list = cursor_class.to_list
+        calls = []
+
+        async def failing_to_list(cursor, *args, **kwargs):
+            calls.append(None)
+            if len(calls) > 1:
+                raise pymongo.errors.OperationFailure('prefetch failed')
+            return await to_list(cursor, *args, **kwargs)
+
+        monkeypatch.setattr(cursor_class, 'to_list', failing_to_list)
+
+        errors = []
+        loop = asyncio.get_event_loop()
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+
+        try:
+            batches = MyModel.find_batches({}, batch_size=2)
+
+            async for batch in batches:
+                """
+                Lets the prefetch fail before the consumer stops.
+                """
+                await asyncio.sleep(0)
+                break
+
+            await batches.aclose()
+            del batches
+
+            await asyncio.sleep(0)
+            gc.collect()
+        finally:
+            loop.set_exception_handler(None)
+
+        assert len(calls) == 2
+        assert errors == []
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.parallel_find tests.
+"""
+
+
+def test_parallel_find(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            position: int
+            parallel_test: str
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        parallel_test = str(bson.ObjectId())
+
+        await MyModel.insert_many([
+            MyModel(position=position, parallel_test=parallel_test) for position in range(50)
+        ])
+
+        docs = [
+            doc async for doc in MyModel.parallel_find(
+                {'parallel_test': parallel_test},
+                partitions=4,
+                batch_size=7
+            )
+        ]
+
+        assert sorted(doc.position for doc in docs) == list(range(50))
+
+
+        positions = []
+
+        async def sink(batch):
+            positions.extend(doc.position for doc in batch)
+
+        count = await MyModel.parallel_find_into(
+            sink,
+            {'parallel_test': parallel_test},
+            key='position',
+            partitions=3
+        )
+
+        assert count == 50
+        assert sorted(positions) == list(range(50))
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.aggregate tests.
+"""
+
+
+def test_aggregate(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            group: str
+            amount: int
+            aggregate_test: str
+
+            class Settings():
+                name = 'mymodel'
+        
+
+        aggregate_test = str(bson.ObjectId())
+
+        await MyModel.insert_many([
+            MyModel(group=group, amount=amount, aggregate_test=aggregate_test)
+            for group, amount in (('a', 1), ('a', 2), ('b', 5))
+        ])
+
+        pipeline = [
+            {'$match': {'aggregate_test': aggregate_test}},
+            {'$group': {'_id': '$group', 'total': {'$sum': '$amount'}}},
+            {'$sort': {'_id': 1}}
+        ]
+
+        raw = [result async for result in MyModel.aggregate(pipeline, allow_disk_use=True)]
+
+        assert raw == [{'_id': 'a', 'total': 3}, {'_id': 'b', 'total': 5}]
+
+
+        docs = [
+            doc async for doc in MyModel.aggregate(
+                [{'$match': {'aggregate_test': aggregate_test, 'group': 'a'}}],
+                output_model=MyModel
+            )
+        ]
+
+        assert sorted(doc.amount for doc in docs) == [1, 2]
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_aggregate_stop_early(
+        monkeypatch
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            class Settings():
+                name = 'mymodel'
+
+
+        closed = []
+        aggregate = motor.motor_asyncio.AsyncIOMotorCollection.aggregate
+
+        def spy_aggregate(collection, *args, **kwargs):
+
+            cursor = aggregate(collection, *args, **kwargs)
+            close = cursor.close
+
+            async def spy_close():
+                closed.append(True)
+                await close()
+
+            cursor.close = spy_close
+            return cursor
+
+        monkeypatch.setattr(motor.motor_asyncio.AsyncIOMotorCollection, 'aggregate', spy_aggregate)
+
+
+        await MyModel.insert_many([MyModel() for _ in range(5)])
+
+        results = MyModel.aggregate([{'$match': {}}])
+
+        async for result in results:
+            break
+
+        await results.aclose()
+
+        assert closed == [True]
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" .paginate tests. """
+
+def test_paginate(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            score: int
+            paginate_test: str
+
+            class Settings():
+                name = 'mymodel'
+
+
+        paginate_test = str(bson.ObjectId())
+
+        await MyModel.insert_many([
+            MyModel(score=score, paginate_test=paginate_test)
+            for score in (5, 3, 5, 1, 4, 5, 2)
+        ])
+
+        filter = {'paginate_test': paginate_test}
+
+        pages = [await MyModel.paginate(filter, sort={'score': 1}, page_size=2)]
+
+        while pages[-1].has_more:
+            pages.append(
+                await MyModel.paginate(filter, sort={'score': 1}, page_size=2, after=pages[-1].next_token)
+            )
+
+        assert [len(page.items) for page in pages] == [2, 2, 2, 1]
+
+        docs = [doc for page in pages for doc in page.items]
+
+        assert [doc.score for doc in docs] == [1, 2, 3, 4, 5, 5, 5]
+        assert len({doc.id for doc in docs}) == 7
+
+
+        try:
+            await MyModel.paginate(filter, sort=[('score', -1)], after=pages[0].next_token)
+            assert False
+        except ValueError:
+            pass
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" .count_documents tests. """
+
+def test_count_documents_estimate_and_cache(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            count_test: str
+
+            class Settings():
+                name = 'mymodel'
+                count_cache_ttl = 60
+
+
+        count_test = str(bson.ObjectId())
+
+        await MyModel.insert_many([MyModel(count_test=count_test) for _ in range(3)])
+
+        assert await MyModel.count_documents({}, estimate=True) == await MyModel.count_documents({})
+        assert await MyModel.count_documents({'count_test': count_test}, estimate=True) == 3
+
+
+        doc = MyModel(count_test=count_test)
+        await doc.insert()
+
+        assert await MyModel.count_documents({'count_test': count_test}) == 4
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" .build_indexes tests. """
+
+def test_build_all_indexes(
+        ):
+
+    async def main():
+
+        class BaseModel(Document):
+            pass
+
+
+        class FirstModel(BaseModel):
+
+            class Settings():
+                name = f'build_indexes_{bson.ObjectId()}'
+                indexes = [pymongo.IndexModel([('a', 1)], sparse=True)]
+
+
+        class SecondModel(BaseModel):
+
+            class Settings():
+                name = f'build_indexes_{bson.ObjectId()}'
+                indexes = [pymongo.IndexModel([('b', -1)])]
+
+
+        plans = await BaseModel.build_all_indexes()
+
+        assert sorted(plan.create[0] for plan in plans) == ['a_1', 'b_-1']
+
+
+        plan = await FirstModel.build_indexes(dry_run=True)
+
+        assert plan.unchanged == ['a_1']
+        assert not plan.changed
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" Query shapes tests. """
+
+def test_query_recorder(
+        ):
+
+    from mongopyd.src.query_shapes import start_query_recording, stop_query_recording
+
+
+    async def main():
+
+        class MyModel(Document):
+
+            score: int = 0
+
+            class Settings():
+                name = 'mymodel'
+
+
+        recorder = start_query_recording()
+
+        try:
+            [doc async for doc in MyModel.find({'score': {'$in': [1, 2]}})]
+            await MyModel.paginate({'score': 1}, sort='score')
+        finally:
+            stop_query_recording()
+
+
+        shapes = recorder.shapes(MyModel)
+
+        assert sorted(shape.describe() for shape in shapes) == [
+            'MyModel {score: ?} sort score: 1, _id: 1',
+            'MyModel {score: {$in: ?}}'
+        ]
+
+        assert sorted(item.suggested_key for item in recorder.advise()) == [
+            [('score', 1)], [('score', 1), ('_id', 1)]
+        ]
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" Instrumentation tests. """
+
+def test_instrumentation_histogram(
+        ):
+
+    from mongopyd.src.instrumentation import LatencyHistogram, register_hook, unregister_hook
+
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+
+            class Settings():
+                name = 'mymodel'
+
+
+        histogram = register_hook(LatencyHistogram())
+
+        try:
+            doc = MyModel(name='x')
+            await doc.insert()
+
+            await asyncio.gather(*(MyModel.find_one(doc.id) for _ in range(5)))
+            await doc.reload()
+        finally:
+            unregister_hook(histogram)
+
+
+        stats = histogram.dump()[f'{MyModel.__module__}.{MyModel.__qualname__}']
+
+        assert stats['find_one']['count'] == 5
+        assert stats['find_one']['documents'] == 5
+        assert stats['reload']['documents'] == 1
+        assert stats['insert']['count'] == 1
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" Slow operations tests. """
+
+def test_slow_operation_log(
+        ):
+
+    from mongopyd.src.instrumentation import register_hook, unregister_hook
+    from mongopyd.src.slow_operations import SlowOperationLog
+
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+
+            class Settings():
+                name = 'mymodel'
+
+
+        class FakeExplainLog(SlowOperationLog):
+
+            async def fake_explain(self, method, filter):
+                return {
+                    'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}},
+                    'executionStats': {'totalDocsExamined': 10}
+                }
+
+            def run_explain(self, collection, method, filter):
+                return self.fake_explain(method, filter)
+
+
+        slow_log = register_hook(FakeExplainLog(threshold=0, explain=True))
+
+        try:
+            await MyModel.count_documents({'name': 'a'})
+            [doc async for doc in MyModel.find({'name': 'a'})]
+        finally:
+            unregister_hook(slow_log)
+
+        await asyncio.sleep(0.01)
+
+
+        entries = slow_log.entries()
+
+        assert [entry.method for entry in entries] == ['count_documents', 'find']
+        assert all(entry.plan is not None and entry.plan.collscan for entry in entries)
+        assert 'test_async_document.py' in entries[0].call_site
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" Update builder tests. """
+
+def test_update_builder(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+            visits: int = 0
+
+            class Settings():
+                name = 'mymodel'
+
+
+        doc = MyModel(name='a')
+        await doc.insert()
+
+        visit = MyModel.updates().inc('visits', 1).set('name', 'b')
+
+        assert await doc.update({}, visit)
+        assert await doc.update({}, visit)
+        assert doc.visits == 2 and doc.name == 'b'
+
+        found = await MyModel.find_one(doc.id, update=MyModel.updates().max('visits', 10))
+        assert found.visits == 10
+
+        assert await doc.update_with_custom_queryes([
+            {'$inc': {'visits': 1}},
+            {'$match': {'visits': 10}}
+        ])
+        assert doc.visits == 11
+
+        try:
+            await doc.update({}, MyModel.updates().set('missing', 1))
+            assert False
+        except ValueError:
+            pass
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+def test_update_and_delete_returning(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+            visits: int = 0
+
+            class Settings():
+                name = 'mymodel'
+
+
+        doc = MyModel(name='a')
+        await doc.insert()
+
+        assert await doc.update({}, {'$inc': {'visits': 1}}, returning='none')
+        assert doc.visits == 0
+
+        assert await doc.update({}, {'$inc': {'visits': 1}}, returning='fields')
+        assert doc.visits == 2
+
+        try:
+            await doc.delete({}, returning='fields')
+            assert False
+        except ValueError:
+            pass
+
+        assert await doc.delete({}, returning='none')
+        assert await MyModel.find_one(doc.id) is None
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+""" update_many / delete_many / upsert tests. """
+
+def test_update_many_delete_many_upsert(
+        ):
+
+    async def main():
+
+        class MyModel(Document):
+
+            group: str = ''
+            visits: int = 0
+
+            class Settings():
+                name = f'many_{bson.ObjectId()}'
+
+
+        await MyModel.insert_many([MyModel(group='a') for _ in range(3)])
+
+        result = await MyModel.update_many({'group': 'a'}, {'$inc': {'visits': 1}})
+        assert result.matched_count == 3 and result.modified_count == 3
+
+        result = await MyModel.upsert({'group': 'b'}, MyModel.updates().set('visits', 7))
+        assert result.inserted
+        assert (await MyModel.find_one(result.upserted_id)).visits == 7
+
+        result = await MyModel.delete_many({'group': 'a'})
+        assert result.deleted_count == 3
+        assert await MyModel.count_documents({}) == 1
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+AsyncUnitOfWork tests.
+"""
+
+
+def test_unit_of_work(
+        ):
+
+    from mongopyd.src.unit_of_work import AsyncUnitOfWork
+
+    async def main():
+
+        class MyModel(Document):
+
+            name: str = ''
+            visits: int = 0
+            unit_test: str
+
+            class Settings():
+                name = 'mymodel'
+
+
+        unit_test = str(bson.ObjectId())
+
+        docs = [MyModel(name=f'doc{index}', unit_test=unit_test) for index in range(3)]
+
+        async with AsyncUnitOfWork() as unit:
+            ids = [await doc.insert() for doc in docs]
+            assert unit.pending == 3
+            assert await MyModel.count_documents({'unit_test': unit_test}) == 0
+
+        assert [doc.id for doc in docs] == ids
+
+        async with AsyncUnitOfWork() as unit:
+            for doc in docs:
+                assert await doc.update({}, {'$inc': {'visits': 1}}) is None
+
+            try:
+                await docs[0].delete({}, let={})
+                assert False
+            except ValueError:
+                pass
+
+            assert unit.pending == 3
+            await docs[0].delete({})
+
+        assert await MyModel.count_documents({'unit_test': unit_test, 'visits': 1}) == 2
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+.insert (Settings.coalesce_inserts) tests.
+"""
+
+
+def test_insert_coalescing(
+        ):
+
+    from mongopyd.src.coalescer import INSERT_COALESCERS
+
+    async def main():
+
+        class MyModel(Document):
+
+            value: int = 0
+            coalesce_test: str
+
+            class Settings():
+                name = 'mymodel'
+                coalesce_inserts = True
+                coalesce_window_us = 1000
+                coalesce_max_size = 20
+                coalesce_max_pending = 40
+
+
+        coalesce_test = str(bson.ObjectId())
+
+        existing = MyModel(value=-1, coalesce_test=coalesce_test)
+        await existing.insert()
+
+        docs = [MyModel(value=index, coalesce_test=coalesce_test) for index in range(50)]
+        docs[10].id = existing.id
+
+        results = await asyncio.gather(
+            *[doc.insert() for doc in docs],
+            return_exceptions=True
+        )
+
+        assert isinstance(results[10], pymongo.errors.DuplicateKeyError)
+        assert all(
+            isinstance(result, bson.ObjectId) and result == doc.id
+            for index, (result, doc) in enumerate(zip(results, docs)) if index != 10
+        )
+        assert await MyModel.count_documents({'coalesce_test': coalesce_test}) == 50
+
+        [coalescer] = [
+            coalescer for (model, _), coalescer in INSERT_COALESCERS.items() if model is MyModel
+        ]
+
+        assert coalescer.requested == 51
+        assert coalescer.batches <= 4
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
+
+
+
+
+"""
+AsyncCounterAccumulator tests.
+"""
+
+
+def test_counter_accumulator(
+        ):
+
+    from mongopyd.src.counters import AsyncCounterAccumulator
+
+    async def main():
+
+        class MyModel(Document):
+
+            views: int = 0
+
+            class Settings():
+                name = 'mymodel'
+
+
+        docs = [MyModel() for _ in range(2)]
+        await MyModel.insert_many(docs)
+
+        async with AsyncCounterAccumulator(MyModel, interval=0.01) as counters:
+
+            for _ in range(4):
+                counters.inc(docs[0].id, 'views')
+
+            assert counters.pending == 4
+
+            for _ in range(100):
+                if not counters.pending:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert counters.pending == 0
+            assert (await MyModel.find_one(docs[0].id)).views == 4
+
+            counters.inc(docs[1].id, 'views', 3)
+
+        assert counters.pending == 0
+        assert (await MyModel.find_one(docs[1].id)).views == 3
+
+
+        """
+        The block raises: the increments are written all the same.
+        """
+        try:
+            async with AsyncCounterAccumulator(MyModel, interval=60) as counters:
+                counters.inc(docs[1].id, 'views')
+                raise KeyError('block')
+        except KeyError as err:
+            assert err.args == ('block',)
+
+        assert counters.closed and counters.pending == 0
+        assert (await MyModel.find_one(docs[1].id)).views == 4
+
+
+        """
+        The write fails too: the exception of the block is kept, the
+        increments stay pending for the flush at interpreter exit.
+        """
+        class FlakyModel(MyModel):
+
+            failures: ClassVar[int] = 1
+
+            @classmethod
+            async def bulk_write(self, *args, **kwargs):
+                if FlakyModel.failures:
+                    FlakyModel.failures -= 1
+                    raise pymongo.errors.AutoReconnect('down')
+                return await super().bulk_write(*args, **kwargs)
+
+
+        try:
+            async with AsyncCounterAccumulator(FlakyModel, interval=60) as counters:
+                counters.inc(docs[1].id, 'views')
+                raise KeyError('block')
+        except KeyError as err:
+            assert err.args == ('block',)
+
+        assert isinstance(counters.last_error, pymongo.errors.AutoReconnect)
+        assert counters.pending == 1
+
+        assert await counters.flush() == 1
+        assert (await MyModel.find_one(docs[1].id)).views == 5
+
+    asyncio.get_event_loop().run_until_complete(
+        main()
+    )
@@ -1,4 +1,9 @@
 from mongopyd.embedded_document import EmbeddedDocument
+from mongopyd.src.custom_types import PydanticObjectId, JsonORDictField
+from typing import Optional, Dict, Tuple, List
+import pydantic
+from typing_extensions import Annotated
+import bson
 
 
 
@@ -118,3 +123,214 @@ def test___getitem___key_error():
     except KeyError:
         pass
 
+
+
+
+def test_get_nested_embedded_document():
+
+    class Address(EmbeddedDocument):
+        city: str = ''
+
+
+    class Person(EmbeddedDocument):
+        address: Address = Address()
+
+
+    doc = Person(
+        address=Address(city='Lisbon', zip_code='1000')
+    )
+
+
+    assert doc.get('address.city') == 'Lisbon'
+    assert doc.get('address.zip_code') == '1000'
+    assert doc.get('address') == {'city': 'Lisbon', 'zip_code': '1000'}
+    assert doc.get('address.country', 'PT') == 'PT'
+
+
+
+def test_get_default_for_missing_path():
+    
+    doc = EmbeddedDocument(
+        my_data={
+            'foo': None
+        }
+    )
+
+
+    assert doc.get('notfound.foo', 'default') == 'default'
+    assert doc.get('my_data.bar.name', 'default') == 'default'
+    assert doc.get('my_data.foo.name', 'default') == 'default'
+    assert doc.get('my_data.foo', 'default') is None
+
+
+
+def test___getitem___with_pointers():
+
+    doc = EmbeddedDocument(
+        my_data={
+            'foo': 'bar'
+        }
+    )
+
+
+    assert doc['my_data.foo'] == 'bar'
+
+    try:
+        doc['my_data.notfound']
+        assert False
+    except KeyError:
+        pass
+
+
+
+def test_get_models_in_containers():
+
+    class Item(EmbeddedDocument):
+        number: int = 0
+
+
+    class MyModel(EmbeddedDocument):
+        by_key: Dict[str, Item] = {}
+        pair: Tuple[Item, ...] = ()
+        mixed: List[Optional[Item]] = []
+        tags: List[str] = []
+
+
+    doc = MyModel(
+        by_key={'a': Item(number=1)},
+        pair=(Item(number=2),),
+        mixed=[None, Item(number=3)],
+        tags=['x']
+    )
+    dump = doc.model_dump(by_alias=True)
+
+
+    for key in ('by_key', 'pair', 'mixed', 'tags'):
+        assert doc.get(key) == dump[key]
+        assert type(doc.get(key)) is type(dump[key])
+
+    assert doc.get('by_key.a') == {'number': 1}
+    assert doc.get('tags') == doc.tags and doc.get('tags') is not doc.tags
+
+
+
+def test_get_field_serializers():
+
+    class MyModel(EmbeddedDocument):
+        name: str = ''
+        cents: Annotated[int, pydantic.PlainSerializer(lambda value: value / 100)] = 0
+
+        @pydantic.field_serializer('name')
+        def serialize_name(self, value):
+            return value.upper()
+
+
+    doc = MyModel(name='abc', cents=250)
+
+    assert doc.get('name') == 'ABC'
+    assert doc['cents'] == 2.5
+
+
+
+def test_get_computed_fields():
+
+    class MyModel(EmbeddedDocument):
+        a: int = 0
+
+        @pydantic.computed_field
+        @property
+        def double(self) -> int:
+            return self.a * 2
+
+        @pydantic.computed_field(alias='tripleValue')
+        @property
+        def triple(self) -> int:
+            return self.a * 3
+
+
+    doc = MyModel(a=3)
+
+    assert doc.get('double') == 6
+    assert doc['tripleValue'] == 9
+    assert doc.get('triple') is None
+    assert doc.model_dump(by_alias=True) == {'a': 3, 'double': 6, 'tripleValue': 9}
+
+
+
+def test_get_returns_copies():
+
+    class Inner(EmbeddedDocument):
+        tags: List[int] = []
+
+    class MyModel(EmbeddedDocument):
+        tags: List[int] = []
+        data: Dict[str, List[int]] = {}
+        inner: Optional[Inner] = None
+
+
+    doc = MyModel(tags=[1], data={'a': [1]}, inner=Inner(tags=[1]))
+
+    doc.get('tags').append(2)
+    doc['data']['a'].append(2)
+    doc.get('data.a').append(2)
+    doc.get('inner.tags').append(2)
+
+    assert doc.tags == [1]
+    assert doc.data == {'a': [1]}
+    assert doc.inner.tags == [1]
+
+
+
+def test_pydantic_object_id():
+
+    class MyModel(EmbeddedDocument):
+        ref: Optional[PydanticObjectId] = None
+
+
+    object_id = bson.ObjectId()
+
+    assert MyModel(ref=object_id).ref is object_id
+    assert MyModel(ref=str(object_id)).ref == object_id
+    assert isinstance(MyModel(ref=str(object_id)).ref, bson.ObjectId)
+
+    doc = MyModel(ref=object_id)
+
+    assert doc.model_dump() == {'ref': object_id}
+    assert doc.model_dump(mode='json') == {'ref': str(object_id)}
+    assert MyModel.model_validate_json(doc.model_dump_json()).ref == object_id
+
+    for invalid in ('12345', 12345, b'123456789012'):
+        try:
+            MyModel(ref=invalid)
+            assert False
+        except pydantic.ValidationError:
+            pass
+
+    assert MyModel.model_json_schema()['properties']['ref']['anyOf'][0]['type'] == 'string'
+
+
+
+def test_json_or_dict_field():
+
+    class MyModel(EmbeddedDocument):
+        config: JsonORDictField
+
+
+    assert MyModel(config={'a': 1}).config == {'a': 1}
+    assert MyModel(config='{"a": [1, 2]}').config == {'a': [1, 2]}
+    assert MyModel(config='a: [1, 2]').config == {'a': [1, 2]}
+
+    """
+    YAML results are cached: the documents must not share them.
+    """
+    doc = MyModel(config='a: {b: 1}')
+    doc.config['a']['b'] = 2
+
+    assert MyModel(config='a: {b: 1}').config == {'a': {'b': 1}}
+
+    for invalid in ('a: [1', '!!python/object/apply:os.system ["true"]'):
+        try:
+            MyModel(config=invalid)
+            assert False
+        except pydantic.ValidationError:
+            pass
@@ -1,7 +1,11 @@
 import pymongo.errors
 from mongopyd.sync_document import Document
+from pydantic import Field
+from typing import Any, ClassVar
 import pymongo
 import bson
+import warnings
+import base64
 
 
 
@@ -212,3 +216,1952 @@ def test_find_one_result_is_instance_of_model(
     )
 
     assert isinstance(result, MyModel)
+
+
+
+
+"""
+Database/collection resolution tests.
+"""
+
+
+def test_collection_is_cached_per_model(
+        ):
+
+    from mongopyd import RESOLVED_COLLECTIONS
+
+
+    class MyModel(Document):
+        
+        class Settings():
+            name = 'mymodel'
+
+
+    class OtherModel(Document):
+        
+        class Settings():
+            name = 'othermodel'
+    
+
+    MyModel.count_documents({})
+    OtherModel.count_documents({})
+
+    _, collection = RESOLVED_COLLECTIONS[MyModel]
+    assert collection.name == 'mymodel'
+
+    _, collection = RESOLVED_COLLECTIONS[OtherModel]
+    assert collection.name == 'othermodel'
+
+
+
+def test_collection_override_is_not_cached(
+        ):
+
+    from mongopyd import RESOLVED_COLLECTIONS
+
+
+    class MyModel(Document):
+        
+        class Settings():
+            name = 'mymodel'
+    
+
+    MyModel.count_documents({}, collection='othermodel')
+
+    assert MyModel not in RESOLVED_COLLECTIONS
+
+
+
+
+"""
+Hydration tests.
+"""
+
+
+def test_find_hydration_construct(
+        ):
+
+    class MyModel(Document):
+        
+        name: str = 'default'
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    doc = MyModel(name='Construct', extra_field={'a': 1})
+    doc.insert()
+
+    docs = list(MyModel.find(
+        filter={
+            '_id': doc.id
+        },
+        hydration='construct'
+    ))
+
+    assert len(docs) == 1
+    assert isinstance(docs[0], MyModel)
+    assert docs[0].id == doc.id
+    assert docs[0].name == 'Construct'
+    assert docs[0].get('extra_field.a') == 1
+
+
+
+def test_find_one_hydration_from_settings(
+        ):
+
+    class MyModel(Document):
+
+        age: int = 0
+
+        class Settings():
+            name = 'mymodel'
+            hydration = 'construct'
+    
+
+    result_insert = MyModel(age=10).insert()
+
+    doc = MyModel.find_one(result_insert)
+
+    assert doc.age == 10
+    assert doc.model_fields_set == {'id', 'age'}
+
+
+
+def test_find_hydration_validate_sample_catches_drift(
+        pymongo_database
+        ):
+
+    import pydantic
+
+
+    class MyModel(Document):
+
+        age: int = 0
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    result = pymongo_database['mymodel'].insert_one({'age': 'not a number'})
+
+    try:
+        MyModel.find_one(
+            result.inserted_id,
+            hydration='construct',
+            validate_sample=1
+        )
+        assert False
+    except pydantic.ValidationError:
+        pass
+
+
+    doc = MyModel.find_one(
+        result.inserted_id,
+        hydration='construct'
+    )
+
+    assert doc.age == 'not a number'
+
+
+
+def test_find_hydration_invalid_mode(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+
+
+    try:
+        MyModel.find_one({}, hydration='fast')
+        assert False
+    except ValueError:
+        pass
+
+
+
+
+"""
+.insert_many tests.
+"""
+
+
+def test_insert_many(
+        ):
+
+    class MyModel(Document):
+
+        position: int
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    docs = [MyModel(position=position) for position in range(25)]
+
+    inserted_ids = MyModel.insert_many(docs, chunk_size=10)
+
+    assert len(inserted_ids) == 25
+    assert [doc.id for doc in docs] == inserted_ids
+
+    assert MyModel.count_documents({'_id': {'$in': inserted_ids}}) == 25
+
+
+
+def test_insert_many_ordered_stops_at_first_error(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    duplicated = MyModel()
+    duplicated.insert()
+
+    docs = [MyModel(), MyModel(_id=duplicated.id), MyModel(), MyModel()]
+
+    try:
+        MyModel.insert_many(docs, chunk_size=2, ordered=True)
+        assert False
+    except pymongo.errors.BulkWriteError as err:
+        assert err.details['nInserted'] == 1
+        assert [error['index'] for error in err.details['writeErrors']] == [1]
+
+    assert docs[0].id is not None
+    assert docs[2].id is None
+    assert docs[3].id is None
+
+
+
+def test_insert_many_unordered_inserts_every_chunk(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    duplicated = MyModel()
+    duplicated.insert()
+
+    docs = [MyModel(), MyModel(), MyModel(), MyModel(_id=duplicated.id)]
+
+    try:
+        MyModel.insert_many(docs, chunk_size=2, ordered=False)
+        assert False
+    except pymongo.errors.BulkWriteError as err:
+        assert err.details['nInserted'] == 3
+        assert [error['index'] for error in err.details['writeErrors']] == [3]
+
+    assert all(doc.id is not None for doc in docs[:3])
+
+
+
+def test_insert_many_invalid_document(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    try:
+        MyModel.insert_many([{'name': 'not a model'}])
+        assert False
+    except ValueError:
+        pass
+
+
+
+
+"""
+.save tests.
+"""
+
+
+def test_save_sends_only_changed_fields(
+        pymongo_database
+        ):
+
+    class MyModel(Document):
+
+        name: str = ''
+        age: int = 0
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    doc = MyModel(name='Python', age=10, city='Paris')
+    doc.insert()
+
+    doc_found = MyModel.find_one(doc.id)
+    assert doc_found.save() is False
+
+    """
+    A change made by someone else must not be overwritten by save().
+    """
+    pymongo_database['mymodel'].update_one({'_id': doc.id}, {'$set': {'name': 'Mongo'}})
+
+    doc_found.age = 11
+    del doc_found.city
+
+    assert doc_found.save() is True
+    assert doc_found.save() is False
+
+    raw = pymongo_database['mymodel'].find_one({'_id': doc.id})
+
+    assert raw['name'] == 'Mongo'
+    assert raw['age'] == 11
+    assert 'city' not in raw
+
+
+
+def test_save_none_value_is_unset(
+        pymongo_database
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    doc = MyModel(nickname='py')
+    doc.insert()
+
+    doc.nickname = None
+    doc.save()
+
+    assert 'nickname' not in pymongo_database['mymodel'].find_one({'_id': doc.id})
+
+
+
+def test_save_without_id_inserts(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    doc = MyModel(name='New')
+
+    assert doc.save() is True
+    assert doc.id is not None
+    assert MyModel.find_one(doc.id).get('name') == 'New'
+
+
+
+
+"""
+find_one(<_id>) cache tests.
+"""
+
+
+def test_find_one_cache_hit_and_invalidation(
+        pymongo_database
+        ):
+
+    class MyModel(Document):
+
+        name: str = ''
+
+        class Settings():
+            name = 'mymodel'
+            cache = True
+    
+
+    doc = MyModel(name='Cached')
+    doc.insert()
+
+    assert MyModel.find_one(doc.id).name == 'Cached'
+    assert MyModel.cache_stats()['misses'] == 1
+
+    """
+    Changes made outside of the model are not seen while cached.
+    """
+    pymongo_database['mymodel'].update_one({'_id': doc.id}, {'$set': {'name': 'Outside'}})
+
+    assert MyModel.find_one(str(doc.id)).name == 'Cached'
+    assert MyModel.cache_stats()['hits'] == 1
+
+
+    doc.update({}, {'$set': {'age': 1}})
+
+    doc_found = MyModel.find_one(doc.id)
+    assert doc_found.name == 'Outside'
+    assert doc_found.get('age') == 1
+
+
+    doc.delete({})
+
+    assert MyModel.find_one(doc.id) is None
+    assert MyModel.cache_stats()['entries'] == 0
+
+
+
+def test_find_one_cache_returns_copies(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+            cache = True
+    
+
+    doc = MyModel(tags=['a'])
+    doc.insert()
+
+    MyModel.find_one(doc.id).tags.append('b')
+
+    assert MyModel.find_one(doc.id).tags == ['a']
+
+
+
+def test_find_one_cache_eviction(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+            cache = True
+            cache_max_entries = 2
+    
+
+    docs = [MyModel() for _ in range(3)]
+    MyModel.insert_many(docs)
+
+    for doc in docs:
+        MyModel.find_one(doc.id)
+
+    stats = MyModel.cache_stats()
+
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+
+
+
+def test_find_one_cache_disabled(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    assert MyModel.cache_stats() is None
+
+
+
+def test_find_one_cache_projected_update(
+        ):
+
+    class MyModel(Document):
+
+        name: str = ''
+        age: int = 0
+
+        class Settings():
+            name = 'mymodel'
+            cache = True
+    
+
+    doc = MyModel(name='a', age=3)
+    doc.insert()
+
+    MyModel.find_one(doc.id, update={'$inc': {'age': 1}}, projection={'age': 1})
+
+    doc_found = MyModel.find_one(doc.id)
+    assert doc_found.name == 'a' and doc_found.age == 4
+
+
+    doc.update({}, {'$inc': {'age': 1}}, projection={'age': 1})
+
+    doc_found = MyModel.find_one(doc.id)
+    assert doc_found.name == 'a' and doc_found.age == 5
+
+
+
+
+"""
+.find_batches tests.
+"""
+
+
+def test_find_batches(
+        ):
+
+    class MyModel(Document):
+
+        position: int
+        batch_test: str
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    batch_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(position=position, batch_test=batch_test) for position in range(25)
+    ])
+
+    batches = list(MyModel.find_batches(
+        {'batch_test': batch_test},
+        batch_size=10,
+        sort=[('position', 1)]
+    ))
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert all(isinstance(doc, MyModel) for batch in batches for doc in batch)
+    assert [doc.position for batch in batches for doc in batch] == list(range(25))
+
+
+
+def test_find_batches_invalid_batch_size(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+
+
+    try:
+        list(MyModel.find_batches({}, batch_size=0))
+        assert False
+    except ValueError:
+        pass
+
+
+
+
+"""
+.parallel_find tests.
+"""
+
+
+def test_parallel_find(
+        ):
+
+    class MyModel(Document):
+
+        position: int
+        parallel_test: str
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    parallel_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(position=position, parallel_test=parallel_test) for position in range(50)
+    ])
+
+    docs = list(MyModel.parallel_find(
+        {'parallel_test': parallel_test},
+        partitions=4,
+        batch_size=7
+    ))
+
+    assert sorted(doc.position for doc in docs) == list(range(50))
+
+
+
+def test_parallel_find_into_with_boundaries(
+        ):
+
+    class MyModel(Document):
+
+        position: int
+        parallel_test: str
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    parallel_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(position=position, parallel_test=parallel_test) for position in range(30)
+    ])
+
+    batches = []
+
+    count = MyModel.parallel_find_into(
+        batches.append,
+        {'parallel_test': parallel_test},
+        key='position',
+        boundaries=[10, 20],
+        batch_size=5
+    )
+
+    assert count == 30
+    assert len(batches) == 6
+    assert sorted(doc.position for batch in batches for doc in batch) == list(range(30))
+
+
+
+def test_parallel_find_mixed_key_types(
+        ):
+
+    class MyModel(Document):
+
+        position: Any = None
+        parallel_test: str
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    parallel_test = str(bson.ObjectId())
+
+    positions = list(range(20)) + [0.5, 'a', 'b', None]
+
+    MyModel.insert_many([
+        MyModel(position=position, parallel_test=parallel_test) for position in positions
+    ])
+
+    for kwargs in (
+            {'partitions': 1},
+            {'partitions': 4},
+            {'boundaries': [5, 10]}
+        ):
+
+        docs = list(MyModel.parallel_find({'parallel_test': parallel_test}, key='position', **kwargs))
+
+        assert len(docs) == len(positions)
+        assert sorted(map(repr, (doc.position for doc in docs))) == sorted(map(repr, positions))
+
+
+
+def test_parallel_find_string_keys(
+        ):
+
+    class MyModel(Document):
+
+        code: str
+        parallel_test: str
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    parallel_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(code=f'code{index}', parallel_test=parallel_test) for index in range(10)
+    ])
+
+    docs = list(MyModel.parallel_find({'parallel_test': parallel_test}, key='code', partitions=4))
+
+    assert sorted(doc.code for doc in docs) == sorted(f'code{index}' for index in range(10))
+
+
+
+def test_parallel_find_no_documents(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    assert list(MyModel.parallel_find({'parallel_test': str(bson.ObjectId())})) == []
+
+
+
+def test_parallel_find_sort_not_supported(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+    
+
+    try:
+        list(MyModel.parallel_find({}, sort=[('_id', 1)]))
+        assert False
+    except ValueError:
+        pass
+
+
+
+
+"""
+.aggregate tests.
+"""
+
+
+def test_aggregate(
+        ):
+
+    from mongopyd.embedded_document import EmbeddedDocument
+
+
+    class MyModel(Document):
+
+        group: str
+        amount: int
+        aggregate_test: str
+
+        class Settings():
+            name = 'mymodel'
+
+
+    class Total(EmbeddedDocument):
+
+        group: str = Field(alias='_id')
+        total: int
+    
+
+    aggregate_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(group=group, amount=amount, aggregate_test=aggregate_test)
+        for group, amount in (('a', 1), ('a', 2), ('b', 5))
+    ])
+
+    pipeline = [
+        {'$match': {'aggregate_test': aggregate_test}},
+        {'$group': {'_id': '$group', 'total': {'$sum': '$amount'}}},
+        {'$sort': {'_id': 1}}
+    ]
+
+    raw = list(MyModel.aggregate(pipeline, batch_size=10))
+
+    assert raw == [{'_id': 'a', 'total': 3}, {'_id': 'b', 'total': 5}]
+
+
+    totals = list(MyModel.aggregate(pipeline, output_model=Total))
+
+    assert all(isinstance(total, Total) for total in totals)
+    assert [(total.group, total.total) for total in totals] == [('a', 3), ('b', 5)]
+
+
+    docs = list(MyModel.aggregate(
+        [{'$match': {'aggregate_test': aggregate_test, 'group': 'b'}}],
+        output_model=MyModel,
+        hydration='construct'
+    ))
+
+    assert len(docs) == 1
+    assert isinstance(docs[0], MyModel)
+    assert docs[0].amount == 5
+
+
+
+def test_aggregate_invalid_output_model(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+
+
+    try:
+        list(MyModel.aggregate([], output_model=dict))
+        assert False
+    except ValueError:
+        pass
+
+
+
+
+""" .paginate tests. """
+
+def test_paginate(
+        ):
+
+    class MyModel(Document):
+
+        score: int
+        paginate_test: str
+
+        class Settings():
+            name = 'mymodel'
+
+
+    paginate_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(score=score, paginate_test=paginate_test)
+        for score in (5, 3, 5, 1, 4, 5, 2)
+    ])
+
+    filter = {'paginate_test': paginate_test}
+
+    pages = [MyModel.paginate(filter, sort=[('score', -1)], page_size=3)]
+
+    while pages[-1].has_more:
+        pages.append(
+            MyModel.paginate(filter, sort=[('score', -1)], page_size=3, after=pages[-1].next_token)
+        )
+
+    assert [len(page.items) for page in pages] == [3, 3, 1]
+    assert pages[-1].next_token is None
+
+    docs = [doc for page in pages for doc in page.items]
+
+    assert all(isinstance(doc, MyModel) for doc in docs)
+    assert [doc.score for doc in docs] == [5, 5, 5, 4, 3, 2, 1]
+    assert len({doc.id for doc in docs}) == 7
+
+
+    exact = MyModel.paginate(filter, page_size=7)
+
+    assert len(exact.items) == 7
+    assert not exact.has_more
+
+
+
+def test_paginate_projection_without_sort_keys(
+        ):
+
+    class MyModel(Document):
+
+        score: int = 0
+        name: str = ''
+        paginate_test: str = ''
+
+        class Settings():
+            name = 'mymodel'
+
+
+    paginate_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(score=score, name=f'doc{index}', paginate_test=paginate_test)
+        for index, score in enumerate((5, 3, 5, 1, 4, 5, 2))
+    ])
+
+    filter = {'paginate_test': paginate_test}
+
+
+    for projection in ({'name': 1, '_id': 0}, {'score': 0, '_id': 0}, ['name']):
+
+        pages = [MyModel.paginate(filter, sort=[('score', -1)], page_size=3, projection=projection)]
+
+        while pages[-1].has_more:
+            pages.append(MyModel.paginate(
+                filter,
+                sort=[('score', -1)],
+                page_size=3,
+                after=pages[-1].next_token,
+                projection=projection
+            ))
+
+        docs = [doc for page in pages for doc in page.items]
+
+        assert [len(page.items) for page in pages] == [3, 3, 1]
+        assert sorted(doc.name for doc in docs) == [f'doc{index}' for index in range(7)]
+        assert all(doc.score == 0 for doc in docs)
+
+
+    try:
+        MyModel.paginate(filter, sort='score.value', projection={'score.value.sub': 1})
+        assert False
+    except ValueError:
+        pass
+
+
+
+def test_paginate_invalid_token(
+        ):
+
+    class MyModel(Document):
+
+        score: int = 0
+
+        class Settings():
+            name = 'mymodel'
+
+
+    MyModel.insert_many([MyModel(), MyModel()])
+
+    page = MyModel.paginate({}, sort='score', page_size=1)
+
+    def make_token(data):
+        return base64.urlsafe_b64encode(bson.encode(data)).decode('ascii')
+
+
+    for kwargs in (
+            {'after': 'not a token'},
+            {'after': page.next_token, 'sort': [('score', -1)]},
+            {'after': make_token({'v': [0, page.items[0].id]})},
+            {'after': make_token({'s': [['score', 1], ['_id', 1]], 'v': [0]})},
+            {'after': make_token({'s': [['score', 1], ['_id', 1]], 'v': {'0': 0}})},
+            {'after': make_token({'s': ['score', '_id'], 'v': [0, page.items[0].id]})},
+            {'after': make_token({'s': [['score', 1], ['_id', 1]], 'v': [{'$ne': None}, page.items[0].id]})},
+            {'after': make_token({'s': [['score', 1], ['_id', 1]], 'v': [[{'$where': '1'}], page.items[0].id]})},
+            {'after': 12},
+            {'page_size': 0},
+            {'skip': 10}
+        ):
+
+        try:
+            MyModel.paginate({}, **{'sort': 'score', **kwargs})
+            assert False
+        except ValueError:
+            pass
+
+
+    assert len(MyModel.paginate({}, sort='score', page_size=1, after=page.next_token).items) == 1
+
+
+
+
+""" .count_documents tests. """
+
+def test_count_documents_estimate(
+        ):
+
+    class MyModel(Document):
+
+        class Settings():
+            name = 'mymodel'
+
+
+    MyModel.insert_many([MyModel(), MyModel(), MyModel()])
+
+    assert MyModel.count_documents({}, estimate=True) == MyModel.count_documents({})
+    assert MyModel.count_documents({'_id': None}, estimate=True) == 0
+    assert MyModel.count_documents({}, estimate=True, limit=1) == 1
+
+
+
+def test_count_documents_cache(
+        ):
+
+    from mongopyd import RESOLVED_COLLECTIONS
+
+
+    class MyModel(Document):
+
+        score: int = 0
+        count_test: str
+
+        class Settings():
+            name = 'mymodel'
+            count_cache_ttl = 60
+
+
+    count_test = str(bson.ObjectId())
+
+    MyModel.insert_many([
+        MyModel(score=score, count_test=count_test)
+        for score in (1, 2)
+    ])
+
+    filter = {'count_test': count_test, 'score': {'$gte': 1, '$lte': 2}}
+
+    assert MyModel.count_documents(filter) == 2
+
+
+    """
+    Writes not made through the model are not seen until the TTL expires.
+    The same filter with the keys in another order hits the same entry.
+    """
+    _, collection = RESOLVED_COLLECTIONS[MyModel]
+    collection.insert_one({'score': 1, 'count_test': count_test})
+
+    assert MyModel.count_documents({'score': {'$lte': 2, '$gte': 1}, 'count_test': count_test}) == 2
+
+
+    doc = MyModel(score=1, count_test=count_test)
+    doc.insert()
+
+    assert MyModel.count_documents(filter) == 4
+
+
+    doc.delete({})
+
+    assert MyModel.count_documents(filter) == 3
+
+
+
+
+""" .build_indexes tests. """
+
+def test_build_indexes_creates_only_missing(
+        ):
+
+    collection_name = f'build_indexes_{bson.ObjectId()}'
+
+
+    class MyModel(Document):
+
+        class Settings():
+            name = collection_name
+            indexes = [
+                pymongo.IndexModel([('email', 1)], unique=True),
+                pymongo.IndexModel([('score', -1)])
+            ]
+
+
+    plan = MyModel.build_indexes(dry_run=True)
+
+    assert sorted(plan.create) == ['email_1', 'score_-1']
+    assert not plan.applied
+
+
+    plan = MyModel.build_indexes()
+
+    assert plan.applied
+    assert sorted(plan.create) == ['email_1', 'score_-1']
+
+
+    plan = MyModel.build_indexes()
+
+    assert not plan.changed
+    assert sorted(plan.unchanged) == ['email_1', 'score_-1']
+
+
+
+def test_build_indexes_conflicts_and_drop_undeclared(
+        pymongo_database
+        ):
+
+    collection_name = f'build_indexes_{bson.ObjectId()}'
+
+
+    class OldModel(Document):
+
+        class Settings():
+            name = collection_name
+            indexes = [
+                pymongo.IndexModel([('email', 1)]),
+                pymongo.IndexModel([('legacy', 1)])
+            ]
+
+
+    class NewModel(Document):
+
+        class Settings():
+            name = collection_name
+            indexes = [
+                pymongo.IndexModel([('email', 1)], unique=True)
+            ]
+
+
+    OldModel.build_indexes()
+
+    plan = NewModel.build_indexes(dry_run=True)
+
+    assert plan.conflicts == ['email_1']
+    assert sorted(plan.undeclared) == ['email_1', 'legacy_1']
+    assert plan.drop == []
+
+    try:
+        NewModel.build_indexes()
+        assert False
+    except RuntimeError:
+        pass
+
+
+    plan = NewModel.build_indexes(replace_conflicts=True)
+
+    assert plan.drop == ['email_1']
+    assert plan.create == ['email_1']
+    assert plan.conflicts == []
+    assert pymongo_database[collection_name].index_information()['email_1']['unique']
+
+
+    """
+    OldModel shares the collection: its indexes are not undeclared.
+    """
+    pymongo_database[collection_name].create_index([('stray', 1)])
+
+    plan = NewModel.build_indexes(drop_undeclared=True)
+
+    assert plan.drop == ['stray_1']
+    assert 'legacy_1' in pymongo_database[collection_name].index_information()
+
+    assert not NewModel.build_indexes(drop_undeclared=True).changed
+
+
+
+def test_build_all_indexes(
+        ):
+
+    class BaseModel(Document):
+        pass
+
+
+    class FirstModel(BaseModel):
+
+        class Settings():
+            name = f'build_indexes_{bson.ObjectId()}'
+            indexes = [pymongo.IndexModel([('a', 1)])]
+
+
+    class SecondModel(FirstModel):
+
+        class Settings():
+            name = f'build_indexes_{bson.ObjectId()}'
+            indexes = [pymongo.IndexModel([('b', 1)])]
+
+
+    class NoIndexes(BaseModel):
+
+        class Settings():
+            name = 'mymodel'
+
+
+    plans = BaseModel.build_all_indexes()
+
+    assert sorted(plan.create[0] for plan in plans) == ['a_1', 'b_1']
+    assert all(plan.applied for plan in plans)
+
+
+
+
+""" Query shapes tests. """
+
+def test_query_recorder_and_index_advisor(
+        ):
+
+    from mongopyd.src.query_shapes import (
+        start_query_recording,
+        stop_query_recording,
+        get_query_recorder
+    )
+
+
+    class MyModel(Document):
+
+        name: str = ''
+        age: int = 0
+
+        class Settings():
+            name = 'mymodel'
+            indexes = [
+                pymongo.IndexModel([('name', 1)])
+            ]
+
+
+    assert get_query_recorder() is None
+
+    recorder = start_query_recording()
+
+    try:
+        for age in range(3):
+            list(MyModel.find({'age': {'$gte': age}, 'name': 'x'}, sort=[('age', -1)]))
+
+        MyModel.count_documents({'name': 'x'})
+        MyModel.count_documents({'name': 'y'})
+        MyModel.find_one({'age': 1})
+        MyModel.find_one({'_id': bson.ObjectId()})
+    finally:
+        assert stop_query_recording() is recorder
+
+
+    shapes = {shape.describe(): shape for shape in recorder.shapes(MyModel)}
+
+    find_shape = shapes['MyModel {age: {$gte: ?}, name: ?} sort age: -1']
+
+    assert find_shape.count == 3
+    assert find_shape.operations == {'find'}
+    assert find_shape.max_time >= find_shape.mean_time > 0
+
+    assert shapes['MyModel {name: ?}'].count == 2
+
+
+    advice = {item.shape.describe(): item for item in recorder.advise(MyModel)}
+
+    assert set(advice) == {
+        'MyModel {age: {$gte: ?}, name: ?} sort age: -1',
+        'MyModel {age: ?}'
+    }
+
+    assert advice['MyModel {age: ?}'].reason == 'no index'
+
+    partial = advice['MyModel {age: {$gte: ?}, name: ?} sort age: -1']
+
+    assert partial.reason == 'partial'
+    assert partial.best_index == 'name_1'
+    assert partial.suggested_key == [('name', 1), ('age', -1)]
+
+
+    MyModel.find_one({'age': 2})
+
+    assert len(recorder.shapes()) == len(shapes)
+
+
+
+
+""" Instrumentation tests. """
+
+def test_instrumentation_hooks_and_histogram(
+        ):
+
+    from mongopyd.src.instrumentation import (
+        InstrumentationHook,
+        LatencyHistogram,
+        register_hook,
+        unregister_hook,
+        get_hooks
+    )
+
+
+    class MyModel(Document):
+
+        name: str = ''
+
+        class Settings():
+            name = 'mymodel'
+
+
+    class Events(InstrumentationHook):
+
+        def __init__(self):
+            self.pre_events = []
+            self.post_events = []
+
+        def pre(self, event):
+            self.pre_events.append((event.method, event.duration))
+
+        def post(self, event):
+            self.post_events.append(event)
+
+
+    events = register_hook(Events())
+    histogram = register_hook(LatencyHistogram(count_bytes=True))
+
+    try:
+        doc = MyModel(name='x')
+        doc.insert()
+
+        for _ in range(3):
+            MyModel.find_one({'name': 'x', '_id': doc.id})
+
+        MyModel.count_documents({'name': 'x'})
+        doc.update({}, {'$set': {'name': 'y'}})
+
+        try:
+            MyModel(name='z').delete({})
+        except RuntimeError:
+            pass
+
+    finally:
+        unregister_hook(events)
+        unregister_hook(histogram)
+
+    assert get_hooks() == ()
+
+
+    assert [method for method, _ in events.pre_events] == \
+        ['insert', 'find_one', 'find_one', 'find_one', 'count_documents', 'update', 'delete']
+    assert all(duration == 0 for _, duration in events.pre_events)
+
+    find_one = events.post_events[1]
+
+    assert find_one.model is MyModel
+    assert find_one.collection.endswith('.mymodel')
+    assert find_one.shape == (('_id', ('$eq',)), ('name', ('$eq',)))
+    assert find_one.documents == 1
+    assert find_one.bytes > 0
+    assert find_one.duration > 0
+
+    assert events.post_events[-1].error is not None
+
+
+    stats = histogram.dump()[f'{MyModel.__module__}.{MyModel.__qualname__}']
+
+    assert stats['find_one']['count'] == 3
+    assert stats['find_one']['documents'] == 3
+    assert stats['find_one']['min'] <= stats['find_one']['p50'] <= stats['find_one']['p99'] <= stats['find_one']['max']
+    assert stats['update']['documents'] == 1
+    assert stats['delete']['errors'] == 1
+    assert stats['count_documents']['documents'] == 0
+
+
+    MyModel.find_one({'_id': doc.id})
+
+    assert histogram.dump()[f'{MyModel.__module__}.{MyModel.__qualname__}']['find_one']['count'] == 3
+
+
+
+def test_instrumentation_hook_failures(
+        ):
+
+    from mongopyd.src.instrumentation import register_hook, unregister_hook, InstrumentationHook
+
+
+    class MyModel(Document):
+
+        name: str = ''
+
+        class Settings():
+            name = 'mymodel'
+
+
+    class FailingHook(InstrumentationHook):
+
+        def __init__(self):
+            self.events = []
+
+        def pre(self, event):
+            raise KeyError('pre')
+
+        def post(self, event):
+            self.events.append(event)
+            raise KeyError('post')
+
+
+    hook = register_hook(FailingHook())
+
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+
+            doc = MyModel(name='x')
+            doc.insert()
+
+            assert MyModel.find_one({'_id': doc.id}).name == 'x'
+            assert [found.id for found in MyModel.find({'_id': doc.id})] == [doc.id]
+
+            try:
+                MyModel(name='z').delete({})
+            except RuntimeError:
+                pass
+            else:
+                assert False, 'The error of the operation was masked'
+
+    finally:
+        unregister_hook(hook)
+
+
+    assert len(caught) == 8
+    assert all(warning.category is RuntimeWarning for warning in caught)
+
+    assert [event.method for event in hook.events] == ['insert', 'find_one', 'find', 'delete']
+    assert isinstance(hook.events[-1].error, RuntimeError)
+
+    """
+    Byte counting is off: no registered hook has count_bytes.
+    """
+    assert hook.events[1].documents == 1
+    assert hook.events[1].bytes == 0
+
+
+
+COLLSCAN_EXPLAIN = {
+    'queryPlanner': {
+        'winningPlan': {
+            'stage': 'LIMIT',
+            'inputStage': {'stage': 'COLLSCAN', 'filter': {}}
+        }
+    },
+    'executionStats': {
+        'nReturned': 1,
+        'totalKeysExamined': 0,
+        'totalDocsExamined': 1234,
+        'executionTimeMillis': 12
+    }
+}
+
+
+
+def test_slow_operation_log(
+        ):
+
+    from mongopyd.src.instrumentation import register_hook, unregister_hook
+    from mongopyd.src.slow_operations import SlowOperationLog
+
+
+    class MyModel(Document):
+
+        name: str = ''
+
+        class Settings():
+            name = 'mymodel'
+
+
+    class FakeExplainLog(SlowOperationLog):
+
+        def run_explain(self, collection, method, filter):
+            self.explained.append((method, filter))
+            return COLLSCAN_EXPLAIN
+
+
+    slow_log = FakeExplainLog(threshold=0, explain=True, methods=('find', 'find_one'))
+    slow_log.explained = []
+
+    register_hook(slow_log)
+
+    try:
+        MyModel.find_one({'name': 'a'})
+        MyModel.find_one({'name': 'b'})
+        list(MyModel.find({'name': {'$in': ['a', 'b']}}))
+        MyModel.count_documents({'name': 'a'})
+    finally:
+        unregister_hook(slow_log)
+
+    slow_log.wait_explains(timeout=5)
+
+
+    entries = slow_log.entries()
+
+    assert [entry.method for entry in entries] == ['find_one', 'find_one', 'find']
+    assert all(entry.call_site and 'test_sync_document.py' in entry.call_site for entry in entries)
+    assert entries[0].shape == (('name', ('$eq',)),)
+
+
+    """
+    Same shape: explained once.
+    """
+    assert slow_log.explained == [
+        ('find_one', {'name': 'a'}),
+        ('find', {'name': {'$in': ['a', 'b']}})
+    ]
+
+    assert entries[0].plan.collscan
+    assert entries[0].plan.docs_examined == 1234
+    assert entries[0].plan.stages == ['LIMIT', 'COLLSCAN']
+    assert entries[1].plan is None
+    assert 'COLLSCAN' in entries[0].describe()
+
+
+
+def test_summarize_explain_index_scan(
+        ):
+
+    from mongopyd.src.slow_operations import summarize_explain
+
+
+    summary = summarize_explain({
+        'queryPlanner': {
+            'winningPlan': {
+                'queryPlan': {
+                    'stage': 'FETCH',
+                    'inputStage': {'stage': 'IXSCAN', 'indexName': 'name_1'}
+                }
+            }
+        },
+        'executionStats': {'totalDocsExamined': 3, 'totalKeysExamined': 3}
+    })
+
+    assert not summary.collscan
+    assert summary.indexes == ['name_1']
+    assert summary.docs_examined == 3
+
+
+
+
+""" Update builder tests. """
+
+def test_update_builder(
+        ):
+
+    class MyModel(Document):
+
+        name: str = ''
+        visits: int = 0
+        tags: list = []
+        full_name: str = Field(default='', alias='fullName')
+
+        class Settings():
+            name = 'mymodel'
+
+
+    doc = MyModel(name='a', tags=['x'])
+    doc.insert()
+
+
+    visit = MyModel.updates().inc('visits', 1).push('tags', 'y', 'z').set('full_name', 'A')
+
+    assert visit.compile() == {
+        '$inc': {'visits': 1},
+        '$push': {'tags': {'$each': ['y', 'z']}},
+        '$set': {'fullName': 'A'}
+    }
+    assert visit.compile() is visit.compile()
+
+    assert doc.update({}, visit)
+    assert doc.update({}, visit)
+    assert doc.visits == 2
+    assert doc.tags == ['x', 'y', 'z', 'y', 'z']
+    assert MyModel.find_one(doc.id).full_name == 'A'
+
+    assert MyModel.find_one(doc.id, update=MyModel.updates().set('name', 'b')).name == 'b'
+
+
+    for invalid in (
+        lambda: MyModel.updates().set('missing', 1),
+        lambda: MyModel.updates().set('name', 'b').unset('name'),
+        lambda: MyModel.updates().set('tags', []).push('tags.0', 'x'),
+        lambda: MyModel.updates().compile(),
+    ):
+        try:
+            invalid()
+            assert False
+        except ValueError:
+            pass
+
+    assert MyModel.updates(strict=False).set('missing', 1).set('tags.0', 'a').set('tags.1', 'b').compile() == {
+        '$set': {'missing': 1, 'tags.0': 'a', 'tags.1': 'b'}
+    }
+
+
+    class OtherModel(Document):
+
+        class Settings():
+            name = 'othermodel'
+
+    try:
+        doc.update({}, OtherModel.updates(strict=False).set('name', 'c'))
+        assert False
+    except ValueError:
+        pass
+
+
+    assert doc.update_with_custom_queryes([
+        {'$set': {'name': 'c'}},
+        {'$inc': {'visits': 1}},
+        {'$match': {'visits': 2}}
+    ])
+    assert doc.name == 'c' and doc.visits == 3
+
+    """
+    The update is passed as it is: the last value of a field wins.
+    """
+    assert doc.update_with_custom_queryes([{'$set': {'name': 'd'}}, {'$set': {'name': 'e'}}])
+    assert doc.name == 'e'
+
+    try:
+        doc.update_with_custom_queryes([{'$set': {'name': 'd'}}, {'$set': {'name': 'e'}}], validate=True)
+        assert False
+    except ValueError:
+        pass
+
+
+
+def test_update_and_delete_returning(
+        ):
+
+    class MyModel(Document):
+
+        name: str = ''
+        visits: int = 0
+        payload: str = ''
+
+        class Settings():
+            name = 'mymodel'
+
+
+    doc = MyModel(name='a', payload='x' * 1000)
+    doc.insert()
+
+
+    assert doc.update({}, {'$inc': {'visits': 1}}, returning='none')
+    assert doc.visits == 0
+    assert MyModel.find_one(doc.id).visits == 1
+
+    other = MyModel.find_one(doc.id)
+    other.update({}, {'$set': {'payload': 'y'}}, returning='none')
+
+    assert doc.update({}, MyModel.updates().inc('visits', 1), returning='fields')
+    assert doc.visits == 2
+    assert doc.payload == 'x' * 1000
+
+    assert not doc.update({'name': 'b'}, {'$inc': {'visits': 1}}, returning='none')
+    assert not doc.update({'name': 'b'}, {'$inc': {'visits': 1}}, returning='fields')
+
+    for invalid in (
+        lambda: doc.update({}, {'$inc': {'visits': 1}}, returning='nothing'),
+        lambda: doc.update({}, [{'$set': {'visits': 1}}], returning='fields'),
+        lambda: doc.delete({}, returning='fields'),
+    ):
+        try:
+            invalid()
+            assert False
+        except ValueError:
+            pass
+
+
+    assert not doc.delete({'name': 'b'}, returning='none')
+    assert doc.delete({}, returning='none')
+    assert MyModel.find_one(doc.id) is None
+    assert not doc.delete({}, returning='none')
+
+
+
+
+def test_update_and_delete_returning_unacknowledged(
+        pymongo_database,
+        monkeypatch
+        ):
+
+    class MyModel(Document):
+
+        visits: int = 0
+
+        class Settings():
+            name = 'mymodel'
+
+
+    collection = pymongo_database.mymodel.with_options(
+        write_concern=pymongo.WriteConcern(w=0))
+
+    doc = MyModel()
+    doc.insert()
+
+    """
+    The results of a write with w=0 (their counts raise InvalidOperation).
+    """
+    monkeypatch.setattr(type(collection), 'update_one', lambda *args, **kwargs: pymongo.results.UpdateResult(None, False))
+    monkeypatch.setattr(type(collection), 'delete_one', lambda *args, **kwargs: pymongo.results.DeleteResult(None, False))
+
+    assert doc.update({}, {'$inc': {'visits': 1}}, returning='none', collection=collection) is None
+    assert doc.delete({}, returning='none', collection=collection) is None
+
+
+
+
+""" update_many / delete_many / upsert tests. """
+
+def test_update_many_delete_many_upsert(
+        ):
+
+    from mongopyd.src.results import (
+        UpdateManyResult,
+        DeleteManyResult,
+        UpsertResult
+    )
+
+
+    class MyModel(Document):
+
+        group: str = ''
+        visits: int = 0
+
+        class Settings():
+            name = f'many_{bson.ObjectId()}'
+
+
+    MyModel.insert_many([MyModel(group='a') for _ in range(3)] + [MyModel(group='b')])
+
+
+    result = MyModel.update_many({'group': 'a'}, MyModel.updates().inc('visits', 1))
+
+    assert result == UpdateManyResult(matched_count=3, modified_count=3)
+    assert MyModel.count_documents({'visits': 1}) == 3
+
+
+    result = MyModel.upsert({'group': 'c'}, {'$inc': {'visits': 5}})
+
+    assert isinstance(result, UpsertResult)
+    assert result.inserted and result.matched_count == 0
+    assert MyModel.find_one(result.upserted_id).group == 'c'
+
+    result = MyModel.upsert({'group': 'c'}, {'$inc': {'visits': 5}})
+
+    assert not result.inserted and result.matched_count == 1
+    assert MyModel.find_one({'group': 'c'}).visits == 10
+
+    try:
+        MyModel.upsert({'group': 'c'}, {'$inc': {'visits': 5}}, upsert=False)
+        assert False
+    except ValueError:
+        pass
+
+
+    assert MyModel.delete_many({'group': {'$in': ['a', 'c']}}) == DeleteManyResult(deleted_count=4)
+    assert MyModel.count_documents({}) == 1
+
+
+
+
+"""
+UnitOfWork tests.
+"""
+
+
+def test_unit_of_work(
+        ):
+
+    from mongopyd.src.unit_of_work import UnitOfWork
+
+
+    class MyModel(Document):
+
+        name: str = ''
+        visits: int = 0
+        unit_test: str
+
+        class Settings():
+            name = 'mymodel'
+
+
+    unit_test = str(bson.ObjectId())
+
+    existing = MyModel(name='existing', unit_test=unit_test)
+    existing.insert()
+
+    docs = [MyModel(name=f'doc{index}', unit_test=unit_test) for index in range(3)]
+
+    with UnitOfWork() as unit:
+
+        ids = [doc.insert() for doc in docs]
+
+        assert all(doc.id is None for doc in docs)
+        assert MyModel.count_documents({'unit_test': unit_test}) == 1
+
+        assert existing.update({}, {'$inc': {'visits': 1}}) is None
+        existing.name = 'renamed'
+        assert existing.save()
+        assert unit.pending == 5
+
+    assert unit.pending == 0
+    assert [doc.id for doc in docs] == ids
+    assert all(operation.executed for operation in unit.operations)
+    assert len(unit.results) == 1 and unit.results[0].inserted_count == 3
+
+    found = MyModel.find_one(existing.id)
+    assert found.visits == 1 and found.name == 'renamed'
+    assert not existing._changed_fields
+
+
+    """
+    Threshold flush, then a failure: the rest is discarded.
+    """
+    try:
+        with UnitOfWork(max_operations=2) as unit:
+            docs[0].delete({})
+            docs[1].delete({})
+            assert unit.pending == 0
+
+            docs[2].delete({})
+            raise KeyError()
+    except KeyError:
+        pass
+
+    assert MyModel.count_documents({'unit_test': unit_test}) == 2
+
+
+    """
+    Write errors are mapped to the operations.
+    """
+    try:
+        with UnitOfWork(ordered=False) as unit:
+            MyModel(name='new', unit_test=unit_test).insert()
+            MyModel(_id=existing.id, unit_test=unit_test).insert()
+        assert False
+    except pymongo.errors.BulkWriteError:
+        pass
+
+    assert unit.operations[0].executed and unit.operations[0].document.id is not None
+    assert not unit.operations[1].executed and unit.operations[1].error['code'] == 11000
+
+
+
+def test_unit_of_work_failed_operations_keep_cache(
+        monkeypatch
+        ):
+
+    import mongopyd.src.unit_of_work
+    from mongopyd.src.unit_of_work import UnitOfWork
+
+
+    class MyModel(Document):
+
+        unit_test: str
+
+        class Settings():
+            name = 'mymodel'
+
+
+    existing = MyModel(unit_test=str(bson.ObjectId()))
+    existing.insert()
+
+    invalidated = []
+    monkeypatch.setattr(
+        mongopyd.src.unit_of_work,
+        'invalidate_documents',
+        lambda model, collection, ids=None: invalidated.append(list(ids))
+        )
+
+    try:
+        with UnitOfWork() as unit:
+            MyModel(_id=existing.id, unit_test=existing.unit_test).insert()
+            MyModel(unit_test=existing.unit_test).insert()
+        assert False
+    except pymongo.errors.BulkWriteError:
+        pass
+
+    assert not any(operation.executed for operation in unit.operations)
+    assert invalidated == []
+
+
+
+def test_unit_of_work_unsupported_options(
+        ):
+
+    from mongopyd.src.unit_of_work import UnitOfWork
+
+
+    class MyModel(Document):
+
+        visits: int = 0
+        unit_test: str
+
+        class Settings():
+            name = 'mymodel'
+
+
+    unit_test = str(bson.ObjectId())
+
+    doc = MyModel(unit_test=unit_test)
+    doc.insert()
+
+    with UnitOfWork() as unit:
+
+        for call in (
+                lambda: MyModel(unit_test=unit_test).insert(bypass_document_validation=True),
+                lambda: doc.update({}, {'$inc': {'visits': 1}}, projection={'visits': 1}),
+                lambda: doc.delete({}, let={})
+            ):
+
+            try:
+                call()
+                assert False
+            except ValueError:
+                pass
+
+        assert unit.pending == 0
+
+        doc.update({}, {'$inc': {'visits': 1}}, upsert=False)
+        assert unit.pending == 1
+
+    assert MyModel.find_one(doc.id).visits == 1
+    assert MyModel.count_documents({'unit_test': unit_test}) == 1
+
+
+
+
+"""
+CounterAccumulator tests.
+"""
+
+
+def test_counter_accumulator(
+        ):
+
+    import time
+    from mongopyd.src.counters import CounterAccumulator
+
+
+    class MyModel(Document):
+
+        views: int = 0
+        like_count: int = Field(default=0, alias='likes')
+
+        class Settings():
+            name = 'mymodel'
+
+
+    docs = [MyModel() for _ in range(3)]
+    MyModel.insert_many(docs)
+
+
+    with CounterAccumulator(MyModel, interval=60, max_documents=3) as counters:
+
+        for _ in range(5):
+            counters.inc(docs[0].id, 'views')
+        counters.inc(docs[1].id, {'views': 2, 'like_count': 1})
+
+        assert counters.pending == 7
+        assert MyModel.find_one(docs[0].id).views == 0
+
+        assert counters.flush() == 7
+        assert counters.pending == 0
+        assert MyModel.find_one(docs[0].id).views == 5
+        assert MyModel.find_one(docs[1].id).like_count == 1
+
+
+        """
+        A third document reaches max_documents: the background thread flushes.
+        """
+        for doc in docs:
+            counters.inc(doc.id, 'views')
+
+        for _ in range(100):
+            if not counters.pending:
+                break
+            time.sleep(0.01)
+
+        assert counters.pending == 0
+        assert counters.flushes == 2
+
+        counters.inc(docs[2].id, 'views', 10)
+
+    assert counters.closed and counters.pending == 0
+    assert MyModel.find_one(docs[2].id).views == 11
+
+    try:
+        counters.inc(docs[2].id, 'views')
+        assert False
+    except RuntimeError:
+        pass
+
+
+    """
+    The block raises: the increments are written all the same.
+    """
+    try:
+        with CounterAccumulator(MyModel, interval=60) as counters:
+            counters.inc(docs[2].id, 'views')
+            raise KeyError('block')
+    except KeyError as err:
+        assert err.args == ('block',)
+
+    assert counters.closed and counters.pending == 0
+    assert MyModel.find_one(docs[2].id).views == 12
+
+
+    """
+    The write fails too: the exception of the block is kept and the
+    increments are written at interpreter exit.
+    """
+    class FlakyModel(MyModel):
+
+        failures: ClassVar[int] = 1
+
+        @classmethod
+        def bulk_write(self, *args, **kwargs):
+            if FlakyModel.failures:
+                FlakyModel.failures -= 1
+                raise pymongo.errors.AutoReconnect('down')
+            return super().bulk_write(*args, **kwargs)
+
+
+    try:
+        with CounterAccumulator(FlakyModel, interval=60) as counters:
+            counters.inc(docs[2].id, 'views')
+            raise KeyError('block')
+    except KeyError as err:
+        assert err.args == ('block',)
+
+    assert isinstance(counters.last_error, pymongo.errors.AutoReconnect)
+    assert counters.pending == 1
+
+    counters._flush_at_exit()
+
+    assert counters.pending == 0
+    assert MyModel.find_one(docs[2].id).views == 13